@@ -13,6 +13,7 @@ int distance;
 String inputString;
 boolean objectDetected = false;
 boolean isShootMode = false;  // Thêm biến theo dõi chế độ bắn
+boolean binaryProtocol = false; // Gửi dữ liệu radar/tracking dạng frame nhị phân (bật bằng lệnh PROTO:BIN)
 
 // Timing variables
 unsigned long lastDetectionTime = 0;
@@ -37,6 +38,12 @@ const int DETECTION_DISTANCE = 40;             // cm - detection distance thresh
 const int RADAR_DELAY = 30;                   // Delay time (ms) giữa các bước góc servo radar
 const int MIN_RADAR_ANGLE = 15;               // Góc tối thiểu của servo
 const int MAX_RADAR_ANGLE = 165;              // Góc tối đa của servo
+const long SERIAL_BAUD = 115200;              // Phải khớp với SERIAL_BAUD_RATE trong app.py
+
+// Binary frame: SYNC, TYPE, A, B low, B high, CHECKSUM (XOR of TYPE..B high)
+const byte FRAME_SYNC = 0xA5;
+const byte FRAME_RADAR = 0x01;                // A = angle, B = distance (cm)
+const byte FRAME_FACE = 0x02;                 // A = servo X, B = servo Y
 
 // Servo objects
 Servo radarServo;
@@ -54,7 +61,7 @@ void setup() {
   pinMode(echoPin, INPUT);
   
   // Initialize serial communication
-  Serial.begin(9600);
+  Serial.begin(SERIAL_BAUD);
   
   // Initial message
   Serial.println("System initialized, starting radar scan mode");
@@ -123,6 +130,16 @@ void checkSerialCommands() {
       shootModeStartTime = currentMillis;
       Serial.println("SHOOT command activated");
     }
+    else if (command == "PROTO:BIN") {
+      // Chuyển sang giao thức nhị phân cho dữ liệu radar/tracking
+      binaryProtocol = true;
+      Serial.println("PROTO:BIN OK");
+    }
+    else if (command == "PROTO:TEXT") {
+      // Quay lại giao thức văn bản
+      binaryProtocol = false;
+      Serial.println("PROTO:TEXT OK");
+    }
     else if (command.startsWith("SET_ANGLE:")) {
       // Lệnh SET_ANGLE:90 sẽ đặt góc servo thành 90 độ
       int angle = command.substring(10).toInt();
@@ -267,8 +284,25 @@ void radarScanMode() {
   }
 }
 
+// Gửi một frame nhị phân 6 byte
+void sendFrame(byte type, byte a, unsigned int b) {
+  byte frame[6];
+  frame[0] = FRAME_SYNC;
+  frame[1] = type;
+  frame[2] = a;
+  frame[3] = b & 0xFF;
+  frame[4] = (b >> 8) & 0xFF;
+  frame[5] = frame[1] ^ frame[2] ^ frame[3] ^ frame[4];
+  Serial.write(frame, 6);
+}
+
 // Hàm riêng để gửi dữ liệu góc và khoảng cách
 void sendRadarData(int angle, int dist) {
+  if (binaryProtocol) {
+    sendFrame(FRAME_RADAR, angle, constrain(dist, 0, 65535));
+    return;
+  }
+  
   Serial.print(angle);
   Serial.print(",");
   Serial.print(dist);
@@ -294,6 +328,11 @@ void faceTrackingMode() {
     up_down.write(y);
     
     // Send feedback
+    if (binaryProtocol) {
+      sendFrame(FRAME_FACE, x, y);
+      inputString = "";
+      return;
+    }
     Serial.print("Face tracking - X: ");
     Serial.print(x);
     Serial.print(", Y: ");
@@ -1,28 +1,74 @@
 import os
+import io
 import math
 import json
 import asyncio
 import threading
 import time
-import traceback
+import logging
 import numpy as np
 from typing import List, Dict, Any, Optional
 import serial
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 import mediapipe as mp
 import cv2
-import base64
+from arduino_parser import RadarSample, ObjectDetected, RadarTimeout, SystemInitialized, ProtocolAck, UnknownLine
+from serial_ingest import LineRingBuffer, SerialReaderThread
+from broadcast import Broadcaster, encode_camera_frame
+from detection import (DEFAULT_FACE_BACKEND, DEFAULT_HAND_BACKEND, FACE_TRACKING,
+                       DETECTOR_BACKENDS, backends_for_mode, create_detector, inference_view)
+from tracking_filters import ConstantVelocityKalman, create_smoother
+from servo_writer import ServoCommandWriter
+from camera_pipeline import FramePacket, LatestSlot, PipelineStage, StageStats
+from radar_logging import logging_stats, setup_logging, stop_logging
+from serial_transport import open_serial
+from serial_replay import SERIAL_RECORD
+from camera_sources import open_camera
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from profiling import PROFILER, span
+from occupancy_grid import PolarOccupancyGrid, SweepBuffer
+from radar_targets import TargetTracker
+from sweep_history import HISTORY_DIR, HISTORY_FLUSH_INTERVAL, SweepHistory, columns as history_columns
+
+logger = logging.getLogger(__name__)
 
 # Constants
-ARDUINO_COM_PORT = 'COM8'  # Change to your Arduino port
+ARDUINO_COM_PORT = os.environ.get("RADAR_SERIAL_PORT", 'COM8')  # Arduino port, or "emulator://..." (arduino_emulator.py)
+SERIAL_BAUD_RATE = int(os.environ.get("RADAR_SERIAL_BAUD", "115200"))  # Must match SERIAL_BAUD in RadarAndFace.ino
+SERIAL_PROTOCOL = os.environ.get("RADAR_SERIAL_PROTOCOL", "binary")     # "binary" (negotiated, falls back to text) or "text"
+SERIAL_NEGOTIATION_TIMEOUT = 5.0  # Seconds to wait for the Arduino to acknowledge the binary protocol
 MIN_RADAR_ANGLE = 15       # Góc tối thiểu của servo radar
 MAX_RADAR_ANGLE = 165      # Góc tối đa của servo radar
 DETECTION_DISTANCE = 40    # Khoảng cách phát hiện đối tượng (cm) - khớp với Arduino
 ARDUINO_DELAY = 30         # Delay time (ms) của Arduino servo giữa các bước góc
+SERIAL_BATCH_SIZE = 64     # Max serial lines handled per event loop wake-up
+RADAR_BROADCAST_HZ = float(os.environ.get("RADAR_BROADCAST_HZ", "30"))  # Coalesced radar frames per second
+CAMERA_SOURCE = os.environ.get("RADAR_CAMERA_SOURCE", "0")  # Webcam index, synthetic://, video:// or images:// (camera_sources.py)
+CAMERA_INFERENCE_WORKERS = int(os.environ.get("RADAR_CAMERA_INFERENCE_WORKERS", "1"))  # Detector threads (one MediaPipe graph each)
+CAMERA_ENCODE_WORKERS = int(os.environ.get("RADAR_CAMERA_ENCODE_WORKERS", "1"))        # JPEG encoder threads
+INFERENCE_WIDTH = int(os.environ.get("RADAR_INFERENCE_WIDTH", "640"))  # Max width (px) of the image given to MediaPipe, 0 = full frame
+INFERENCE_ROI = os.environ.get("RADAR_INFERENCE_ROI", "1") != "0"      # Crop around the last known position while tracking
+INFERENCE_ROI_SCALE = 0.6  # ROI side as a fraction of the frame height
+DETECT_EVERY = max(1, int(os.environ.get("RADAR_DETECT_EVERY", "1")))  # Run the detector on every Nth frame, predict in between
+DETECT_MAX_UNCERTAINTY = 25.0  # Run the detector early once the prediction is this uncertain (px)
+SERVO_DEADBAND = float(os.environ.get("RADAR_SERVO_DEADBAND", "4"))   # Min target movement (px) that triggers a servo command
+SERVO_MAX_RATE = float(os.environ.get("RADAR_SERVO_MAX_RATE", "25"))  # Max servo commands per second
+SMOOTHING = os.environ.get("RADAR_SMOOTHING", "alpha_beta")  # Servo target filter: "alpha_beta", "kalman" or "none"
+SMOOTHING_PARAMS = {
+    "alpha": float(os.environ.get("RADAR_SMOOTHING_ALPHA", "0.5")),
+    "beta": float(os.environ.get("RADAR_SMOOTHING_BETA", "0.1")),
+} if SMOOTHING == "alpha_beta" else {}
+SERVO_LATENCY = float(os.environ.get("RADAR_SERVO_LATENCY", "0.05"))  # Serial + servo response time (s) to lead the target by
+MAX_SERVO_LEAD = 0.25      # Never extrapolate further ahead than this (s)
+PROFILE_DUMP_PATH = os.environ.get("RADAR_PROFILE_DUMP", "radar_trace.json")  # Chrome trace written by the "profile" command
+TRACK_LOG = os.environ.get("RADAR_TRACK_LOG")  # CSV file to record tracked positions into (for benchmarks/eval_smoothing.py)
+SNAPSHOT_CACHE_SECONDS = 0.05  # Clients connecting within this window share one encoded scene snapshot
+LOOP_LAG_INTERVAL = 0.1    # Interval (s) of the event loop lag probe
+LOOP_LAG_REPORT_EVERY = 30.0  # Seconds between loop lag reports
 
 # Initialize FastAPI
 app = FastAPI(title="Web Radar Tracking System")
@@ -43,6 +89,7 @@ mode = "RADAR"  # "RADAR" or "TRACKING"
 system_message = "Initializing system..."
 tracking_position = (0, 0)
 tracking_mode = 1  # 1 = Face, 2 = Hand
+face_backend = os.environ.get("RADAR_FACE_BACKEND", DEFAULT_FACE_BACKEND)  # Detector for face tracking, see detection.DETECTOR_BACKENDS
 detected_angle = 0
 detected_distance = 0
 main_event_loop = None  # Store the main event loop
@@ -56,7 +103,36 @@ is_object_detected = False  # Add this flag to track object detection status
 waiting_for_first_radar_data = False  # Flag to indicate waiting for first radar data after mode switch
 
 # Thread safety
-serial_lock = threading.Lock()
+serial_lock = threading.Lock()  # Serializes writes; reads belong to serial_reader
+
+# Serial ingest (background reader thread + ring buffer)
+serial_buffer = LineRingBuffer()
+serial_reader = None
+serial_data_event = None  # asyncio.Event set by the reader thread when lines arrive
+serial_protocol_active = "text"  # Protocol the Arduino has acknowledged
+protocol_ack_event = None  # asyncio.Event set when the Arduino acknowledges PROTO:BIN
+
+# Sweep history on disk (sweep_history.py), None unless RADAR_HISTORY_DIR is set
+sweep_history = SweepHistory(HISTORY_DIR) if HISTORY_DIR else None
+
+# Event loop lag statistics (seconds)
+loop_lag_stats = {"samples": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+
+# Metrics updated on the hot paths (everything else is read from existing stats when /metrics is scraped)
+SERIAL_RECORDS = REGISTRY.counter("radar_serial_records_total", "Serial records handled, by record type", ["type"])
+SERIAL_PARSE_ERRORS = REGISTRY.counter("radar_serial_parse_errors_total", "Non-empty serial lines that did not parse")
+SERIAL_HANDLER_ERRORS = REGISTRY.counter("radar_serial_handler_errors_total", "Serial records whose handler raised")
+SERIAL_QUEUE_DELAY = REGISTRY.histogram("radar_serial_queue_delay_seconds", "Time from serial read to handling on the event loop")
+SERIAL_HANDLE_SECONDS = REGISTRY.histogram("radar_serial_handle_seconds", "Time to handle one serial record")
+SCENE_SNAPSHOTS = REGISTRY.counter("radar_scene_snapshots_total", "Scene snapshots sent to clients, by whether they were encoded or reused", ["source"])
+BROADCAST_MESSAGES = REGISTRY.counter("radar_broadcast_messages_total", "Messages broadcast to all clients, by kind", ["kind"])
+CAMERA_STAGE_SECONDS = REGISTRY.histogram("radar_camera_stage_seconds", "Camera pipeline time per frame, by stage", ["stage"])
+CAMERA_LATENCY = REGISTRY.histogram("radar_camera_end_to_end_seconds", "Frame capture to encoded frame published")
+SERVO_TARGETS = REGISTRY.counter("radar_servo_targets_total", "Tracking targets handed to the servo writer")
+SERVO_WRITE_SECONDS = REGISTRY.histogram("radar_servo_write_seconds", "Time to write one servo command to the serial port")
+CAPTURE_SECONDS = CAMERA_STAGE_SECONDS.labels("capture")
+INFERENCE_SECONDS = CAMERA_STAGE_SECONDS.labels("inference")
+ENCODE_SECONDS = CAMERA_STAGE_SECONDS.labels("encode")
 
 # Missing libraries check
 MISSING_LIBRARIES = []
@@ -73,17 +149,46 @@ try:
 except ImportError:
     MISSING_LIBRARIES.append("mediapipe")
 
-# Face/Hand tracking variables
-face_detector = None
-hand_detector = None
-FACE_CENTER_KEYPOINTS = [168, 6, 197, 195, 5]
-NOSE_KEYPOINTS = [1, 2, 3, 4, 5, 6, 168, 197, 195]
-WRIST_IDX = 0
-
 # Connected WebSocket clients
 connected_clients = []
 
-# Camera handling
+# Drop clients evicted by the broadcaster (dead, stalled or overflowing sockets)
+def forget_client(websocket):
+    if websocket in connected_clients:
+        connected_clients.remove(websocket)
+
+# Scene state per angle/range bin, updated by every radar sample (occupancy_grid.py)
+occupancy_grid = PolarOccupancyGrid()
+
+# Latest distance per degree, for the snapshot new clients get
+sweep_buffer = SweepBuffer()
+# Bumped by every radar frame: a snapshot is only reused while no delta went out after it
+scene_sequence = {"value": 0}
+snapshot_cache = {"time": 0.0, "mode": None, "sequence": -1, "message": None}
+
+# Targets clustered out of the sweeps and tracked across them (radar_targets.py)
+target_tracker = TargetTracker()
+targets_sent = {"version": 0}
+
+# Attach the grid rows changed since the previous frame, and the targets when they changed, to each radar frame
+def add_scene_delta(frame):
+    now = time.time()
+    scene_sequence["value"] += 1
+    rows = occupancy_grid.take_delta(now)
+    if rows:
+        frame["grid"] = rows
+    if target_tracker.version != targets_sent["version"]:
+        targets_sent["version"] = target_tracker.version
+        frame["targets"] = target_tracker.targets(now)
+
+# Per-client outbound queues; radar samples are coalesced into fixed-tick frames
+broadcaster = Broadcaster(RADAR_BROADCAST_HZ, on_evict=forget_client, frame_hook=add_scene_delta)
+
+# Detector backend for the current tracking mode
+def active_detector_backend():
+    return face_backend if tracking_mode == FACE_TRACKING else DEFAULT_HAND_BACKEND
+
+# Camera handling: this thread captures frames and feeds the inference and encode stages
 class CameraThread(threading.Thread):
     def __init__(self, loop):
         threading.Thread.__init__(self)
@@ -97,16 +202,48 @@ class CameraThread(threading.Thread):
         self.encoded_frame = None
         self.loop = loop  # Store the event loop
         
-    def run(self):
-        global tracking_position, system_message
+        # Pipeline: capture (this thread) -> inference workers -> encode workers
+        self.frame_sequence = 0
+        self.capture_stats = StageStats()
+        self.end_to_end_stats = StageStats()
+        self.inference_slot = LatestSlot("inference")
+        self.encode_slot = LatestSlot("encode")
+        self.inference_stage = PipelineStage("inference", self.inference_step, self.inference_slot,
+                                             self.encode_slot, CAMERA_INFERENCE_WORKERS)
+        self.encode_stage = PipelineStage("encode", self.encode_step, self.encode_slot,
+                                          workers=CAMERA_ENCODE_WORKERS)
         
-        print("Camera thread starting...")
+        # MediaPipe graphs are not thread-safe: every inference worker builds its own detector
+        self.detector_generation = 0
+        self.detector_local = threading.local()
+        self.detectors = []
+        self.detectors_lock = threading.Lock()
+        self.result_lock = threading.Lock()
+        self.last_applied_sequence = 0
+        
+        # Detection skipping: the filter fills in positions between detector runs
+        self.motion_filter = ConstantVelocityKalman()
+        self.frames_since_detection = 0
+        self.target = None  # Latest target features, see update_target()
+        
+        # Servo path: smoothing + latency compensation, optional track recording for eval_smoothing.py
+        self.smoother = create_smoother(SMOOTHING, **SMOOTHING_PARAMS)
+        self.track_log = None
+        if TRACK_LOG:
+            self.track_log = open(TRACK_LOG, "a", buffering=1)
+            if self.track_log.tell() == 0:
+                self.track_log.write("capture_time,x,y,latency,predicted\n")
+        self.detections_run = 0
+        self.positions_predicted = 0
+        
+    def run(self):
+        logger.info("Camera thread starting...")
         
         try:
-            # Initialize detectors
-            self.initialize_detectors()
+            self.inference_stage.start()
+            self.encode_stage.start()
             
-            # Main camera thread loop
+            # Main capture loop
             while running:
                 with self.pause_cond:
                     if self.paused:
@@ -120,95 +257,134 @@ class CameraThread(threading.Thread):
                 # Process camera if in tracking mode
                 if not self.paused and self.camera_initialized:
                     try:
+                        started = time.perf_counter()
+                        
                         # Get frame from camera
                         ret, frame = self.capture.read()
                         
                         if not ret:
                             time.sleep(0.1)
                             continue
+                        capture_time = time.time()
+                        broadcaster.camera.captured += 1
                             
                         # Flip image horizontally
                         frame = cv2.flip(frame, 1)
                         
-                        # Process for detection
-                        self.process_frame(frame)
-                        
                         # Store frame
                         self.frame = frame
                         
-                        # Convert to base64 for websocket
-                        _, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        self.encoded_frame = base64.b64encode(jpeg.tobytes()).decode('utf-8')
-                        
-                        # Send frame to clients
-                        if connected_clients and self.encoded_frame:
-                            camera_data = {
-                                "type": "camera",
-                                "image": self.encoded_frame,
-                                "tracking": {
-                                    "x": int(tracking_position[0]),
-                                    "y": int(tracking_position[1])
-                                } if tracking_position != (0, 0) else None
-                            }
-                            # Use the stored event loop instead of trying to get one in this thread
-                            asyncio.run_coroutine_threadsafe(broadcast_message(json.dumps(camera_data)), self.loop)
+                        # Hand over to the inference stage (replaces a frame it hasn't picked up yet)
+                        self.frame_sequence += 1
+                        packet = FramePacket(self.frame_sequence, frame, capture_time)
+                        elapsed = time.perf_counter() - started
+                        packet.timings["capture"] = elapsed
+                        self.capture_stats.record(elapsed)
+                        CAPTURE_SECONDS.observe(elapsed)
+                        PROFILER.record("capture", started, started + elapsed, seq=self.frame_sequence)
+                        self.inference_slot.put(packet)
                     except Exception as e:
-                        print(f"Error processing camera frame: {e}")
-                        traceback.print_exc()
+                        logger.exception("Error processing camera frame: %s", e)
                         time.sleep(0.1)
                 else:
                     time.sleep(0.1)
         except Exception as e:
-            print(f"Camera thread error: {e}")
-            traceback.print_exc()
+            logger.exception("Camera thread error: %s", e)
         finally:
             # Clean up
+            self.inference_stage.stop()
+            self.encode_stage.stop()
             if hasattr(self, 'capture') and self.capture is not None:
                 self.capture.release()
             
-            print("Camera thread exiting")
+            logger.info("Camera thread exiting")
+    
+    # Inference stage: detect the target and update tracking state
+    def inference_step(self, packet):
+        started = time.perf_counter()
+        packet.result = self.process_frame(packet.frame, packet.sequence, packet.capture_time)
+        INFERENCE_SECONDS.observe(time.perf_counter() - started)
+        return packet
     
+    # Encode stage: JPEG-encode once into the shared latest-frame slot; each client's
+    # sender pulls from it. Skip encoding while no client has taken the last frame.
+    def encode_step(self, packet):
+        if not connected_clients:
+            return None
+        if not broadcaster.camera.wanted():
+            broadcaster.camera.skipped += 1
+            return None
+        started = time.perf_counter()
+        with span("jpeg_encode", seq=packet.sequence):
+            _, jpeg = cv2.imencode('.jpg', packet.frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        with span("frame_pack", seq=packet.sequence, size=len(jpeg)):
+            self.encoded_frame = encode_camera_frame(
+                jpeg.tobytes(),
+                tracking_position if tracking_position != (0, 0) else None,
+                packet.capture_time,
+                self.target  # Replaced whole by update_target, never mutated
+            )
+        broadcaster.publish_camera_frame(self.encoded_frame)
+        ENCODE_SECONDS.observe(time.perf_counter() - started)
+        now = time.time()
+        latency = now - packet.capture_time
+        self.end_to_end_stats.record(latency)
+        CAMERA_LATENCY.observe(latency)
+        PROFILER.record_wall("capture_to_publish", packet.capture_time, now, track="camera latency", seq=packet.sequence)
+        return None
+    
+    def pipeline_stats(self):
+        return {
+            "capture": self.capture_stats.snapshot(),
+            "inference": dict(self.inference_stage.stats.snapshot(),
+                              workers=self.inference_stage.workers, dropped=self.inference_slot.dropped),
+            "encode": dict(self.encode_stage.stats.snapshot(),
+                           workers=self.encode_stage.workers, dropped=self.encode_slot.dropped),
+            "end_to_end": self.end_to_end_stats.snapshot(),
+            "detections_run": self.detections_run,
+            "positions_predicted": self.positions_predicted,
+        }
+    
+    # Rebuild the detectors (e.g. after the tracking mode changed); workers pick this up on their next frame
     def initialize_detectors(self):
-        global face_detector, hand_detector, tracking_mode
-        
+        self.detector_generation += 1
+        with self.result_lock:
+            self.motion_filter.reset()
+            self.frames_since_detection = 0
+            self.target = None
+            self.smoother.reset()
+    
+    def create_detector(self, backend):
         try:
-            # Close any existing detectors
-            if face_detector:
-                face_detector.close()
-            if hand_detector:
-                hand_detector.close()
-            
-            face_detector = None
-            hand_detector = None
-            
-            # Initialize based on mode
-            if tracking_mode == 1:
-                # Face tracking
-                face_detector = mp_face_mesh.FaceMesh(
-                    max_num_faces=1,
-                    refine_landmarks=True,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
-                print("Face detector initialized")
-            else:
-                # Hand tracking
-                hand_detector = mp_hands.Hands(
-                    model_complexity=0,
-                    max_num_hands=1,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
-                print("Hand detector initialized")
+            detector = create_detector(backend)
+            logger.info("%s detector initialized (%s)", "Face" if detector.tracking_mode == FACE_TRACKING else "Hand", backend)
         except Exception as e:
-            print(f"Error initializing detectors: {e}")
-            traceback.print_exc()
+            logger.exception("Error initializing detectors: %s", e)
+            return None
+        
+        with self.detectors_lock:
+            self.detectors.append(detector)
+        return detector
+    
+    # Detector owned by the calling worker thread, rebuilt when the tracking mode changes
+    def get_detector(self):
+        local = self.detector_local
+        if getattr(local, "generation", None) != self.detector_generation:
+            old = getattr(local, "detector", None)
+            if old is not None:
+                with self.detectors_lock:
+                    if old in self.detectors:
+                        self.detectors.remove(old)
+                old.close()
+            local.generation = self.detector_generation
+            local.detector = self.create_detector(active_detector_backend())
+        return local.detector
                 
     def initialize_camera(self):
         try:
             # Try to initialize camera (default webcam)
-            print("Initializing camera...")
-            self.capture = cv2.VideoCapture(0)
+            logger.info("Initializing camera (%s)...", CAMERA_SOURCE)
+            self.capture = open_camera(CAMERA_SOURCE)
                 
             # Set resolution
             self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
@@ -216,306 +392,424 @@ class CameraThread(threading.Thread):
                 
             # Check if camera opened successfully
             if not self.capture.isOpened():
-                print("Error: Could not open camera")
+                logger.error("Could not open camera")
                 return False
                 
-            print(f"Camera initialized with resolution: {int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
+            logger.info("Camera initialized with resolution: %dx%d",
+                        self.capture.get(cv2.CAP_PROP_FRAME_WIDTH), self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
             self.camera_initialized = True
             return True
             
         except Exception as e:
-            print(f"Camera initialization error: {e}")
-            traceback.print_exc()
+            logger.exception("Camera initialization error: %s", e)
             return False
     
-    def process_frame(self, frame):
-        global tracking_position, tracking_mode, serial_port
-        
+    # Detect the tracked object in one frame; returns its (x, y) pixel position or None
+    def process_frame(self, frame, sequence=None, capture_time=None):
         if frame is None:
-            return
+            return None
+        if capture_time is None:
+            capture_time = time.time()
         
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         frame_height, frame_width = frame.shape[:2]
         
-        self.object_detected = False
+        # Between detector runs use the filter's prediction, as long as it is still trustworthy
+        if DETECT_EVERY > 1:
+            with self.result_lock:
+                position = None
+                if (self.frames_since_detection < DETECT_EVERY - 1
+                        and self.motion_filter.uncertainty() < DETECT_MAX_UNCERTAINTY):
+                    position = self.motion_filter.predict(capture_time)
+                if position is not None:
+                    self.frames_since_detection += 1
+                    self.positions_predicted += 1
+                    self.update_target(None, position, capture_time, predicted=True)
+                    return self.apply_position(position, sequence, frame_width, frame_height, capture_time, True)
         
-        try:
-            if tracking_mode == 1 and face_detector:
-                # Face detection
-                results = face_detector.process(rgb_frame)
-                
-                if results.multi_face_landmarks:
-                    self.object_detected = True
-                    
-                    for face_landmarks in results.multi_face_landmarks:
-                        # Calculate nose position
-                        nose_x, nose_y = 0, 0
-                        for idx in NOSE_KEYPOINTS:
-                            nose_x += face_landmarks.landmark[idx].x * frame_width
-                            nose_y += face_landmarks.landmark[idx].y * frame_height
-                        nose_x /= len(NOSE_KEYPOINTS)
-                        nose_y /= len(NOSE_KEYPOINTS)
-                        
-                        # Save position
-                        self.last_position = (nose_x, nose_y)
-                        tracking_position = (nose_x, nose_y)
-                        
-                        # Send to Arduino
-                        self.send_coordinates_to_arduino(nose_x, nose_y, frame_width, frame_height)
-                        
-            elif tracking_mode == 2 and hand_detector:
-                # Hand detection
-                results = hand_detector.process(rgb_frame)
-                
-                if results.multi_hand_landmarks:
-                    self.object_detected = True
-                    
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        # Get wrist position
-                        wrist_x = hand_landmarks.landmark[WRIST_IDX].x * frame_width
-                        wrist_y = hand_landmarks.landmark[WRIST_IDX].y * frame_height
-                        
-                        # Save position
-                        self.last_position = (wrist_x, wrist_y)
-                        tracking_position = (wrist_x, wrist_y)
-                        
-                        # Send to Arduino
-                        self.send_coordinates_to_arduino(wrist_x, wrist_y, frame_width, frame_height)
+        detector = self.get_detector()
+        if detector is None:
+            return None
         
-        except Exception as e:
-            print(f"Error in frame processing: {e}")
-            traceback.print_exc()
-    
-    def send_coordinates_to_arduino(self, x, y, frame_width, frame_height):
-        global serial_port, system_message
+        # Search near the last position while the object is being tracked, else the whole frame
+        center = self.last_position if INFERENCE_ROI and self.object_detected else None
+        roi_size = frame_height * INFERENCE_ROI_SCALE
         
         try:
-            # Get lock to prevent simultaneous access
-            with serial_lock:
-                if serial_port is not None and serial_port.is_open:
-                    coordinates = f"{int(x)},{int(y)}\r"
-                    serial_port.write(coordinates.encode())
-                    print(f"Sent to Arduino: X={int(x)}, Y={int(y)}")
-                    system_message = f"Tracking: X={int(x)}, Y={int(y)}"
+            image, window = inference_view(frame, INFERENCE_WIDTH, center, roi_size, detector.color_conversion)
+            with span("detect", seq=sequence, roi=center is not None):
+                target = detector.detect(image, window)
+            if target is None and center is not None:
+                # Lost it in the ROI - look at the whole frame before giving up
+                image, window = inference_view(frame, INFERENCE_WIDTH, color_conversion=detector.color_conversion)
+                with span("detect", seq=sequence, roi=False):
+                    target = detector.detect(image, window)
         except Exception as e:
-            print(f"Error sending coordinates: {e}")
-            system_message = f"Tracking error: {str(e)}"
+            logger.exception("Error in frame processing: %s", e)
+            return None
+        
+        with self.result_lock:
+            self.detections_run += 1
+            self.frames_since_detection = 0
+            if target is None:
+                # Lost - keep detecting on every frame until it is found again
+                self.motion_filter.reset()
+                self.target = None
+                return self.apply_position(None, sequence, frame_width, frame_height, capture_time)
+            position = (target.x, target.y)
+            self.motion_filter.update(capture_time, position)
+            self.update_target(target, position, capture_time, predicted=False)
+            return self.apply_position(position, sequence, frame_width, frame_height, capture_time)
+    
+    # Per-frame target features (caller holds result_lock): point, bbox, score, velocity.
+    # A predicted frame keeps the last detected box, shifted with the predicted point.
+    # Sent to clients in the camera frame header (encode_camera_frame).
+    def update_target(self, target, position, capture_time, predicted):
+        if predicted:
+            if self.target is None:
+                return
+            dx = position[0] - self.target["detected_point"][0]
+            dy = position[1] - self.target["detected_point"][1]
+            x0, y0, x1, y1 = self.target["detected_bbox"]
+            bbox = (x0 + dx, y0 + dy, x1 + dx, y1 + dy)
+            detected_point, detected_bbox, score = self.target["detected_point"], self.target["detected_bbox"], self.target["score"]
+        else:
+            bbox = target.bbox
+            detected_point, detected_bbox, score = position, target.bbox, target.score
+        self.target = {
+            "point": position,
+            "bbox": bbox,
+            "score": score,
+            "velocity": self.motion_filter.velocity if self.motion_filter.initialized else (0.0, 0.0),
+            "predicted": predicted,
+            "timestamp": capture_time,
+            "detected_point": detected_point,
+            "detected_bbox": detected_bbox,
+        }
+    
+    # Publish a detected or predicted position (caller holds result_lock)
+    def apply_position(self, position, sequence, frame_width, frame_height, capture_time, predicted=False):
+        global tracking_position
+        
+        # With several inference workers a slow, older frame must not overwrite a newer result
+        if sequence is not None:
+            if sequence <= self.last_applied_sequence:
+                return position
+            self.last_applied_sequence = sequence
+        
+        self.object_detected = position is not None
+        if position is None:
+            return None
+        
+        # Save position (raw - it centers the next inference ROI)
+        self.last_position = position
+        
+        # Smooth, then lead the servos by the time this frame took to get here plus their response time
+        smoothed = self.smoother.update(capture_time, position)
+        latency = time.time() - capture_time
+        command = self.smoother.extrapolate(capture_time + min(latency + SERVO_LATENCY, MAX_SERVO_LEAD))
+        command = (min(max(command[0], 0.0), frame_width - 1.0), min(max(command[1], 0.0), frame_height - 1.0))
+        tracking_position = smoothed
+        
+        if self.track_log is not None:
+            self.track_log.write(f"{capture_time:.4f},{position[0]:.2f},{position[1]:.2f},{latency:.4f},{int(predicted)}\n")
+        
+        # Send to Arduino
+        self.send_coordinates_to_arduino(command[0], command[1], frame_width, frame_height)
+        
+        return position
+    
+    # Hand the target to the servo command writer (sent from its own thread, rate-limited)
+    def send_coordinates_to_arduino(self, x, y, frame_width, frame_height):
+        SERVO_TARGETS.inc()
+        servo_writer.submit(x, y)
     
     def pause(self):
         with self.pause_cond:
             self.paused = True
-            print("Camera thread paused")
+            logger.info("Camera thread paused")
     
     def resume(self):
         with self.pause_cond:
             self.paused = False
             self.pause_cond.notify()
-            print("Camera thread resumed")
+            logger.info("Camera thread resumed")
     
     def is_paused(self):
         return self.paused
     
     def cleanup(self):
         try:
+            # Stop pipeline workers
+            self.inference_stage.stop()
+            self.encode_stage.stop()
+            
             # Release camera
             if hasattr(self, 'capture') and self.capture is not None:
                 self.capture.release()
             
+            if self.track_log is not None:
+                self.track_log.close()
+                self.track_log = None
+            
             # Close detectors
-            if face_detector:
-                face_detector.close()
-            if hand_detector:
-                hand_detector.close()
+            with self.detectors_lock:
+                detectors = list(self.detectors)
+                self.detectors = []
+            for detector in detectors:
+                detector.close()
         except Exception as e:
-            print(f"Error in camera cleanup: {e}")
+            logger.exception("Error in camera cleanup: %s", e)
 
 # Initialize camera thread
 camera_thread = None
 
+# Write one servo command (called from the servo writer thread)
+def write_servo_command(x, y):
+    global system_message
+    
+    try:
+        # Get lock to prevent simultaneous access
+        with serial_lock:
+            if serial_port is not None and serial_port.is_open:
+                started = time.perf_counter()
+                serial_port.write(f"{int(x)},{int(y)}\r".encode())
+                SERVO_WRITE_SECONDS.observe(time.perf_counter() - started)
+                system_message = f"Tracking: X={int(x)}, Y={int(y)}"
+                logger.debug("Servo command X=%d Y=%d", x, y)
+    except Exception as e:
+        logger.warning("Error sending coordinates: %s", e)
+        system_message = f"Tracking error: {str(e)}"
+
+# Newest tracking target -> servos, with deadband and rate cap
+servo_writer = ServoCommandWriter(write_servo_command, SERVO_DEADBAND, SERVO_MAX_RATE)
+
 # Setup serial connection
 def setup_serial():
     global serial_port, system_message
     
     try:
-        serial_port = serial.Serial(ARDUINO_COM_PORT, 9600)
-        serial_port.timeout = 0.1
-        system_message = f"Connected to Arduino on {ARDUINO_COM_PORT}"
-        print(system_message)
+        serial_port = open_serial(ARDUINO_COM_PORT, SERIAL_BAUD_RATE, timeout=0.1)
+        system_message = f"Connected to Arduino on {ARDUINO_COM_PORT} at {SERIAL_BAUD_RATE} baud"
+        logger.info(system_message)
+        if SERIAL_RECORD:
+            logger.info("Recording the serial byte stream to %s", os.path.abspath(SERIAL_RECORD))
+        start_serial_reader()
         return True
     except serial.SerialException as e:
         system_message = f"Warning: Could not open serial port '{ARDUINO_COM_PORT}': {str(e)}"
-        print(system_message)
+        logger.info(system_message)
         return False
     except Exception as e:
         system_message = f"Error with serial port: {str(e)}"
-        print(system_message)
+        logger.info(system_message)
         return False
 
-# Serial data processing
-async def read_serial():
-    global radar_angle, radar_distance, radar_direction, mode, detected_angle, detected_distance
-    global system_message, camera_thread, last_serial_update_time, last_received_angle
-    global consecutive_static_updates, radar_moving, last_radar_data_time, is_object_detected
-    global waiting_for_first_radar_data
+# Start the background thread that owns all reads from the serial port
+def start_serial_reader():
+    global serial_reader
+    
+    def notify_loop():
+        # Called from the reader thread - wake the serial reader task
+        if main_event_loop is not None and serial_data_event is not None:
+            main_event_loop.call_soon_threadsafe(serial_data_event.set)
     
-    if serial_port is None or not serial_port.is_open:
+    serial_reader = SerialReaderThread(serial_port, serial_buffer, on_data=notify_loop)
+    serial_reader.start()
+    logger.info("Serial reader thread started")
+
+# Ask the Arduino to switch to binary frames; stay on the text protocol if it never answers
+async def negotiate_serial_protocol():
+    global serial_protocol_active
+    
+    if SERIAL_PROTOCOL != "binary" or serial_port is None:
         return
     
-    try:
-        with serial_lock:
-            if serial_port.in_waiting > 0:
-                # Read data
-                raw_data = serial_port.readline()
-                
-                try:
-                    # Try decoding with different encodings
-                    try:
-                        radar_data = raw_data.decode('utf-8').strip()
-                    except UnicodeDecodeError:
-                        radar_data = raw_data.decode('latin-1').strip()
-                    
-                    print(f"Received from Arduino: {radar_data}")  # Debug: print received data
-                    
-                    # Check for events or radar data
-                    if "Object detected at angle" in radar_data:
-                        # Extract angle and distance
-                        import re
-                        match_angle = re.search(r"angle (\d+)", radar_data)
-                        match_distance = re.search(r"distance (\d+)", radar_data)
-                        
-                        if match_angle and match_distance:
-                            detected_angle = int(match_angle.group(1))
-                            detected_distance = int(match_distance.group(1))
-                            
-                            # First broadcast the detection to radar clients
-                            await broadcast_message(json.dumps({
-                                "type": "object_detected",
-                                "angle": detected_angle,
-                                "distance": detected_distance
-                            }))
-                            
-                            # Wait a moment to let the client display the detection
-                            await asyncio.sleep(0.3)  # Giảm độ trễ
-                            
-                            # THEN switch to tracking mode
-                            if mode != "TRACKING":
-                                await switch_to_tracking_mode()
-                                
-                    elif "Timeout: Returning to radar mode" in radar_data:
-                        # Switch back to radar mode
-                        if mode != "RADAR":
-                            await switch_to_radar_mode()
-                            
-                    elif "System initialized" in radar_data:
-                        mode = "RADAR"
-                        system_message = "System initialized, radar scanning active"
-                        
-                        # Reset for a fresh start
-                        radar_angle = 15
-                        last_received_angle = 15
-                        radar_direction = 1  # Start with increasing angle
-                        radar_moving = True  # Mặc định Arduino bắt đầu với việc quét radar
-                            
-                    elif '.' in radar_data:
-                        # Arduino sends data in format "angle,distance."
-                        # Ensure we parse it correctly
-                        try:
-                            # Get portion before the dot
-                            radar_data = radar_data.split('.')[0].strip()
-                            
-                            if ',' in radar_data:
-                                parts = radar_data.split(',')
-                                if len(parts) >= 2:
-                                    try:
-                                        new_angle = int(parts[0])
-                                        new_distance = int(parts[1])
-                                        
-                                        # Thời gian nhận dữ liệu radar
-                                        current_time = time.time()
-                                        last_radar_data_time = current_time
-                                        
-                                        # Kiểm tra nếu góc thay đổi, đánh dấu radar đang di chuyển
-                                        if abs(last_received_angle - new_angle) > 1:
-                                            radar_moving = True
-                                            consecutive_static_updates = 0  # Reset bộ đếm
-                                            print(f"Radar is moving. Angle changed from {last_received_angle} to {new_angle}")
-                                            
-                                            # Determine radar direction based on angle change
-                                            if new_angle > last_received_angle:
-                                                radar_direction = 1  # Increasing angles (e.g., 15 to 165)
-                                            else:
-                                                radar_direction = -1  # Decreasing angles (e.g., 165 to 15)
-                                        else:
-                                            # Góc không thay đổi, tăng bộ đếm
-                                            consecutive_static_updates += 1
-                                            
-                                            # Nếu nhận được nhiều cập nhật liên tiếp với cùng một góc, có thể servo đang dừng
-                                            if consecutive_static_updates > 5:
-                                                radar_moving = False
-                                                print(f"Radar stopped. Angle stable at {new_angle}")
-                                        
-                                        # Lưu góc nhận được để so sánh lần sau
-                                        last_received_angle = new_angle
-                                        
-                                        # Always update radar values
-                                        radar_angle = new_angle
-                                        radar_distance = new_distance
-                                        last_serial_update_time = current_time
-                                        
-                                        # Enforce limits
-                                        if radar_angle < MIN_RADAR_ANGLE:
-                                            radar_angle = MIN_RADAR_ANGLE
-                                        elif radar_angle > MAX_RADAR_ANGLE:
-                                            radar_angle = MAX_RADAR_ANGLE
-                                            
-                                        # Check if we should highlight potential object detection
-                                        detection_highlight = radar_distance < DETECTION_DISTANCE
-                                        
-                                        # IMPORTANT: Always broadcast to ensure radar moves
-                                        await broadcast_message(json.dumps({
-                                            "type": "radar",
-                                            "angle": radar_angle,
-                                            "distance": radar_distance,
-                                            "mode": mode,
-                                            "direction": radar_direction,
-                                            "detection": detection_highlight,
-                                            "moving": radar_moving,
-                                            "timestamp": current_time
-                                        }))
-                                        
-                                        if waiting_for_first_radar_data and mode == "RADAR":
-                                            waiting_for_first_radar_data = False
-                                            system_message = "✅ Radar data received from Arduino, resuming normal operation"
-                                            print("✅ First radar data received after mode switch - unfreezing radar")
-                                            
-                                            # Update detection_highlight correctly using is_object_detected
-                                            is_object_detected = detection_highlight
-                                            
-                                            # IMPORTANT: Always broadcast to ensure radar moves
-                                            await broadcast_message(json.dumps({
-                                                "type": "radar",
-                                                "angle": radar_angle,
-                                                "distance": radar_distance,
-                                                "mode": mode,
-                                                "direction": radar_direction,
-                                                "detection": detection_highlight,
-                                                "moving": radar_moving,
-                                                "timestamp": current_time,
-                                                "first_data_after_switch": True,
-                                                "resume_animation": True  # Tell frontend to resume animation
-                                            }))
-                                        
-                                    except ValueError:
-                                        print(f"Error parsing values: '{parts}'")
-                                        pass  # Ignore invalid data
-                        except Exception as e:
-                            print(f"Error parsing radar data '{radar_data}': {e}")
-                except Exception as e:
-                    print(f"Error parsing serial data: {e}")
-    except Exception as e:
-        print(f"Serial communication error: {e}")
-        system_message = f"Serial error: {str(e)}"
+    serial_protocol_active = "text"
+    protocol_ack_event.clear()
+    deadline = time.time() + SERIAL_NEGOTIATION_TIMEOUT
+    
+    # Opening the port resets most Arduinos, so repeat the request until the sketch is listening
+    while time.time() < deadline:
+        try:
+            with serial_lock:
+                if serial_port is None or not serial_port.is_open:
+                    return
+                serial_port.write(b"PROTO:BIN\r")
+        except Exception as e:
+            logger.warning("Error requesting binary protocol: %s", e)
+            return
+        
+        try:
+            await asyncio.wait_for(protocol_ack_event.wait(), timeout=0.5)
+            return
+        except asyncio.TimeoutError:
+            pass
+    
+    logger.warning("Arduino did not acknowledge the binary protocol, using text protocol")
+
+# Serial data processing - drain a batch of records parsed by the reader thread
+async def read_serial():
+    global system_message
+    
+    if serial_reader is not None and serial_reader.error is not None:
+        system_message = f"Serial error: {str(serial_reader.error)}"
+        serial_reader.error = None
+    
+    batch = serial_buffer.drain(SERIAL_BATCH_SIZE)
+    now = time.time()
+    for received_time, record in batch:
+        SERIAL_QUEUE_DELAY.observe(now - received_time)
+        SERIAL_RECORDS.labels(type(record).__name__).inc()
+        # Blank lines are not errors; known status lines parse as StatusMessage
+        if isinstance(record, UnknownLine) and record.text:
+            SERIAL_PARSE_ERRORS.inc()
+        started = time.perf_counter()
+        try:
+            await handle_serial_record(record, received_time)
+        except Exception as e:
+            SERIAL_HANDLER_ERRORS.inc()
+            logger.warning("Error handling serial data %s: %s", record, e)
+        finished = time.perf_counter()
+        SERIAL_HANDLE_SECONDS.observe(finished - started)
+        PROFILER.record("serial_handle", started, finished, type=type(record).__name__)
+    
+    return len(batch)
+
+# Handle one parsed record received from Arduino
+async def handle_serial_record(record, received_time):
+    global mode, detected_angle, detected_distance, system_message
+    global radar_angle, last_received_angle, radar_direction, radar_moving, serial_protocol_active
+    
+    logger.debug("Received from Arduino: %s", record)
+    
+    # Radar samples are by far the most frequent record, check them first
+    if isinstance(record, RadarSample):
+        await handle_radar_sample(record.angle, record.distance, received_time)
+    
+    elif isinstance(record, ObjectDetected):
+        detected_angle = record.angle
+        detected_distance = record.distance
+        
+        # First broadcast the detection to radar clients, with the target it belongs to if one is tracked
+        detection_message = {
+            "type": "object_detected",
+            "angle": detected_angle,
+            "distance": detected_distance
+        }
+        target = target_tracker.nearest(detected_angle, detected_distance)
+        if target is not None:
+            detection_message["target_id"] = target.id
+        await broadcast_message(json.dumps(detection_message))
+        
+        # Wait a moment to let the client display the detection
+        await asyncio.sleep(0.3)  # Giảm độ trễ
+        
+        # THEN switch to tracking mode
+        if mode != "TRACKING":
+            await switch_to_tracking_mode()
+    
+    elif isinstance(record, RadarTimeout):
+        # Switch back to radar mode
+        if mode != "RADAR":
+            await switch_to_radar_mode()
+    
+    elif isinstance(record, SystemInitialized):
+        mode = "RADAR"
+        system_message = "System initialized, radar scanning active"
+        
+        # Reset for a fresh start
+        radar_angle = 15
+        last_received_angle = 15
+        radar_direction = 1  # Start with increasing angle
+        radar_moving = True  # Mặc định Arduino bắt đầu với việc quét radar
+        
+        # The sketch restarts in text mode - negotiate again
+        if SERIAL_PROTOCOL == "binary" and serial_protocol_active != "text":
+            asyncio.create_task(negotiate_serial_protocol())
+    
+    elif isinstance(record, ProtocolAck):
+        serial_protocol_active = "binary" if record.protocol == "BIN" else "text"
+        logger.info("Arduino serial protocol: %s", serial_protocol_active)
+        if serial_protocol_active == "binary":
+            protocol_ack_event.set()
+
+# Arduino sends radar data in format "angle,distance."
+async def handle_radar_sample(new_angle, new_distance, received_time):
+    global radar_angle, radar_distance, radar_direction, system_message, last_serial_update_time
+    global last_received_angle, consecutive_static_updates, radar_moving, last_radar_data_time
+    global is_object_detected, waiting_for_first_radar_data
+    
+    # Thời gian nhận dữ liệu radar (stamped by the reader thread)
+    current_time = received_time
+    last_radar_data_time = current_time
+    
+    # Kiểm tra nếu góc thay đổi, đánh dấu radar đang di chuyển
+    if abs(last_received_angle - new_angle) > 1:
+        radar_moving = True
+        consecutive_static_updates = 0  # Reset bộ đếm
+        logger.debug("Radar is moving. Angle changed from %s to %s", last_received_angle, new_angle)
+        
+        # Determine radar direction based on angle change
+        if new_angle > last_received_angle:
+            radar_direction = 1  # Increasing angles (e.g., 15 to 165)
+        else:
+            radar_direction = -1  # Decreasing angles (e.g., 165 to 15)
+    else:
+        # Góc không thay đổi, tăng bộ đếm
+        consecutive_static_updates += 1
+        
+        # Nếu nhận được nhiều cập nhật liên tiếp với cùng một góc, có thể servo đang dừng
+        if consecutive_static_updates > 5:
+            radar_moving = False
+            logger.debug("Radar stopped. Angle stable at %s", new_angle)
+    
+    # Lưu góc nhận được để so sánh lần sau
+    last_received_angle = new_angle
+    
+    # Always update radar values
+    radar_angle = new_angle
+    radar_distance = new_distance
+    last_serial_update_time = current_time
+    
+    # Enforce limits
+    if radar_angle < MIN_RADAR_ANGLE:
+        radar_angle = MIN_RADAR_ANGLE
+    elif radar_angle > MAX_RADAR_ANGLE:
+        radar_angle = MAX_RADAR_ANGLE
+        
+    # Highlight a detection once the grid has seen the object on more than one echo
+    occupancy_grid.update(radar_angle, radar_distance, current_time)
+    sweep_buffer.update(radar_angle, radar_distance, current_time)
+    target_tracker.add_sample(radar_angle, radar_distance, current_time)
+    detection_highlight = occupancy_grid.detected(radar_angle, DETECTION_DISTANCE, current_time)
+    
+    if sweep_history is not None:
+        sweep_history.append(current_time, radar_angle, radar_distance, mode, detection_highlight)
+    
+    radar_update = {
+        "type": "radar",
+        "angle": radar_angle,
+        "distance": radar_distance,
+        "mode": mode,
+        "direction": radar_direction,
+        "detection": detection_highlight,
+        "moving": radar_moving,
+        "timestamp": current_time
+    }
+    
+    if waiting_for_first_radar_data and mode == "RADAR":
+        waiting_for_first_radar_data = False
+        system_message = "✅ Radar data received from Arduino, resuming normal operation"
+        logger.info("✅ First radar data received after mode switch - unfreezing radar")
+        
+        # Update detection_highlight correctly using is_object_detected
+        is_object_detected = detection_highlight
+        
+        radar_update["first_data_after_switch"] = True
+        radar_update["resume_animation"] = True  # Tell frontend to resume animation
+    
+    # IMPORTANT: Always broadcast to ensure radar moves (sent with the next coalesced frame)
+    broadcaster.update(radar_update, (radar_angle, radar_distance))
 
 # Mode switching
 async def switch_to_tracking_mode():
@@ -523,7 +817,10 @@ async def switch_to_tracking_mode():
     
     mode = "TRACKING"
     system_message = "Object detected! Switching to tracking mode"
-    print(system_message)
+    logger.info(system_message)
+    
+    # The servos may have been moved by the sketch since the last command - resend the first target
+    servo_writer.reset()
     
     # Start camera if needed
     if camera_thread and camera_thread.is_paused():
@@ -543,11 +840,13 @@ async def switch_to_radar_mode():
     
     mode = "RADAR"
     system_message = "Returning to radar scanning mode - WAITING for radar data from Arduino"
-    print(system_message)
+    logger.info(system_message)
     
     # Pause camera
     if camera_thread and not camera_thread.is_paused():
         camera_thread.pause()
+    # Don't show the last tracking image to clients that connect later
+    broadcaster.camera.clear()
     
     # COMPLETELY reset all radar state to ensure no movement
     radar_moving = False
@@ -560,7 +859,10 @@ async def switch_to_radar_mode():
     using_simulated_values = False  # Ensure we're not using simulated values
     
     # Force a complete wait for real Arduino data
-    print("🛑 RADAR FROZEN - Waiting for fresh Arduino data before resuming")
+    logger.info("🛑 RADAR FROZEN - Waiting for fresh Arduino data before resuming")
+    
+    # Drop radar frames that are still pending so nothing stale follows the freeze
+    broadcaster.reset()
     
     # Notify clients with current position (HARD FROZEN until we get Arduino data)
     await broadcast_message(json.dumps({
@@ -576,53 +878,193 @@ async def switch_to_radar_mode():
         "stop_animation": True  # Tell frontend to completely stop animation
     }))
 
-# Broadcast to all WebSocket clients
-async def broadcast_message(message):
-    for client in connected_clients:
-        try:
-            await client.send_text(message)
-        except Exception as e:
-            print(f"Error broadcasting message: {e}")
+# Encoded scene snapshot for a new client; reused for everyone connecting within SNAPSHOT_CACHE_SECONDS
+# and before the next radar frame, so a burst of reconnects costs one encode and nobody misses a delta
+def scene_snapshot():
+    now = time.time()
+    if (snapshot_cache["message"] is not None and snapshot_cache["mode"] == mode
+            and snapshot_cache["sequence"] == scene_sequence["value"]
+            and now - snapshot_cache["time"] < SNAPSHOT_CACHE_SECONDS):
+        SCENE_SNAPSHOTS.labels("cached").inc()
+        return snapshot_cache["message"]
+    
+    snapshot = {
+        "type": "snapshot",
+        "mode": mode,
+        "grid": occupancy_grid.snapshot(now),
+        "sweep": sweep_buffer.snapshot(now),
+        "targets": target_tracker.targets(now),
+        "timestamp": now
+    }
+    # Radar position only while scanning (a client in tracking mode keeps the detected angle)
+    if mode == "RADAR":
+        snapshot["radar"] = {
+            "type": "radar",
+            "angle": radar_angle,
+            "distance": radar_distance,
+            "mode": mode,
+            "direction": radar_direction,
+            "detection": occupancy_grid.detected(radar_angle, DETECTION_DISTANCE, now),
+            "moving": radar_moving,
+            "timestamp": now
+        }
+    with span("snapshot_encode"):
+        message = json.dumps(snapshot)
+    snapshot_cache.update(time=now, mode=mode, sequence=scene_sequence["value"], message=message)
+    SCENE_SNAPSHOTS.labels("encoded").inc()
+    return message
+
+# Broadcast to all WebSocket clients - queued per client, never waits for a slow socket
+async def broadcast_message(message, kind=None):
+    BROADCAST_MESSAGES.labels(kind or "message").inc()
+    broadcaster.broadcast(message, kind)
 
 # Serve main page
 @app.get("/", response_class=HTMLResponse)
 async def get_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# Counters kept by the serial, broadcast, camera and servo components, read at scrape time
+def collect_component_metrics():
+    samples = []
+    
+    def add(name, kind, documentation, values):
+        samples.append((name, kind, documentation, values))
+    
+    add("radar_serial_bytes_total", "counter", "Bytes read from the serial port",
+        [({}, serial_reader.bytes_read if serial_reader else 0)])
+    add("radar_serial_buffer_records_total", "counter", "Records pushed into the serial ring buffer",
+        [({}, serial_buffer.pushed)])
+    add("radar_serial_buffer_dropped_total", "counter", "Records overwritten in the serial ring buffer before handling",
+        [({}, serial_buffer.dropped)])
+    add("radar_serial_buffer_depth", "gauge", "Records waiting in the serial ring buffer", [({}, len(serial_buffer))])
+    if serial_reader is not None:
+        decoder = serial_reader.decoder
+        add("radar_serial_bad_frames_total", "counter", "Binary serial frames with a bad checksum or type",
+            [({}, decoder.bad_frames)])
+    
+    stats = broadcaster.stats()
+    add("radar_ws_clients", "gauge", "Connected WebSocket clients", [({}, stats["clients"])])
+    add("radar_ws_queue_depth_max", "gauge", "Deepest per-client outbound queue", [({}, stats["queue_depth_max"])])
+    add("radar_ws_messages_sent_total", "counter", "Messages sent to WebSocket clients", [({}, stats["sent"])])
+    add("radar_ws_frames_sent_total", "counter", "Stream frames sent to WebSocket clients, by kind",
+        [({"kind": kind}, count) for kind, count in stats["frames_sent"].items()])
+    add("radar_ws_frames_dropped_total", "counter", "Stream frames replaced before a client could take them, by kind",
+        [({"kind": kind}, count) for kind, count in stats["dropped"].items()])
+    add("radar_ws_evicted_total", "counter", "Clients evicted for stalling or overflowing", [({}, stats["evicted"])])
+    add("radar_radar_frames_total", "counter", "Coalesced radar frames broadcast", [({}, stats["radar_frames"])])
+    add("radar_camera_frames_total", "counter", "Camera frames by pipeline outcome",
+        [({"outcome": "captured"}, stats["camera_captured"]),
+         ({"outcome": "encoded"}, stats["camera_encoded"]),
+         ({"outcome": "skipped"}, stats["camera_skipped"])])
+    
+    if camera_thread is not None:
+        add("radar_camera_frames_dropped_total", "counter", "Frames replaced before a pipeline stage picked them up",
+            [({"stage": "inference"}, camera_thread.inference_slot.dropped),
+             ({"stage": "encode"}, camera_thread.encode_slot.dropped)])
+        add("radar_camera_stage_errors_total", "counter", "Exceptions in a camera pipeline stage",
+            [({"stage": "inference"}, camera_thread.inference_stage.errors),
+             ({"stage": "encode"}, camera_thread.encode_stage.errors)])
+        add("radar_detections_total", "counter", "Frames by how the target was found",
+            [({"source": "detector"}, camera_thread.detections_run),
+             ({"source": "predicted"}, camera_thread.positions_predicted)])
+    
+    servo = servo_writer.stats()
+    add("radar_servo_commands_total", "counter", "Servo targets by what the writer did with them",
+        [({"outcome": outcome}, servo[outcome]) for outcome in ("sent", "suppressed", "superseded", "errors")])
+    
+    add("radar_event_loop_lag_seconds_max", "gauge", "Largest event loop wake-up delay since start",
+        [({}, loop_lag_stats["max"])])
+    add("radar_event_loop_lag_seconds_last", "gauge", "Last event loop wake-up delay", [({}, loop_lag_stats["last"])])
+    log = logging_stats()
+    add("radar_log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+        [({}, log["dropped"])])
+    add("radar_log_records_suppressed_total", "counter", "Log records suppressed by the rate limit",
+        [({}, log["suppressed"])])
+    grid = occupancy_grid.stats()
+    add("radar_grid_samples_total", "counter", "Radar samples applied to the occupancy grid", [({}, grid["samples"])])
+    add("radar_grid_rows_sent_total", "counter", "Occupancy grid rows sent in radar frames", [({}, grid["rows_sent"])])
+    targets = target_tracker.stats()
+    add("radar_targets", "gauge", "Tracked radar targets, by whether they are confirmed",
+        [({"state": "confirmed"}, targets["confirmed"]), ({"state": "tentative"}, targets["tracks"] - targets["confirmed"])])
+    add("radar_target_detections_total", "counter", "Clusters extracted from the radar sweeps", [({}, targets["detections"])])
+    add("radar_target_tracks_created_total", "counter", "Radar target tracks started", [({}, targets["created"])])
+    if sweep_history is not None:
+        history = sweep_history.stats()
+        add("radar_history_records_total", "counter", "Radar samples appended to the sweep history",
+            [({}, history["appended"])])
+        add("radar_history_segments", "gauge", "Closed sweep history segments on disk", [({}, history["segments"])])
+        add("radar_history_bytes", "gauge", "Size of the closed sweep history segments", [({}, history["bytes"])])
+    add("radar_mode", "gauge", "1 for the current mode", [({"mode": "RADAR"}, int(mode == "RADAR")),
+                                                          ({"mode": "TRACKING"}, int(mode == "TRACKING"))])
+    return samples
+
+REGISTRY.register_collector("app", collect_component_metrics)
+
+# Chrome trace of the recorded spans (open in chrome://tracing or ui.perfetto.dev)
+@app.get("/profile/trace")
+async def get_profile_trace():
+    return Response(json.dumps(PROFILER.chrome_trace(), default=str), media_type="application/json",
+                    headers={"Content-Disposition": "attachment; filename=radar_trace.json"})
+
+# Recorded radar samples, e.g. /history?start=1700000000&min_angle=80&max_angle=100&limit=5000
+# JSON columns by default, format=npy for the raw structured array (np.load)
+@app.get("/history")
+async def get_history(start: Optional[float] = None, end: Optional[float] = None,
+                      min_angle: Optional[int] = None, max_angle: Optional[int] = None,
+                      limit: int = 10000, format: str = "json"):
+    if sweep_history is None:
+        return Response(json.dumps({"error": "History is off, set RADAR_HISTORY_DIR"}), status_code=404,
+                        media_type="application/json")
+    if limit <= 0:
+        return Response(json.dumps({"error": "limit must be positive"}), status_code=400,
+                        media_type="application/json")
+    rows = await asyncio.to_thread(sweep_history.query, start, end, min_angle, max_angle, limit)
+    if format == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, rows)
+        return Response(buffer.getvalue(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": "attachment; filename=radar_history.npy"})
+    return Response(json.dumps({"count": len(rows), "samples": history_columns(rows)}),
+                    media_type="application/json")
+
+# Prometheus metrics
+@app.get("/metrics")
+async def get_metrics():
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    global tracking_mode, face_backend
     await websocket.accept()
     
     # Add to connected clients
     connected_clients.append(websocket)
+    broadcaster.add_client(websocket)
     
     try:
-        # Send initial data
-        await websocket.send_json({
+        # Send initial data (through the client's channel, so it stays ordered with broadcasts)
+        broadcaster.send(websocket, json.dumps({
             "type": "init",
             "mode": mode,
             "angle": radar_angle,
             "distance": radar_distance,
             "message": system_message,
             "missing_libraries": MISSING_LIBRARIES,
+            "tracking_mode": tracking_mode,
+            "face_backend": face_backend,
+            "face_backends": [{"name": name, "label": DETECTOR_BACKENDS[name].label}
+                              for name in backends_for_mode(FACE_TRACKING)],
+            "profiling": PROFILER.enabled,
+            "grid": occupancy_grid.config(),
             "direction": radar_direction,  # Ensure direction is sent
             "moving": radar_moving,  # Send radar moving state
             "timestamp": time.time()
-        })
+        }))
         
-        # Immediately send a radar update to ensure the client has the latest position
-        if mode == "RADAR":
-            await websocket.send_json({
-                "type": "radar",
-                "angle": radar_angle,
-                "distance": radar_distance,
-                "mode": mode,
-                "direction": radar_direction,
-                "detection": radar_distance < DETECTION_DISTANCE,
-                "moving": radar_moving,  # Include current moving state
-                "timestamp": time.time()
-            })
+        # Immediately send the whole scene (grid, last sweep, radar position); radar frames follow as deltas
+        broadcaster.send(websocket, scene_snapshot())
         
         # Main client message loop
         while True:
@@ -639,94 +1081,136 @@ async def websocket_endpoint(websocket: WebSocket):
                         await switch_to_tracking_mode()
                 
                 elif command == "tracking_type":
+                    # {"type": 1|2} and optionally {"backend": name} for face tracking
                     tracking_type = data.get("type")
-                    if tracking_type in [1, 2]:
-                        global tracking_mode
+                    backend = data.get("backend")
+                    if tracking_type in [1, 2] and (backend is None or backend in backends_for_mode(tracking_type)):
                         tracking_mode = tracking_type
+                        if backend is not None and tracking_mode == FACE_TRACKING:
+                            face_backend = backend
                         # Initialize appropriate detector
                         if camera_thread:
                             camera_thread.initialize_detectors()
                         
                         await broadcast_message(json.dumps({
                             "type": "system_message",
-                            "message": f"Changed tracking mode to {('Face' if tracking_mode == 1 else 'Hand')} tracking"
+                            "message": f"Changed tracking mode to {('Face' if tracking_mode == 1 else 'Hand')} tracking ({active_detector_backend()})"
+                        }))
+                    else:
+                        broadcaster.send(websocket, json.dumps({
+                            "type": "system_message",
+                            "message": f"Unknown tracking type {tracking_type!r} / backend {backend!r}"
                         }))
                         
                 elif command == "get_radar_status":
-                    # Client is requesting current radar status - useful after page refresh or reconnection
-                    await websocket.send_json({
-                        "type": "radar",
-                        "angle": radar_angle,
-                        "distance": radar_distance,
-                        "mode": mode,
-                        "direction": radar_direction,
-                        "detection": radar_distance < DETECTION_DISTANCE,
-                        "moving": radar_moving,
-                        "timestamp": time.time()
-                    })
+                    # Client is requesting current radar status - same snapshot as on connect
+                    broadcaster.send(websocket, scene_snapshot())
+                
+                elif command == "profile":
+                    # {"action": "start" | "stop" | "clear" | "dump" | "status"}
+                    action = data.get("action", "status")
+                    reply = {"type": "profile", "action": action}
+                    if action == "start":
+                        PROFILER.start()
+                    elif action == "stop":
+                        PROFILER.stop()
+                    elif action == "clear":
+                        PROFILER.clear()
+                    elif action == "dump":
+                        reply["events"] = await asyncio.to_thread(PROFILER.dump, PROFILE_DUMP_PATH)
+                        reply["path"] = os.path.abspath(PROFILE_DUMP_PATH)
+                    reply.update(PROFILER.stats())
+                    broadcaster.send(websocket, json.dumps(reply))
+                    if action in ("start", "stop"):
+                        # Browsers report their receive/render spans only while profiling
+                        await broadcast_message(json.dumps({"type": "profiling", "enabled": PROFILER.enabled}))
+                
+                elif command == "profile_client":
+                    # Spans measured in the browser: [{"name", "start", "end", ...}] in wall-clock seconds
+                    track = f"browser {id(websocket) & 0xFFFF:04x}"
+                    for event in data.get("spans", [])[:1000]:
+                        PROFILER.record_wall(str(event["name"]), float(event["start"]), float(event["end"]), track=track,
+                                             **{k: v for k, v in event.items() if k not in ("name", "start", "end")})
                 
                 elif command == "shoot":
                     # Xử lý lệnh bắn
                     success = await send_shoot_command()
-                    await websocket.send_json({
+                    broadcaster.send(websocket, json.dumps({
                         "type": "shoot_response",
                         "success": success,
                         "message": system_message
-                    })
+                    }))
                 
             except json.JSONDecodeError:
-                print(f"Invalid JSON received: {message}")
+                logger.warning("Invalid JSON received: %s", message)
             except Exception as e:
-                print(f"Error processing client message: {e}")
-                traceback.print_exc()
+                logger.exception("Error processing client message: %s", e)
     
     except WebSocketDisconnect:
-        # Remove from connected clients
-        connected_clients.remove(websocket)
-        print("Client disconnected from WebSocket")
+        # Remove from connected clients (may already be gone if it was evicted)
+        if websocket in connected_clients:
+            connected_clients.remove(websocket)
+        broadcaster.remove_client(websocket)
+        logger.info("Client disconnected from WebSocket")
     except Exception as e:
         # Handle other exceptions
-        print(f"WebSocket error: {e}")
-        traceback.print_exc()
+        logger.exception("WebSocket error: %s", e)
         
         # Try to remove client if still in list
         if websocket in connected_clients:
             connected_clients.remove(websocket)
+        broadcaster.remove_client(websocket)
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    global camera_thread, main_event_loop, radar_angle, radar_direction
+    global camera_thread, main_event_loop, radar_angle, radar_direction, serial_data_event
+    global protocol_ack_event
     
-    print("\n" + "=" * 50)
-    print("    WEB RADAR AND OBJECT TRACKING SYSTEM")
-    print("=" * 50 + "\n")
-    
-    print("Starting system initialization...")
+    setup_logging()
+    logger.info("WEB RADAR AND OBJECT TRACKING SYSTEM - starting system initialization...")
     
     if MISSING_LIBRARIES:
-        print(f"Warning: Missing libraries: {', '.join(MISSING_LIBRARIES)}")
-        print(f"Some features may not work. Install with: pip install {' '.join(MISSING_LIBRARIES)}")
+        logger.warning("Missing libraries: %s. Some features may not work. Install with: pip install %s",
+                       ", ".join(MISSING_LIBRARIES), " ".join(MISSING_LIBRARIES))
     
     # Store the main event loop for use in other threads
     main_event_loop = asyncio.get_running_loop()
+    serial_data_event = asyncio.Event()
+    protocol_ack_event = asyncio.Event()
     
     # Initialize radar angle to starting position
     radar_angle = MIN_RADAR_ANGLE
     radar_direction = 1
     
+    # Open the sweep history before the first samples arrive
+    if sweep_history is not None:
+        await asyncio.to_thread(sweep_history.open)
+        logger.info("Recording sweep history to %s", os.path.abspath(sweep_history.directory))
+        asyncio.create_task(history_maintenance_task())
+    
     # Initialize serial
     setup_serial()
     
     # Create and start camera thread (initially paused)
     camera_thread = CameraThread(main_event_loop)
     camera_thread.start()
+    servo_writer.start()
     
     # Start in radar mode
     await switch_to_radar_mode()
     
     # Start serial reading task
     asyncio.create_task(serial_reader_task())
+    
+    # Switch the link to binary frames if configured
+    asyncio.create_task(negotiate_serial_protocol())
+    
+    # Start coalesced radar broadcasts
+    asyncio.create_task(broadcaster.run())
+    
+    # Start event loop lag probe
+    asyncio.create_task(loop_lag_monitor())
 
 # Background task to read serial data
 async def serial_reader_task():
@@ -739,17 +1223,28 @@ async def serial_reader_task():
     radar_moving = False  # Start with radar not moving until we get data
     is_object_detected = False
     
-    print(f"Starting serial reader task with initial angle: {radar_angle}")
+    logger.info("Starting serial reader task with initial angle: %s", radar_angle)
     
     while True:
-        # Đọc dữ liệu từ cổng serial nếu có
+        # Wait until the reader thread signals new lines (or time out to run the checks below)
+        try:
+            await asyncio.wait_for(serial_data_event.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+        serial_data_event.clear()
+        
+        # Xử lý các dòng dữ liệu serial đã nhận
         await read_serial()
         
+        # More lines than one batch - come back without waiting
+        if len(serial_buffer) > 0:
+            serial_data_event.set()
+        
         # If we haven't received radar data in a while, explicitly mark it as not moving
         if time.time() - last_radar_data_time > 1.0 and radar_moving:
             radar_moving = False
             # Notify clients that radar has stopped moving
-            await broadcast_message(json.dumps({
+            broadcaster.update({
                 "type": "radar",
                 "angle": radar_angle,
                 "distance": radar_distance,
@@ -758,17 +1253,54 @@ async def serial_reader_task():
                 "detection": is_object_detected,  # Use the correct variable
                 "moving": False,
                 "timestamp": time.time()
-            }))
+            })
+        
+        # Yield to other tasks between batches
+        await asyncio.sleep(0)
+
+# Measure how late the event loop wakes up a sleeping task
+async def loop_lag_monitor():
+    last_report = time.perf_counter()
+    
+    while running:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+        
+        loop_lag_stats["samples"] += 1
+        loop_lag_stats["total"] += lag
+        loop_lag_stats["last"] = lag
+        if lag > loop_lag_stats["max"]:
+            loop_lag_stats["max"] = lag
         
-        # Đợi một khoảng thời gian ngắn để không quá tải CPU
-        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        if now - last_report >= LOOP_LAG_REPORT_EVERY:
+            last_report = now
+            samples = loop_lag_stats["samples"]
+            logger.info("Event loop lag: avg=%.2fms max=%.2fms over %d samples, serial lines=%d dropped=%d",
+                        loop_lag_stats["total"] / samples * 1000, loop_lag_stats["max"] * 1000, samples,
+                        serial_buffer.pushed, serial_buffer.dropped)
+            logger.info("Broadcast: %s", broadcaster.stats())
+            logger.info("Logging: %s", logging_stats())
+            if camera_thread and not camera_thread.is_paused():
+                logger.info("Camera pipeline: %s", camera_thread.pipeline_stats())
+                logger.info("Servo commands: %s", servo_writer.stats())
+
+# Flush the sweep history and apply rotation / retention off the event loop
+async def history_maintenance_task():
+    while running:
+        await asyncio.sleep(HISTORY_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(sweep_history.maintain)
+        except Exception as e:
+            logger.exception("Sweep history maintenance error: %s", e)
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     global running, camera_thread, serial_port
     
-    print("\nShutting down system...")
+    logger.info("Shutting down system...")
     
     # Stop threads
     running = False
@@ -777,12 +1309,22 @@ async def shutdown_event():
     if camera_thread:
         camera_thread.cleanup()
     
+    # Stop the writer threads and the serial reader before closing the port
+    servo_writer.stop()
+    
+    if serial_reader:
+        serial_reader.stop()
+    
+    if sweep_history is not None:
+        sweep_history.close()
+    
     # Close serial port
     if serial_port and serial_port.is_open:
         serial_port.close()
-        print("Serial port closed")
+        logger.info("Serial port closed")
     
-    print("System shutdown complete")
+    logger.info("System shutdown complete")
+    stop_logging()
 
 # Hàm gửi lệnh bắn cho Arduino
 async def send_shoot_command():
@@ -794,7 +1336,7 @@ async def send_shoot_command():
                 # Gửi lệnh SHOOT
                 serial_port.write(b"SHOOT\r")
                 system_message = "Shoot command sent to Arduino"
-                print(system_message)
+                logger.info(system_message)
                 
                 # Thông báo cho tất cả client
                 await broadcast_message(json.dumps({
@@ -805,12 +1347,11 @@ async def send_shoot_command():
                 return True
             else:
                 system_message = "Cannot send shoot command - Serial port not connected"
-                print(system_message)
+                logger.info(system_message)
                 return False
     except Exception as e:
         system_message = f"Error sending shoot command: {str(e)}"
-        print(system_message)
-        traceback.print_exc()
+        logger.exception(system_message)
         return False
 
 # Run app
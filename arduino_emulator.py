@@ -0,0 +1,359 @@
+"""
+Software stand-in for the Arduino running RadarAndFace.ino.
+
+``EmulatedArduino`` behaves like an open ``serial.Serial`` (``read``,
+``readline``, ``write``, ``in_waiting``, ``timeout``, ``is_open``, ``close``;
+``serial_buffer.BufferedSerial``) while a background thread runs the sketch's state machine:
+
+- the radar sweep between MIN_RADAR_ANGLE and MAX_RADAR_ANGLE, one sample
+  every ``step_ms`` (RADAR_DELAY in the sketch), text or binary frames after
+  ``PROTO:BIN``
+- echoes from emulated objects (``objects``: (angle, distance) pairs), the
+  3-sample debounce and the "Object detected" line
+- tracking mode: "x,y" commands move the emulated pan/tilt servos and are
+  answered with face tracking feedback; "Timeout" after COMMAND_TIMEOUT
+  without commands
+- SHOOT, PROTO:BIN / PROTO:TEXT and SET_ANGLE:n
+
+``speed`` scales every sketch timing (2 = everything twice as fast); use
+``step_ms`` to speed up only the sweep. ``baud`` caps the output rate like a
+real UART (0 = unlimited). Output that nobody reads blocks the sketch after
+``serial_buffer.OUTPUT_BUFFER_SIZE`` bytes, like a full USB serial buffer.
+
+The app and radar.py open it through ``serial_transport.open_serial`` with a
+port URL, e.g. ``RADAR_SERIAL_PORT="emulator://?step_ms=1&objects=90:30"``.
+To drive any other serial client, expose it on a pseudo-terminal (Linux /
+macOS):
+
+    python arduino_emulator.py --pty --objects 90:30 --step-ms 5
+"""
+
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from arduino_parser import FRAME_FACE, FRAME_RADAR, encode_frame
+from serial_buffer import BufferedSerial
+
+logger = logging.getLogger(__name__)
+
+# Sketch constants (RadarAndFace.ino), times in ms
+MIN_RADAR_ANGLE = 15
+MAX_RADAR_ANGLE = 165
+RADAR_DELAY = 30
+DETECTION_DISTANCE = 40
+DETECTION_DEBOUNCE = 500
+COMMAND_TIMEOUT = 5000
+SHOOT_MODE_DURATION = 3000
+CONSECUTIVE_DETECTIONS = 3
+
+NO_ECHO_DISTANCE = 200      # Distance (cm) reported when no emulated object is in the beam
+BEAM_WIDTH = 6              # Degrees over which an object returns an echo
+MAX_CLOCK_LAG = 0.1         # Seconds behind schedule before the emulator stops catching up
+
+
+# Arduino map() with integer arithmetic
+def arduino_map(value, in_min, in_max, out_min, out_max):
+    return int((value - in_min) * (out_max - out_min) / (in_max - in_min)) + out_min
+
+
+def parse_objects(text):
+    objects = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        angle, distance = item.split(":")
+        objects.append((float(angle), float(distance)))
+    return objects
+
+
+class EmulatedArduino(BufferedSerial):
+    """Serial-port-like object backed by an emulated RadarAndFace.ino."""
+
+    def __init__(self, step_ms=RADAR_DELAY, speed=1.0, objects=(), baud=0, noise=1.0,
+                 beam_width=BEAM_WIDTH, seed=None, timeout=None, name="emulator://",
+                 command_timeout=COMMAND_TIMEOUT):
+        if speed <= 0:
+            raise ValueError("speed must be > 0")
+        BufferedSerial.__init__(self, timeout, name)
+        self.step_ms = step_ms
+        self.speed = speed
+        self.objects = list(objects)
+        self.baud = baud
+        self.noise = noise
+        self.beam_width = beam_width
+        self.command_timeout = command_timeout
+        self._random = random.Random(seed)
+
+        self._input = bytearray()
+        self._input_lock = threading.Lock()
+
+        # Sketch state
+        self.angle = MIN_RADAR_ANGLE
+        self.direction = 1
+        self.binary_protocol = False
+        self.object_detected = False
+        self.shoot_mode = False
+        self.shoot_start = 0.0
+        self.detection_counter = 0
+        self.last_detection_time = 0.0
+        self.last_command_time = 0.0
+        self.pan = self.tilt = 90
+
+        # Counters
+        self.bytes_sent = 0
+        self.samples_sent = 0
+        self.commands_received = 0
+
+        # Virtual clock (ms since start), paced against the real clock by `speed`
+        self._clock = 0.0
+        self._start = time.perf_counter()
+        self._tx_free_at = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="arduino-emulator", daemon=True)
+        self._thread.start()
+
+    # "emulator://?step_ms=5&speed=1&objects=90:30,120:25&baud=0&noise=1&seed=0&command_timeout=5000"
+    @classmethod
+    def from_url(cls, url, timeout=None):
+        params = {key: values[-1] for key, values in parse_qs(urlsplit(url).query).items()}
+        kwargs = {}
+        for key in ("step_ms", "speed", "noise", "beam_width", "command_timeout"):
+            if key in params:
+                kwargs[key] = float(params[key])
+        for key in ("baud", "seed"):
+            if key in params:
+                kwargs[key] = int(params[key])
+        if "objects" in params:
+            kwargs["objects"] = parse_objects(params["objects"])
+        return cls(timeout=timeout, name=url, **kwargs)
+
+    # Host -> sketch: queued for _check_commands
+    def _received(self, data):
+        with self._input_lock:
+            self._input.extend(data)
+
+    def stats(self):
+        return {
+            "bytes_sent": self.bytes_sent,
+            "samples_sent": self.samples_sent,
+            "commands_received": self.commands_received,
+            "angle": self.angle,
+            "object_detected": self.object_detected,
+        }
+
+    # --- emulated sketch ---
+
+    def millis(self):
+        return self._clock
+
+    def _delay(self, ms):
+        self._clock += ms
+        target = self._start + self._clock / 1000.0 / self.speed
+        remaining = target - time.perf_counter()
+        if remaining > 0.0005:
+            time.sleep(remaining)
+        elif remaining < -MAX_CLOCK_LAG:
+            # Blocked on a full output buffer (or a slow machine): don't burst to catch up
+            self._start -= remaining
+
+    def _emit(self, data):
+        if self.baud > 0:
+            # 10 bits per byte on the wire
+            now = time.perf_counter()
+            self._tx_free_at = max(self._tx_free_at, now) + len(data) * 10.0 / self.baud
+            if self._tx_free_at - now > 0.002:
+                time.sleep(self._tx_free_at - now)
+        if self._push(data):
+            self.bytes_sent += len(data)
+
+    def _println(self, line):
+        self._emit(line.encode() + b"\r\n")
+
+    def _distance(self, angle):
+        distance = NO_ECHO_DISTANCE
+        for object_angle, object_distance in self.objects:
+            if abs(angle - object_angle) <= self.beam_width / 2:
+                distance = min(distance, object_distance)
+        if self.noise:
+            distance += self._random.gauss(0, self.noise)
+        return max(0, int(distance))
+
+    def _send_radar(self, angle, distance):
+        self.samples_sent += 1
+        if self.binary_protocol:
+            self._emit(encode_frame(FRAME_RADAR, angle, min(max(distance, 0), 65535)))
+        else:
+            self._println(f"{angle},{distance}. DIR:{self.direction}")
+
+    def _check_commands(self):
+        with self._input_lock:
+            if b"\r" not in self._input:
+                return
+            end = self._input.index(b"\r")
+            command = self._input[:end].decode("ascii", "replace").strip()
+            del self._input[:end + 1]
+        self.commands_received += 1
+        now = self.millis()
+
+        if command == "SHOOT":
+            self.shoot_mode = True
+            self.shoot_start = now
+            self._println("SHOOT command activated")
+        elif command == "PROTO:BIN":
+            self.binary_protocol = True
+            self._println("PROTO:BIN OK")
+        elif command == "PROTO:TEXT":
+            self.binary_protocol = False
+            self._println("PROTO:TEXT OK")
+        elif command.startswith("SET_ANGLE:"):
+            try:
+                angle = int(command[10:])
+            except ValueError:
+                angle = 0
+            if MIN_RADAR_ANGLE <= angle <= MAX_RADAR_ANGLE:
+                self.angle = angle
+                self._println(f"Radar angle set to: {angle}")
+        elif self.object_detected and command.find(",") > 0:
+            self.last_command_time = now
+            x_text, _, y_text = command.partition(",")
+            try:
+                x_axis, y_axis = int(x_text), int(y_text)
+            except ValueError:
+                return
+            self.tilt = arduino_map(y_axis, 0, 1080, 0, 180)
+            self.pan = arduino_map(x_axis, 0, 1920, 0, 180)
+            if self.binary_protocol:
+                self._emit(encode_frame(FRAME_FACE, self.pan, self.tilt))
+            else:
+                self._println(f"Face tracking - X: {self.pan}, Y: {self.tilt}")
+
+    # One step of the sweep loop in radarScanMode()
+    def _sweep_step(self):
+        angle = self.angle
+        self._delay(self.step_ms)
+        distance = self._distance(angle)
+        self._send_radar(angle, distance)
+
+        now = self.millis()
+        if distance < DETECTION_DISTANCE:
+            if self.detection_counter == 0 or now - self.last_detection_time < DETECTION_DEBOUNCE:
+                self.detection_counter += 1
+                self.last_detection_time = now
+                if self.detection_counter >= CONSECUTIVE_DETECTIONS:
+                    self.object_detected = True
+                    self.last_command_time = now
+                    self._println(f"Object detected at angle {angle} and distance {distance} cm, "
+                                  f"switching to face tracking mode")
+                    return
+            else:
+                self.detection_counter = 1
+                self.last_detection_time = now
+        elif now - self.last_detection_time > DETECTION_DEBOUNCE and self.detection_counter > 0:
+            self.detection_counter -= 1
+
+        self._check_commands()
+
+        # At the end of the range the sketch reverses and sends the end angle again
+        next_angle = angle + self.direction
+        if next_angle > MAX_RADAR_ANGLE or next_angle < MIN_RADAR_ANGLE:
+            self.direction = -self.direction
+            next_angle = angle
+        self.angle = next_angle
+
+    def _loop(self):
+        self._check_commands()
+        now = self.millis()
+        if self.shoot_mode:
+            if now - self.shoot_start > SHOOT_MODE_DURATION:
+                self.shoot_mode = False
+                if self.object_detected:
+                    self._println("Shoot completed, returning to tracking mode")
+                else:
+                    self._println("Shoot completed, returning to radar scan mode")
+            else:
+                self._delay(50)
+        elif not self.object_detected:
+            self._sweep_step()
+        elif now - self.last_command_time > self.command_timeout:
+            self.object_detected = False
+            self.detection_counter = 0
+            self._println("Timeout: Returning to radar mode")
+            if self.angle >= MAX_RADAR_ANGLE:
+                self.direction = -1
+            elif self.angle <= MIN_RADAR_ANGLE:
+                self.direction = 1
+        else:
+            # The sketch spins waiting for tracking commands; poll every few ms instead
+            self._delay(5)
+
+    def _run(self):
+        try:
+            self._println("System initialized, starting radar scan mode")
+            self._delay(500)
+            while self.is_open:
+                self._loop()
+        except Exception as e:
+            if self.is_open:
+                logger.exception("Arduino emulator error: %s", e)
+
+
+# Bridge an emulator to a pseudo-terminal so any serial client can open it by path
+def serve_pty(emulator):
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"Emulated Arduino on {os.ttyname(slave)} (Ctrl+C to stop)")
+
+    def to_pty():
+        while emulator.is_open:
+            data = emulator.read(max(1, emulator.in_waiting))
+            if data:
+                os.write(master, data)
+
+    emulator.timeout = 0.1
+    threading.Thread(target=to_pty, daemon=True).start()
+    try:
+        while True:
+            data = os.read(master, 1024)
+            if data:
+                emulator.write(data)
+    except (KeyboardInterrupt, OSError):
+        pass
+    finally:
+        emulator.close()
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pty", action="store_true", help="serve the emulator on a pseudo-terminal")
+    parser.add_argument("--step-ms", type=float, default=RADAR_DELAY, help="sweep step delay (ms)")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale all sketch timings")
+    parser.add_argument("--objects", default="", help="emulated objects as angle:distance,...")
+    parser.add_argument("--baud", type=int, default=0, help="cap the output rate (0 = unlimited)")
+    parser.add_argument("--noise", type=float, default=1.0, help="distance noise std dev (cm)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="without --pty: print stats after this long")
+    args = parser.parse_args()
+
+    emulator = EmulatedArduino(args.step_ms, args.speed, parse_objects(args.objects), args.baud, args.noise, timeout=0.1)
+    if args.pty:
+        serve_pty(emulator)
+        return
+
+    # Drain it for a while and report the rate it reaches
+    start = time.perf_counter()
+    received = 0
+    while time.perf_counter() - start < args.seconds:
+        received += len(emulator.read(max(1, emulator.in_waiting)))
+    elapsed = time.perf_counter() - start
+    emulator.close()
+    print(f"{emulator.samples_sent / elapsed:.0f} samples/s, {received / elapsed / 1024:.1f} KiB/s, {emulator.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Parser for the lines printed by RadarAndFace.ino.
+
+Lines are classified by their first byte: sweep samples
+(``angle,distance.``) take an inlined split-based fast path and event
+lines are dispatched through a table to one anchored, precompiled pattern
+each. Lines with a noisy prefix fall back to a single combined search.
+``parse_line`` works on raw bytes (no decoding on the hot path) and returns
+one of the typed records below. The sketch's other status output (SHOOT,
+shoot completed, radar angle set) is a ``StatusMessage``; only lines that
+match nothing are an ``UnknownLine``.
+
+``StreamDecoder`` frames a raw serial byte stream that may mix text lines
+with the compact binary frames the sketch sends after ``PROTO:BIN``.
+"""
+
+import re
+import struct
+from typing import NamedTuple
+
+
+class RadarSample(NamedTuple):
+    angle: int
+    distance: int
+
+
+class ObjectDetected(NamedTuple):
+    angle: int
+    distance: int
+
+
+class RadarTimeout(NamedTuple):
+    pass
+
+
+class SystemInitialized(NamedTuple):
+    pass
+
+
+class FaceTracking(NamedTuple):
+    x: int
+    y: int
+
+
+class ProtocolAck(NamedTuple):
+    protocol: str  # "BIN" or "TEXT"
+
+
+class StatusMessage(NamedTuple):
+    text: str  # Sketch status output: "SHOOT command activated", "Shoot completed, ...", "Radar angle set to: N"
+
+
+class UnknownLine(NamedTuple):
+    text: str  # Empty for blank lines (and readline timeouts)
+
+
+# Fallback for lines with leading noise: one alternative per line shape,
+# the outer named group identifies the shape (match.lastgroup)
+_LINE_PATTERN = re.compile(rb"""
+      (?P<radar>(?:^|\s)(?P<angle>-?\d+)\s*,\s*(?P<distance>-?\d+)\s*\.)
+    | (?P<detected>Object\ detected\ at\ angle\ (?P<det_angle>\d+)\ and\ distance\ (?P<det_distance>\d+))
+    | (?P<timeout>Timeout:\ Returning\ to\ radar\ mode)
+    | (?P<initialized>System\ initialized)
+    | (?P<face>Face\ tracking\ -\ X:\ (?P<face_x>\d+),\ Y:\ (?P<face_y>\d+))
+    | (?P<status>SHOOT\ command\ activated|Shoot\ completed.*|Radar\ angle\ set\ to:\ \d+)
+""", re.VERBOSE)
+
+_DETECTED_PATTERN = re.compile(rb"Object detected at angle (\d+) and distance (\d+)")
+_TIMEOUT_PATTERN = re.compile(rb"Timeout: Returning to radar mode")
+_INITIALIZED_PATTERN = re.compile(rb"System initialized")
+_FACE_PATTERN = re.compile(rb"Face tracking - X: (\d+), Y: (\d+)")
+_PROTOCOL_PATTERN = re.compile(rb"PROTO:(BIN|TEXT) OK")
+_STATUS_PATTERN = re.compile(rb"SHOOT command activated|Shoot completed|Radar angle set to: \d+")
+
+_TIMEOUT = RadarTimeout()
+_INITIALIZED = SystemInitialized()
+
+# NamedTuple.__new__ is a Python-level function; building the tuple directly is ~5x cheaper
+_new_tuple = tuple.__new__
+
+
+def decode_text(raw_line):
+    try:
+        return raw_line.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        return raw_line.decode('latin-1').strip()
+
+
+def _parse_detected(line):
+    match = _DETECTED_PATTERN.match(line)
+    return ObjectDetected(int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _parse_timeout(line):
+    return _TIMEOUT if _TIMEOUT_PATTERN.match(line) else None
+
+
+def _parse_status(line):
+    return StatusMessage(decode_text(line)) if _STATUS_PATTERN.match(line) else None
+
+
+# "System initialized..." or one of the S... status lines
+def _parse_initialized_or_status(line):
+    return _INITIALIZED if _INITIALIZED_PATTERN.match(line) else _parse_status(line)
+
+
+def _parse_face(line):
+    match = _FACE_PATTERN.match(line)
+    return _new_tuple(FaceTracking, (int(match.group(1)), int(match.group(2)))) if match else None
+
+
+def _parse_protocol(line):
+    match = _PROTOCOL_PATTERN.match(line)
+    return ProtocolAck(match.group(1).decode('ascii')) if match else None
+
+
+# First byte of an event line -> parser for the only event line starting with it
+_EVENT_DISPATCH = {
+    ord('O'): _parse_detected,
+    ord('T'): _parse_timeout,
+    ord('S'): _parse_initialized_or_status,
+    ord('F'): _parse_face,
+    ord('P'): _parse_protocol,
+    ord('R'): _parse_status,
+}
+
+_RADAR_FIRST_BYTES = frozenset(b'-0123456789')
+
+# Builders for the fallback pattern, keyed by its outer group name
+_BUILDERS = {
+    'radar': lambda m: RadarSample(int(m.group('angle')), int(m.group('distance'))),
+    'detected': lambda m: ObjectDetected(int(m.group('det_angle')), int(m.group('det_distance'))),
+    'timeout': lambda m: _TIMEOUT,
+    'initialized': lambda m: _INITIALIZED,
+    'face': lambda m: FaceTracking(int(m.group('face_x')), int(m.group('face_y'))),
+    'status': lambda m: StatusMessage(decode_text(m.group('status'))),
+}
+
+
+# Classify one raw line (bytes, with or without the line ending)
+def parse_line(raw_line):
+    if raw_line:
+        first = raw_line[0]
+        if first in _RADAR_FIRST_BYTES:
+            # Sweep sample fast path (inlined, it is nearly all of the traffic):
+            # "angle,distance." - the trailing " DIR:d" is not needed, the app
+            # derives the sweep direction from consecutive angles
+            head, dot, _ = raw_line.partition(b'.')
+            angle, comma, distance = head.partition(b',')
+            if dot and comma:
+                try:
+                    return _new_tuple(RadarSample, (int(angle), int(distance)))
+                except ValueError:
+                    pass
+        else:
+            parser = _EVENT_DISPATCH.get(first)
+            if parser is not None:
+                record = parser(raw_line)
+                if record is not None:
+                    return record
+
+    match = _LINE_PATTERN.search(raw_line)
+    if match is None:
+        return UnknownLine(decode_text(raw_line))
+    return _BUILDERS[match.lastgroup](match)
+
+
+# Binary frames (RadarAndFace.ino sendFrame): SYNC, TYPE, A, B (uint16 LE), CHECKSUM
+FRAME_SYNC = 0xA5
+FRAME_SIZE = 6
+FRAME_RADAR = 0x01  # A = angle, B = distance (cm)
+FRAME_FACE = 0x02   # A = servo X, B = servo Y
+_FRAME_BODY = struct.Struct('<BBHB')
+
+# Frame type -> record class; both records are (A, B)
+_FRAME_RECORDS = {
+    FRAME_RADAR: RadarSample,
+    FRAME_FACE: FaceTracking,
+}
+
+
+def encode_frame(frame_type, a, b):
+    body = bytes((frame_type, a & 0xFF, b & 0xFF, (b >> 8) & 0xFF))
+    return bytes((FRAME_SYNC,)) + body + bytes((body[0] ^ body[1] ^ body[2] ^ body[3],))
+
+
+class StreamDecoder:
+    """Splits a serial byte stream into records.
+
+    Text lines end with ``\n`` and go through ``parse_line``. A ``FRAME_SYNC``
+    byte (never printed by the sketch in text) starts a fixed-size binary
+    frame; a frame with a bad checksum costs one byte and decoding resyncs on
+    the next sync byte. A partial text line interrupted by a sync byte is
+    dropped as noise.
+    """
+
+    def __init__(self, max_line_length=256):
+        self.max_line_length = max_line_length
+        self._pending = bytearray()
+        self.lines = 0
+        self.frames = 0
+        self.bad_frames = 0
+        self.dropped_bytes = 0
+
+    def feed(self, chunk):
+        buf = self._pending
+        buf += chunk
+        size = len(buf)
+        records = []
+        pos = 0
+
+        while pos < size:
+            if buf[pos] == FRAME_SYNC:
+                if size - pos < FRAME_SIZE:
+                    break
+                frame_type, a, b, checksum = _FRAME_BODY.unpack_from(buf, pos + 1)
+                record_class = _FRAME_RECORDS.get(frame_type)
+                if record_class is not None and checksum == frame_type ^ a ^ (b & 0xFF) ^ (b >> 8):
+                    records.append(_new_tuple(record_class, (a, b)))
+                    self.frames += 1
+                    pos += FRAME_SIZE
+                else:
+                    self.bad_frames += 1
+                    self.dropped_bytes += 1
+                    pos += 1
+                continue
+
+            end = buf.find(b'\n', pos)
+            sync = buf.find(FRAME_SYNC, pos, size if end < 0 else end)
+            if sync >= 0:
+                self.dropped_bytes += sync - pos
+                pos = sync
+                continue
+            if end < 0:
+                break
+            records.append(parse_line(bytes(buf[pos:end + 1])))
+            self.lines += 1
+            pos = end + 1
+
+        if pos:
+            del buf[:pos]
+
+        # Drop a partial line that can no longer be valid
+        if len(buf) > self.max_line_length and buf[0] != FRAME_SYNC:
+            self.dropped_bytes += len(buf)
+            buf.clear()
+
+        return records
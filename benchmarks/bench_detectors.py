@@ -0,0 +1,93 @@
+"""
+Benchmark: detector backends (detection.DETECTOR_BACKENDS) on the same frames.
+
+For each backend reports wall-clock latency per frame, CPU time per frame
+(process CPU, so MediaPipe's own worker threads are included) and the share
+of frames with a detection. Face backends are also compared against the
+first one listed (pixel distance between their points), which is FaceMesh by
+default.
+
+Frames come from a recorded video, a directory of images or a camera, at the
+inference width the app uses. Without a source, synthetic frames are used and
+only the latency / CPU numbers are meaningful.
+
+    python benchmarks/bench_detectors.py --video clip.mp4
+    python benchmarks/bench_detectors.py --video hands.mp4 --backends hands
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_inference import compare, load_frames
+from detection import DETECTOR_BACKENDS, FACE_TRACKING, backends_for_mode, create_detector, inference_view
+
+
+def run(frames, backend, width, repeat):
+    detector = create_detector(backend)
+    color = detector.color_conversion
+    latencies = []
+    positions = []
+    try:
+        # Warm-up (model loading, first-inference allocations)
+        for frame in frames[:5]:
+            detector.locate(*inference_view(frame, width, color_conversion=color))
+        cpu_start = time.process_time()
+        for _ in range(repeat):
+            positions = []
+            for frame in frames:
+                start = time.perf_counter()
+                image, window = inference_view(frame, width, color_conversion=color)
+                positions.append(detector.locate(image, window))
+                latencies.append(time.perf_counter() - start)
+        cpu = time.process_time() - cpu_start
+    finally:
+        detector.close()
+    return latencies, cpu / len(latencies), positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="video file")
+    parser.add_argument("--images", help="directory of images (sorted by name)")
+    parser.add_argument("--camera", type=int, help="camera index")
+    parser.add_argument("--source", help="RADAR_CAMERA_SOURCE style spec, e.g. synthetic or video://clip.mp4")
+    parser.add_argument("--frames", type=int, default=300, help="max frames to use")
+    parser.add_argument("--width", type=int, default=640, help="inference width, 0 = full frame")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the frames per backend")
+    parser.add_argument("--backends", default=",".join(backends_for_mode(FACE_TRACKING)),
+                        help=f"comma separated, from: {', '.join(DETECTOR_BACKENDS)}")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        sys.exit("No frames")
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height}, inference width {args.width or width}")
+
+    backends = args.backends.split(",")
+    reference = None
+    print(f"{'backend':<16} {'avg ms':>8} {'p95 ms':>8} {'cpu ms':>8} {'found':>7} {'err px':>8}")
+    for backend in backends:
+        try:
+            latencies, cpu, positions = run(frames, backend, args.width, args.repeat)
+        except Exception as e:
+            print(f"{backend:<16} unavailable: {e}")
+            continue
+        latencies.sort()
+        found = sum(1 for p in positions if p is not None) / len(positions)
+        if reference is None:
+            reference = positions
+            error = float("nan")
+        else:
+            _, error, _ = compare(positions, reference)
+        print(f"{backend:<16} {sum(latencies) / len(latencies) * 1000:8.2f} "
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:8.2f} {cpu * 1000:8.2f} "
+              f"{found:7.2f} {error:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
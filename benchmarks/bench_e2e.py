@@ -0,0 +1,321 @@
+"""
+End-to-end benchmark: the web radar server under N WebSocket clients.
+
+Starts ``uvicorn app:app`` in a subprocess against the emulated Arduino
+(``emulator://``, see arduino_emulator.py) or a recorded session
+(``--serial replay://...``, see serial_replay.py) and a synthetic camera, connects
+``--clients`` headless WebSocket clients and measures, per phase:
+
+- radar: messages/s and sweep samples/s per client, latency from the
+  serial read of the newest sample in a frame to its receipt by the client
+- tracking (after ``switch_mode``): camera frames/s per client, latency
+  from frame capture to receipt
+- server process CPU (% of one core) and peak RSS, from psutil if installed,
+  else /proc (Linux)
+- server-side drops and evictions, from /metrics
+
+Server and clients run on the same host, so both latencies use one clock.
+The report is printed and written as JSON (``--output``). ``--compare`` puts
+a previous report next to it.
+
+    python benchmarks/bench_e2e.py --clients 8 --duration 10 --step-ms 1
+    python benchmarks/bench_e2e.py --output after.json --compare before.json
+    python benchmarks/bench_e2e.py --camera "synthetic://?fps=0" --clients 1
+    python benchmarks/bench_e2e.py --serial "replay://session.rser?speed=10&loop=1"
+
+``--camera`` takes any RADAR_CAMERA_SOURCE (see camera_sources.py); with
+``fps=0`` frames come as fast as the pipeline takes them, so the tracking
+phase measures inference + encoding throughput instead of the camera rate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from broadcast import CAMERA_HEADER, CAMERA_MAGIC
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ProcessMonitor:
+    """CPU time and RSS of one process (psutil, or /proc on Linux)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.process = psutil.Process(pid) if psutil is not None else None
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_time(self):
+        if self.process is not None:
+            times = self.process.cpu_times()
+            return times.user + times.system
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except OSError:
+            return float("nan")
+
+    def rss(self):
+        if self.process is not None:
+            return self.process.memory_info().rss
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return float("nan")
+
+
+class ClientStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.radar_messages = 0
+        self.radar_samples = 0
+        self.radar_latency = []
+        self.camera_frames = 0
+        self.camera_bytes = 0
+        self.camera_latency = []
+        self.other_messages = 0
+
+
+async def client(url, stats, ready):
+    async with websockets.connect(url, max_size=None, ping_interval=None) as ws:
+        ready.set()
+        async for message in ws:
+            received = time.time()
+            if isinstance(message, bytes):
+                if message[:4] == CAMERA_MAGIC:
+                    timestamp = CAMERA_HEADER.unpack_from(message)[4]
+                    stats.camera_frames += 1
+                    stats.camera_bytes += len(message)
+                    stats.camera_latency.append(received - timestamp)
+                continue
+            data = json.loads(message)
+            if data.get("type") == "radar":
+                stats.radar_messages += 1
+                stats.radar_samples += len(data.get("samples", ()))
+                if data.get("samples") and "timestamp" in data:
+                    stats.radar_latency.append(received - data["timestamp"])
+            else:
+                stats.other_messages += 1
+
+
+def percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    array = np.asarray(values) * 1000
+    return {"p50_ms": round(float(np.percentile(array, 50)), 2),
+            "p99_ms": round(float(np.percentile(array, 99)), 2),
+            "max_ms": round(float(array.max()), 2)}
+
+
+def read_metrics(base_url):
+    values = {}
+    try:
+        with urllib.request.urlopen(base_url + "/metrics", timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return values
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            try:
+                values[name] = float(value)
+            except ValueError:
+                pass
+    return values
+
+
+async def measure(phase, duration, all_stats, monitor, base_url):
+    for stats in all_stats:
+        stats.reset()
+    metrics_before = read_metrics(base_url)
+    cpu_start = monitor.cpu_time()
+    start = time.perf_counter()
+    peak_rss = 0
+    while time.perf_counter() - start < duration:
+        await asyncio.sleep(0.25)
+        peak_rss = max(peak_rss, monitor.rss())
+    elapsed = time.perf_counter() - start
+    cpu = monitor.cpu_time() - cpu_start
+    metrics_after = read_metrics(base_url)
+
+    def metric_delta(name):
+        return metrics_after.get(name, 0.0) - metrics_before.get(name, 0.0)
+
+    clients = len(all_stats)
+    radar_latency = [v for s in all_stats for v in s.radar_latency]
+    camera_latency = [v for s in all_stats for v in s.camera_latency]
+    camera_frames = sum(s.camera_frames for s in all_stats)
+    return {
+        "phase": phase,
+        "seconds": round(elapsed, 2),
+        "radar_msgs_per_s": round(sum(s.radar_messages for s in all_stats) / elapsed / clients, 1),
+        "radar_samples_per_s": round(sum(s.radar_samples for s in all_stats) / elapsed / clients, 1),
+        "radar_latency": percentiles(radar_latency),
+        "camera_fps": round(camera_frames / elapsed / clients, 1),
+        "camera_kib_per_frame": round(sum(s.camera_bytes for s in all_stats) / max(camera_frames, 1) / 1024, 1),
+        "camera_latency": percentiles(camera_latency),
+        "server_cpu_percent": round(cpu / elapsed * 100, 1),
+        "server_rss_mib": round(peak_rss / 2 ** 20, 1),
+        "serial_records_per_s": round(metric_delta("radar_serial_buffer_records_total") / elapsed, 1),
+        "serial_dropped": int(metric_delta("radar_serial_buffer_dropped_total")),
+        "camera_frames_dropped": int(metric_delta('radar_ws_frames_dropped_total{kind="camera"}')),
+        "radar_frames_dropped": int(metric_delta('radar_ws_frames_dropped_total{kind="radar"}')),
+        "clients_evicted": int(metric_delta("radar_ws_evicted_total")),
+    }
+
+
+async def run_clients(args, base_url, monitor):
+    ws_url = base_url.replace("http://", "ws://") + "/ws"
+    all_stats = [ClientStats() for _ in range(args.clients)]
+    readies = [asyncio.Event() for _ in range(args.clients)]
+    tasks = [asyncio.create_task(client(ws_url, stats, ready)) for stats, ready in zip(all_stats, readies)]
+    await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in readies)), timeout=30)
+
+    phases = []
+    try:
+        await asyncio.sleep(args.warmup)
+        phases.append(await measure("radar", args.duration, all_stats, monitor, base_url))
+        if args.camera:
+            async with websockets.connect(ws_url, max_size=None) as control:
+                await control.send(json.dumps({"command": "switch_mode", "mode": "TRACKING"}))
+                await asyncio.sleep(args.warmup)
+                phases.append(await measure("tracking", args.duration, all_stats, monitor, base_url))
+                await control.send(json.dumps({"command": "switch_mode", "mode": "RADAR"}))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return phases
+
+
+def wait_for_server(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/metrics", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, previous=None):
+    def flatten(phase):
+        rows = {}
+        for key, value in phase.items():
+            if isinstance(value, dict):
+                for sub, sub_value in value.items():
+                    rows[f"{key}_{sub}"] = sub_value
+            elif key != "phase":
+                rows[key] = value
+        return rows
+
+    print(f"\nrevision {report['revision']}, {report['config']['clients']} clients, "
+          f"serial {report['config']['serial_port']}, camera {report['config']['camera'] or 'off'}")
+    old_phases = {p["phase"]: flatten(p) for p in previous["phases"]} if previous else {}
+    for phase in report["phases"]:
+        print(f"\n[{phase['phase']}]")
+        old = old_phases.get(phase["phase"], {})
+        for key, value in flatten(phase).items():
+            line = f"  {key:<28} {value!s:>10}"
+            if key in old:
+                line += f"   (was {old[key]!s})"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="WebSocket clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per phase")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds before each phase")
+    parser.add_argument("--step-ms", type=float, default=1.0, help="emulated sweep step (ms); 30 = real sketch")
+    parser.add_argument("--baud", type=int, default=0, help="emulated serial rate cap, 0 = unlimited")
+    parser.add_argument("--serial", help="RADAR_SERIAL_PORT instead of the emulator, e.g. replay://session.rser?speed=0")
+    parser.add_argument("--camera", default="synthetic", help="RADAR_CAMERA_SOURCE for the tracking phase "
+                        "(synthetic://?fps=0, video://clip.mp4, ...), '' = skip")
+    parser.add_argument("--env", action="append", default=[], help="extra server environment, KEY=VALUE")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", help="previous JSON report to show next to this one")
+    args = parser.parse_args()
+
+    serial_port = args.serial or f"emulator://?step_ms={args.step_ms:g}&baud={args.baud}&seed=0"
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, RADAR_SERIAL_PORT=serial_port, RADAR_LOG_LEVEL="WARNING")
+    if args.camera:
+        env["RADAR_CAMERA_SOURCE"] = args.camera
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+                               "--port", str(port), "--log-level", "warning"], cwd=ROOT, env=env)
+    try:
+        wait_for_server(base_url, server)
+        phases = asyncio.run(run_clients(args, base_url, ProcessMonitor(server.pid)))
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    report = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "config": {
+            "clients": args.clients, "duration": args.duration, "serial_port": serial_port,
+            "camera": args.camera, "env": args.env, "cpu_count": os.cpu_count(),
+            "monitor": "psutil" if psutil is not None else "/proc",
+        },
+        "phases": phases,
+    }
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
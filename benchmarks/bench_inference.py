@@ -0,0 +1,140 @@
+"""
+Benchmark: MediaPipe inference latency vs. accuracy at several inference sizes.
+
+Runs the same frames through detection at each ``--widths`` entry (0 = full
+frame) and, with ROI cropping, at the app's settings. The full-frame result
+is the reference: accuracy is the pixel distance (in full-frame pixels)
+between each configuration's point and the reference point, and recall is the
+share of reference detections the configuration also found.
+
+Frames come from a video file, a directory of images, a camera or any
+``--source`` spec the app accepts (see camera_sources.py). Without any source,
+random frames are used: only the latency numbers mean anything then.
+
+    python benchmarks/bench_inference.py --video clip.mp4 --backend face_mesh
+    python benchmarks/bench_inference.py --images frames/ --widths 0,640,320
+    python benchmarks/bench_inference.py --source "synthetic://?target=face.jpg"
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_sources import FrameSource, open_camera
+from detection import DETECTOR_BACKENDS, create_detector, inference_view
+
+ROI_SCALE = 0.6  # Same as INFERENCE_ROI_SCALE in app.py
+
+
+def load_frames(args):
+    frames = []
+    if args.source:
+        capture = open_camera(args.source)
+        if isinstance(capture, FrameSource):
+            capture.speed = 0  # Preloading, no need to wait for the playback rate
+        while len(frames) < args.frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+    elif args.images:
+        for path in sorted(glob.glob(os.path.join(args.images, "*"))):
+            image = cv2.imread(path)
+            if image is not None:
+                frames.append(image)
+    elif args.video is not None or args.camera is not None:
+        capture = cv2.VideoCapture(args.video if args.video is not None else args.camera)
+        while len(frames) < args.frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(cv2.flip(frame, 1) if args.camera is not None else frame)
+        capture.release()
+    else:
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        frames = [np.roll(base, i * 8, axis=1) for i in range(min(args.frames, 60))]
+    return frames[:args.frames]
+
+
+# One pass over the frames with a fresh detector (MediaPipe tracks across frames like in the app)
+def run(frames, backend, width, roi):
+    detector = create_detector(backend)
+    color = detector.color_conversion
+    latencies = []
+    positions = []
+    last = None
+    try:
+        for frame in frames:
+            start = time.perf_counter()
+            center = last if roi else None
+            image, window = inference_view(frame, width, center, frame.shape[0] * ROI_SCALE, color)
+            position = detector.locate(image, window)
+            if position is None and center is not None:
+                image, window = inference_view(frame, width, color_conversion=color)
+                position = detector.locate(image, window)
+            latencies.append(time.perf_counter() - start)
+            positions.append(position)
+            last = position
+    finally:
+        detector.close()
+    return latencies, positions
+
+
+def compare(positions, reference):
+    errors = [
+        ((p[0] - r[0]) ** 2 + (p[1] - r[1]) ** 2) ** 0.5
+        for p, r in zip(positions, reference) if p is not None and r is not None
+    ]
+    found = sum(1 for r in reference if r is not None)
+    recall = len(errors) / found if found else float("nan")
+    if not errors:
+        return recall, float("nan"), float("nan")
+    errors.sort()
+    return recall, sum(errors) / len(errors), errors[min(len(errors) - 1, int(len(errors) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="video file")
+    parser.add_argument("--images", help="directory of images (sorted by name)")
+    parser.add_argument("--camera", type=int, help="camera index")
+    parser.add_argument("--source", help="RADAR_CAMERA_SOURCE style spec, e.g. synthetic or video://clip.mp4")
+    parser.add_argument("--frames", type=int, default=300, help="max frames to use")
+    parser.add_argument("--backend", choices=sorted(DETECTOR_BACKENDS), default="face_mesh")
+    parser.add_argument("--widths", default="0,960,640,480,320,240", help="comma separated, 0 = full frame")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        sys.exit("No frames")
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height}, {args.backend} detector")
+
+    widths = [int(w) for w in args.widths.split(",")]
+    configs = [(w, False) for w in widths] + [(w, True) for w in widths if w]
+    _, reference = run(frames, args.backend, 0, False)
+    found = sum(1 for r in reference if r is not None)
+    print(f"Reference (full frame) detections: {found}/{len(frames)}")
+
+    print(f"{'config':<14} {'avg ms':>8} {'p95 ms':>8} {'recall':>7} {'err px':>8} {'p95 px':>8}")
+    for config_width, roi in configs:
+        latencies, positions = run(frames, args.backend, config_width, roi)
+        latencies.sort()
+        recall, error, error_p95 = compare(positions, reference)
+        name = f"{config_width or 'full'}{' +roi' if roi else ''}"
+        print(f"{name:<14} {sum(latencies) / len(latencies) * 1000:8.2f} "
+              f"{latencies[int(len(latencies) * 0.95)] * 1000:8.2f} "
+              f"{recall:7.2f} {error:8.1f} {error_p95:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
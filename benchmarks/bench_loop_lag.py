@@ -0,0 +1,164 @@
+"""
+Event loop lag: blocking serial polling vs. the background reader thread.
+
+Feeds radar lines through a byte-trickling fake port (bytes arrive at the
+configured baud rate, like a real UART) and measures how late the event loop
+wakes a task that sleeps for a fixed interval.
+
+    python benchmarks/bench_loop_lag.py --seconds 5 --baud 9600
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arduino_parser import parse_line
+from serial_ingest import LineRingBuffer, SerialReaderThread
+
+
+# Byte-level stand-in for serial.Serial: a producer thread releases bytes at baud/10 per second
+class TricklePort:
+    def __init__(self, baud, timeout=0.1):
+        self.timeout = timeout
+        self.is_open = True
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self._byte_time = 10.0 / baud
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self):
+        angle, step = 15, 1
+        while self.is_open:
+            line = f"{angle},{30 + angle % 70}. DIR:{step}\r\n".encode()
+            for b in line:
+                time.sleep(self._byte_time)
+                with self._cond:
+                    self._buf.append(b)
+                    self._cond.notify_all()
+            angle += step
+            if angle >= 165 or angle <= 15:
+                step = -step
+
+    @property
+    def in_waiting(self):
+        with self._cond:
+            return len(self._buf)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while len(self._buf) < size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            data = bytes(self._buf[:size])
+            del self._buf[:size]
+            return data
+
+    def readline(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while b"\n" not in self._buf:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            end = self._buf.find(b"\n")
+            end = len(self._buf) if end < 0 else end + 1
+            data = bytes(self._buf[:end])
+            del self._buf[:end]
+            return data
+
+    def close(self):
+        self.is_open = False
+
+
+async def probe(seconds, interval):
+    lags = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+    return lags
+
+
+# Old behaviour: blocking in_waiting/readline on the loop, polled every 10 ms
+async def run_blocking(port, seconds, interval):
+    lines = 0
+    stop = False
+
+    async def reader():
+        nonlocal lines
+        while not stop:
+            if port.in_waiting > 0:
+                parse_line(port.readline())
+                lines += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(reader())
+    lags = await probe(seconds, interval)
+    stop = True
+    await task
+    return lags, lines
+
+
+# New behaviour: reader thread + ring buffer, loop drains batches when signalled
+async def run_threaded(port, seconds, interval):
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    buffer = LineRingBuffer()
+    thread = SerialReaderThread(port, buffer, on_data=lambda: loop.call_soon_threadsafe(event.set))
+    thread.start()
+    lines = 0
+    stop = False
+
+    async def reader():
+        nonlocal lines
+        while not stop:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            lines += len(buffer.drain())
+
+    task = asyncio.create_task(reader())
+    lags = await probe(seconds, interval)
+    stop = True
+    await task
+    thread.stop()
+    return lags, lines
+
+
+def summarize(name, lags, lines, seconds):
+    lags_ms = sorted(l * 1000 for l in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{name:<10} lines/s={lines / seconds:8.1f}  lag avg={statistics.mean(lags_ms):6.2f}ms  "
+          f"p99={p99:6.2f}ms  max={lags_ms[-1]:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--interval", type=float, default=0.005, help="probe sleep interval (s)")
+    args = parser.parse_args()
+
+    for name, runner in (("blocking", run_blocking), ("threaded", run_threaded)):
+        port = TricklePort(args.baud)
+        lags, lines = asyncio.run(runner(port, args.seconds, args.interval))
+        port.close()
+        summarize(name, lags, lines, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
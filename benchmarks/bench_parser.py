@@ -0,0 +1,112 @@
+"""
+Microbenchmark: single-pass arduino_parser vs. the old substring/regex cascade.
+
+Parses a corpus of serial lines (one per line, as captured from the port) with
+both implementations and reports lines/sec. Without --corpus, a corpus with
+the same line mix as RadarAndFace.ino (mostly sweep samples, some tracking
+feedback and events) is generated.
+
+    python benchmarks/bench_parser.py --corpus capture.txt --repeat 20
+"""
+
+import argparse
+import os
+import re as re_module
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arduino_parser import parse_line
+
+
+# The cascade read_serial() used before arduino_parser existed (app.py + radar.py branches)
+def legacy_parse(raw_data):
+    try:
+        data = raw_data.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        data = raw_data.decode('latin-1').strip()
+
+    if "Object detected at angle" in data:
+        import re
+        match_angle = re.search(r"angle (\d+)", data)
+        match_distance = re.search(r"distance (\d+)", data)
+        if match_angle and match_distance:
+            return ("detected", int(match_angle.group(1)), int(match_distance.group(1)))
+    elif "Timeout: Returning to radar mode" in data:
+        return ("timeout",)
+    elif "System initialized" in data:
+        return ("initialized",)
+    elif "Face tracking - X:" in data:
+        match = re_module.search(r"X: (\d+), Y: (\d+)", data)
+        if match:
+            return ("face", int(match.group(1)), int(match.group(2)))
+    elif '.' in data:
+        data = data.split('.')[0].strip()
+        if ',' in data:
+            parts = data.split(',')
+            if len(parts) >= 2:
+                try:
+                    return ("radar", int(parts[0]), int(parts[1]))
+                except ValueError:
+                    pass
+    return None
+
+
+def generate_corpus(sweeps=20):
+    lines = [b"System initialized, starting radar scan mode\r\n"]
+    direction = 1
+    for sweep in range(sweeps):
+        angles = range(15, 166) if direction > 0 else range(165, 14, -1)
+        for angle in angles:
+            distance = 25 + (angle * 7 + sweep * 13) % 180
+            lines.append(f"{angle},{distance}. DIR:{direction}\r\n".encode())
+        if sweep % 4 == 3:
+            lines.append(f"Object detected at angle {angle} and distance 32 cm, switching to face tracking mode\r\n".encode())
+            for i in range(40):
+                lines.append(f"Face tracking - X: {60 + i % 60}, Y: {80 + i % 20}\r\n".encode())
+            lines.append(b"Timeout: Returning to radar mode\r\n")
+        direction = -direction
+    return lines
+
+
+def time_once(parse, lines):
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    return time.perf_counter() - start
+
+
+# Interleave the implementations so machine noise hits both equally; keep the best run
+def bench(implementations, lines, repeat):
+    best = {name: float("inf") for name, _ in implementations}
+    for _ in range(repeat):
+        for name, parse in implementations:
+            best[name] = min(best[name], time_once(parse, lines))
+
+    rates = {}
+    for name, _ in implementations:
+        rates[name] = len(lines) / best[name]
+        print(f"{name:<10} {rates[name]:12,.0f} lines/s  ({best[name] / len(lines) * 1e6:.2f} us/line)")
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="file of captured serial lines")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+    else:
+        lines = generate_corpus()
+
+    print(f"Corpus: {len(lines)} lines")
+    rates = bench([("legacy", legacy_parse), ("parser", parse_line)], lines, args.repeat)
+    print(f"Speed-up: {rates['parser'] / rates['legacy']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Offline evaluation of the servo target smoothing (tracking_filters.create_smoother).
+
+Replays a track, feeds every position to each filter configuration and
+extrapolates it by the latency the app would compensate for, as
+CameraThread.apply_position does. Reports, per configuration:
+
+- rms / p95 error: distance between the command and the true position at the
+  time the command takes effect (capture time + latency)
+- jitter: RMS of the second difference of the command sequence (px), i.e.
+  how much the servos would be shaken frame to frame
+
+Tracks are recorded by the app with RADAR_TRACK_LOG=track.csv (columns
+capture_time,x,y,latency,predicted). A recording has no ground truth, so a
+centered moving average of the measurements stands in for it. Without
+--track a synthetic track (moves, stops, sudden turns, landmark noise) with
+known ground truth is used.
+
+    python benchmarks/eval_smoothing.py --track track.csv --servo-latency 0.05
+    python benchmarks/eval_smoothing.py --noise 4 --latency 0.08
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracking_filters import create_smoother
+
+CONFIGS = [
+    ("none", {}),
+    ("alpha_beta", {"alpha": 0.3, "beta": 0.02}),
+    ("alpha_beta", {"alpha": 0.5, "beta": 0.05}),
+    ("alpha_beta", {"alpha": 0.5, "beta": 0.1}),
+    ("alpha_beta", {"alpha": 0.7, "beta": 0.1}),
+    ("kalman", {"acceleration_noise": 500.0}),
+    ("kalman", {"acceleration_noise": 1500.0}),
+    ("kalman", {"acceleration_noise": 4000.0}),
+]
+
+
+def load_track(path):
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    times = np.array([float(r["capture_time"]) for r in rows])
+    measured = np.array([(float(r["x"]), float(r["y"])) for r in rows])
+    latency = np.array([float(r["latency"]) for r in rows])
+    return times, measured, latency
+
+
+def synthetic_track(seconds, fps, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.arange(0, seconds, 1.0 / fps)
+    # Velocity (px/s) per phase, integrated so the path has no jumps
+    velocity = np.empty((len(times), 2))
+    for i, t in enumerate(times):
+        phase = t % 8.0
+        if phase < 3.0:    # Smooth sweep
+            velocity[i] = (325 * np.cos(t * 1.3), 56 * np.cos(t * 0.7))
+        elif phase < 5.0:  # Stand still
+            velocity[i] = (0.0, 0.0)
+        else:              # Quick constant-velocity move with a sudden turn
+            velocity[i] = (400 if phase < 6.5 else -400, 150 if phase < 6.5 else -150)
+    truth = np.array([640.0, 360.0]) + np.cumsum(velocity, axis=0) / fps
+    measured = truth + rng.normal(0, noise, truth.shape)
+    return times, measured, truth
+
+
+# Centered moving average: an approximation of the true path of a recorded track
+def moving_average(points, window):
+    if window <= 1:
+        return points.copy()
+    kernel = np.ones(window) / window
+    padded = np.pad(points, ((window // 2, window - 1 - window // 2), (0, 0)), mode="edge")
+    return np.stack([np.convolve(padded[:, k], kernel, mode="valid") for k in range(2)], axis=1)
+
+
+# Commands extrapolated by `extrapolate_by`, scored against the truth `leads` after capture
+def evaluate(kind, params, times, measured, leads, reference, extrapolate_by=None):
+    if extrapolate_by is None:
+        extrapolate_by = leads
+    smoother = create_smoother(kind, **params)
+    commands = np.empty_like(measured)
+    for i, (t, position) in enumerate(zip(times, measured)):
+        smoother.update(t, position)
+        commands[i] = smoother.extrapolate(t + extrapolate_by[i])
+    effect_times = times + leads
+    truth = np.stack([np.interp(effect_times, times, reference[:, k]) for k in range(2)], axis=1)
+    errors = np.hypot(*(commands - truth).T)
+    jitter = np.sqrt(np.mean(np.sum(np.diff(commands, n=2, axis=0) ** 2, axis=1)))
+    return float(np.sqrt(np.mean(errors ** 2))), float(np.percentile(errors, 95)), float(jitter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--track", help="CSV recorded with RADAR_TRACK_LOG")
+    parser.add_argument("--servo-latency", type=float, default=0.05, help="added to the recorded pipeline latency (s)")
+    parser.add_argument("--reference-window", type=int, default=7, help="moving average (frames) used as truth for --track")
+    parser.add_argument("--seconds", type=float, default=40.0, help="synthetic track length")
+    parser.add_argument("--fps", type=float, default=30.0, help="synthetic frame rate")
+    parser.add_argument("--noise", type=float, default=3.0, help="synthetic landmark noise (px)")
+    parser.add_argument("--latency", type=float, default=0.08, help="synthetic pipeline + servo latency (s)")
+    args = parser.parse_args()
+
+    if args.track:
+        times, measured, latency = load_track(args.track)
+        leads = latency + args.servo_latency
+        reference = moving_average(measured, args.reference_window)
+        print(f"{len(times)} samples from {args.track}, mean lead {leads.mean() * 1000:.0f} ms "
+              f"(reference: {args.reference_window}-frame moving average)")
+    else:
+        times, measured, reference = synthetic_track(args.seconds, args.fps, args.noise)
+        leads = np.full(len(times), args.latency)
+        print(f"{len(times)} synthetic samples at {args.fps:.0f} fps, noise {args.noise} px, lead {args.latency * 1000:.0f} ms")
+
+    results = []
+    for kind, params in CONFIGS:
+        name = kind + "".join(f" {k[0]}={v:g}" for k, v in params.items())
+        # With and without latency compensation
+        results.append((name, *evaluate(kind, params, times, measured, leads, reference)))
+        if kind != "none":
+            results.append((name + " (no lead)",
+                            *evaluate(kind, params, times, measured, leads, reference, np.zeros_like(leads))))
+
+    print(f"{'filter':<34} {'rms px':>8} {'p95 px':>8} {'jitter px':>10}")
+    for name, rms, p95, jitter in sorted(results, key=lambda r: r[1]):
+        print(f"{name:<34} {rms:8.2f} {p95:8.2f} {jitter:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
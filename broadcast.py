@@ -0,0 +1,450 @@
+"""
+Per-client WebSocket fan-out.
+
+Every connected client gets a ``ClientChannel`` with its own sender task, so
+one slow browser never delays the others or the code that broadcasts.
+
+- Radar frames use a latest-value-wins slot per client: an unsent frame
+  is replaced by a newer one and counted as dropped.
+- Camera frames are encoded once into a shared ``LatestFrame`` slot that
+  every client's sender pulls from when it is ready; frames a client was
+  too slow to take are skipped and counted as dropped for that client.
+- Everything else (mode changes, detections, system messages) goes into a
+  bounded FIFO queue and is delivered in order. A client whose queue
+  overflows, or whose send fails or stalls, is evicted.
+
+Radar samples are also coalesced: ``Broadcaster.update`` collects them and
+the tick task flushes one frame per tick, JSON-encoded once for all clients.
+``frame_hook(frame)`` may add fields to each radar frame just before it is
+encoded (the app adds the occupancy grid rows changed since the last frame).
+
+Camera frames are sent as binary WebSocket messages: a fixed header
+(``CAMERA_HEADER``) followed by the raw JPEG bytes, see
+``encode_camera_frame``.
+"""
+
+import asyncio
+import json
+import logging
+import struct
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from profiling import PROFILER, span
+
+logger = logging.getLogger(__name__)
+
+RADAR_BROADCAST_HZ = 30   # Radar frames per second sent to clients
+MAX_FRAME_SAMPLES = 64    # Samples kept per radar frame (oldest are dropped)
+MAX_QUEUE_SIZE = 64       # Ordered messages buffered per client before it is evicted
+SEND_TIMEOUT = 5.0        # Seconds a single send may take before the client is evicted
+
+SEND_SECONDS = REGISTRY.histogram("radar_ws_send_seconds", "Time to send one WebSocket message, by kind", ["kind"])
+RADAR_FRAME_AGE = REGISTRY.histogram("radar_broadcast_radar_age_seconds",
+                                     "Age of the newest radar sample when its frame is broadcast")
+
+# Message kinds delivered with latest-value-wins semantics
+LATEST_WINS_KINDS = ("radar",)
+
+# Streams with per-client sent/dropped frame counters
+STREAM_KINDS = ("radar", "camera")
+
+# Flags that must reach clients even if the sample carrying them is coalesced away
+STICKY_FLAGS = ("first_data_after_switch", "resume_animation")
+
+# Binary camera frame header (little endian), decoded by handleBinaryMessage in radar.js:
+# magic "CAM1", flags (bit 0 = tracking valid, bit 1 = target valid, bit 2 = target predicted
+# between detector runs), 3 pad bytes, x (int32), y (int32), capture timestamp (float64, seconds
+# since the epoch), then the target of this frame: bbox x0, y0, x1, y1 (int16, frame pixels),
+# score, vx, vy (float32, pixels/s). The JPEG follows the header.
+CAMERA_MAGIC = b"CAM1"
+CAMERA_HEADER = struct.Struct("<4sB3xiid4hfff")
+CAMERA_FLAG_TRACKING = 0x01
+CAMERA_FLAG_TARGET = 0x02
+CAMERA_FLAG_PREDICTED = 0x04
+
+
+def _int16(value):
+    return min(max(int(value), -32768), 32767)
+
+
+# `target`: the camera thread's target features ({"bbox", "score", "velocity", "predicted", ...}) or None
+def encode_camera_frame(jpeg, tracking=None, timestamp=None, target=None):
+    if timestamp is None:
+        timestamp = time.time()
+    flags = 0
+    x = y = 0
+    if tracking is not None:
+        flags |= CAMERA_FLAG_TRACKING
+        x, y = int(tracking[0]), int(tracking[1])
+    bbox, score, velocity = (0, 0, 0, 0), 0.0, (0.0, 0.0)
+    if target is not None:
+        flags |= CAMERA_FLAG_TARGET | (CAMERA_FLAG_PREDICTED if target["predicted"] else 0)
+        bbox = [_int16(value) for value in target["bbox"]]
+        score, velocity = target["score"], target["velocity"]
+    header = CAMERA_HEADER.pack(CAMERA_MAGIC, flags, x, y, timestamp, *bbox,
+                                score, velocity[0], velocity[1])
+    return header + jpeg
+
+
+class ClientEvicted(Exception):
+    pass
+
+
+class LatestFrame:
+    """The most recent encoded camera frame, shared by all clients.
+
+    ``publish`` is called from the camera encode workers; the sequence number
+    is taken under a lock, so concurrent publishes never reuse or skip one,
+    and the frame and its sequence number are replaced together (one tuple
+    assignment), so readers on the event loop never see a torn update. Listeners are woken with at most one
+    pending ``call_soon_threadsafe`` however fast frames are published.
+    """
+
+    def __init__(self):
+        self._frame = (0, None)  # (sequence, data)
+        self._publish_lock = threading.Lock()
+        self.loop = None
+        self.on_publish = None
+        self._notify_pending = False
+        self._notify_lock = threading.Lock()
+        self.consumed_sequence = 0  # Newest sequence any client has taken
+        self.captured = 0
+        self.encoded = 0
+        self.skipped = 0
+
+    @property
+    def sequence(self):
+        return self._frame[0]
+
+    def get(self):
+        return self._frame
+
+    # True when the last published frame has been taken by some client,
+    # i.e. encoding another one is not wasted work
+    def wanted(self):
+        sequence, data = self._frame
+        return data is None or self.consumed_sequence >= sequence
+
+    def publish(self, data):
+        with self._publish_lock:
+            self._frame = (self._frame[0] + 1, data)
+            if data is not None:
+                self.encoded += 1
+        loop = self.loop
+        if loop is None:
+            return
+        with self._notify_lock:
+            if self._notify_pending:
+                return
+            self._notify_pending = True
+        try:
+            loop.call_soon_threadsafe(self._notify)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            self._notify_pending = False
+
+    # Forget the current frame so late joiners don't get a stale image
+    def clear(self):
+        self.publish(None)
+
+    def _notify(self):
+        with self._notify_lock:
+            self._notify_pending = False
+        if self.on_publish is not None:
+            self.on_publish()
+
+
+class ClientChannel:
+    """Outbound messages for one WebSocket client."""
+
+    def __init__(self, websocket, max_queue=MAX_QUEUE_SIZE, send_timeout=SEND_TIMEOUT, camera=None):
+        self.websocket = websocket
+        self.camera = camera
+        # Start one behind the current frame so a new client gets it right away
+        self.camera_sequence = max(camera.sequence - 1, 0) if camera is not None else 0
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self._queue = deque()
+        self._slots = {}
+        self._wakeup = asyncio.Event()
+        self.task = None
+        self.closed = False
+        self.sent = 0
+        self.frames_sent = {kind: 0 for kind in STREAM_KINDS}
+        self.dropped = {kind: 0 for kind in STREAM_KINDS}
+        self.max_queue_depth = 0
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def offer(self, message, kind=None):
+        if self.closed:
+            return
+        if kind in LATEST_WINS_KINDS:
+            if kind in self._slots:
+                self.dropped[kind] += 1
+            self._slots[kind] = message
+        else:
+            if len(self._queue) >= self.max_queue:
+                raise ClientEvicted(f"outbound queue full ({self.max_queue} messages)")
+            self._queue.append(message)
+            if len(self._queue) > self.max_queue_depth:
+                self.max_queue_depth = len(self._queue)
+        self._wakeup.set()
+
+    # Forget unsent stream frames (ordered messages are kept)
+    def clear(self, kind=None):
+        if kind is None:
+            self._slots.clear()
+        else:
+            self._slots.pop(kind, None)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _next_camera_frame(self):
+        if self.camera is None:
+            return None
+        sequence, data = self.camera.get()
+        if sequence <= self.camera_sequence:
+            return None
+        if data is not None:
+            self.dropped["camera"] += sequence - self.camera_sequence - 1
+        self.camera_sequence = sequence
+        if data is None:
+            return None
+        if sequence > self.camera.consumed_sequence:
+            self.camera.consumed_sequence = sequence
+        return data
+
+    # Returns (message, stream kind or None)
+    def _next_message(self):
+        # Ordered messages first so a frame never overtakes the mode change before it
+        if self._queue:
+            return self._queue.popleft(), None
+        for kind in LATEST_WINS_KINDS:
+            if kind in self._slots:
+                return self._slots.pop(kind), kind
+        frame = self._next_camera_frame()
+        if frame is not None:
+            return frame, "camera"
+        return None, None
+
+    async def _send(self, message):
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        else:
+            await self.websocket.send_text(message)
+
+    async def run(self):
+        while not self.closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                message, kind = self._next_message()
+                if message is None:
+                    break
+                started = time.perf_counter()
+                await asyncio.wait_for(self._send(message), timeout=self.send_timeout)
+                finished = time.perf_counter()
+                SEND_SECONDS.labels(kind or "message").observe(finished - started)
+                PROFILER.record("ws_send", started, finished, kind=kind or "message")
+                self.sent += 1
+                if kind is not None:
+                    self.frames_sent[kind] += 1
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "frames_sent": dict(self.frames_sent),
+            "dropped": dict(self.dropped),
+        }
+
+
+class Broadcaster:
+    def __init__(self, tick_hz=RADAR_BROADCAST_HZ, max_samples=MAX_FRAME_SAMPLES,
+                 max_queue=MAX_QUEUE_SIZE, send_timeout=SEND_TIMEOUT, on_evict=None, frame_hook=None):
+        self.tick_hz = tick_hz
+        self.max_samples = max_samples
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.on_evict = on_evict
+        self.frame_hook = frame_hook
+        self.channels = {}
+        self.camera = LatestFrame()
+        self.camera.on_publish = self._camera_published
+        self._state = None
+        self._samples = []
+        self._flags = {}
+        self.samples_received = 0
+        self.frames_encoded = 0
+        self.messages_broadcast = 0
+        self.evicted = 0
+        # Totals of clients that have gone away, so aggregate counters never decrease
+        self._retired_sent = 0
+        self._retired_frames_sent = {kind: 0 for kind in STREAM_KINDS}
+        self._retired_dropped = {kind: 0 for kind in STREAM_KINDS}
+
+    def add_client(self, websocket):
+        if self.camera.loop is None:
+            self.camera.loop = asyncio.get_running_loop()
+        channel = ClientChannel(websocket, self.max_queue, self.send_timeout, self.camera)
+        channel.task = asyncio.create_task(self._run_channel(channel))
+        self.channels[websocket] = channel
+        return channel
+
+    def remove_client(self, websocket):
+        channel = self.channels.pop(websocket, None)
+        if channel is not None:
+            channel.closed = True
+            self._retired_sent += channel.sent
+            for kind in STREAM_KINDS:
+                self._retired_frames_sent[kind] += channel.frames_sent[kind]
+                self._retired_dropped[kind] += channel.dropped[kind]
+            if channel.task is not None and channel.task is not asyncio.current_task():
+                channel.task.cancel()
+
+    def evict(self, channel, reason):
+        if channel.websocket not in self.channels:
+            return
+        logger.warning("Evicting WebSocket client: %s", reason)
+        self.evicted += 1
+        self.remove_client(channel.websocket)
+        if self.on_evict is not None:
+            self.on_evict(channel.websocket)
+        asyncio.ensure_future(self._close(channel.websocket))
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def _run_channel(self, channel):
+        try:
+            await channel.run()
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self.evict(channel, f"send took longer than {channel.send_timeout}s")
+        except Exception as e:
+            self.evict(channel, f"send failed: {e}")
+
+    def _camera_published(self):
+        for channel in self.channels.values():
+            channel.wake()
+
+    # Publish an encoded camera frame; safe to call from any thread
+    def publish_camera_frame(self, data):
+        self.camera.publish(data)
+
+    # Queue one encoded message for every client (never blocks)
+    def broadcast(self, message, kind=None):
+        self.messages_broadcast += 1
+        for channel in list(self.channels.values()):
+            try:
+                channel.offer(message, kind)
+            except ClientEvicted as e:
+                self.evict(channel, str(e))
+
+    # Queue a message for one client, behind anything already queued for it
+    def send(self, websocket, message, kind=None):
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return
+        try:
+            channel.offer(message, kind)
+        except ClientEvicted as e:
+            self.evict(channel, str(e))
+
+    # Record the latest radar state; `sample` is (angle, distance) when it came from the sensor
+    def update(self, state, sample=None):
+        self._state = state
+        if sample is not None:
+            self._samples.append(sample)
+            self.samples_received += 1
+            if len(self._samples) > self.max_samples:
+                del self._samples[0]
+        for flag in STICKY_FLAGS:
+            if state.get(flag):
+                self._flags[flag] = True
+
+    # Forget radar data not yet sent (e.g. on a mode switch that freezes the display)
+    def reset(self):
+        self._state = None
+        self._samples = []
+        self._flags = {}
+        for channel in self.channels.values():
+            channel.clear("radar")
+
+    def take_frame(self):
+        if self._state is None:
+            return None
+        frame = dict(self._state)
+        frame.update(self._flags)
+        frame["samples"] = self._samples
+        self._state = None
+        self._samples = []
+        self._flags = {}
+        return frame
+
+    def flush(self):
+        frame = self.take_frame()
+        if frame is None or not self.channels:
+            return
+        self.frames_encoded += 1
+        if self.frame_hook is not None:
+            self.frame_hook(frame)
+        if "timestamp" in frame:
+            now = time.time()
+            RADAR_FRAME_AGE.observe(now - frame["timestamp"])
+            PROFILER.record_wall("radar_sample_to_broadcast", frame["timestamp"], now, track="radar latency")
+        with span("json_encode", samples=len(frame["samples"])):
+            message = json.dumps(frame)
+        with span("broadcast", kind="radar", clients=len(self.channels)):
+            self.broadcast(message, "radar")
+
+    async def run(self):
+        interval = 1.0 / self.tick_hz
+        next_tick = time.perf_counter()
+        while True:
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Fell behind - don't try to catch up with a burst of ticks
+                next_tick = time.perf_counter()
+                await asyncio.sleep(0)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception("Error flushing radar frame: %s", e)
+
+    def stats(self):
+        channels = [channel.stats() for channel in self.channels.values()]
+        frames_sent = {kind: self._retired_frames_sent[kind] + sum(c["frames_sent"][kind] for c in channels)
+                       for kind in STREAM_KINDS}
+        dropped = {kind: self._retired_dropped[kind] + sum(c["dropped"][kind] for c in channels)
+                   for kind in STREAM_KINDS}
+        return {
+            "clients": len(channels),
+            "queue_depth_max": max((c["queue_depth"] for c in channels), default=0),
+            "queue_depth_total": sum(c["queue_depth"] for c in channels),
+            "sent": self._retired_sent + sum(c["sent"] for c in channels),
+            "frames_sent": frames_sent,
+            "dropped": dropped,
+            "evicted": self.evicted,
+            "messages_broadcast": self.messages_broadcast,
+            "radar_samples": self.samples_received,
+            "radar_frames": self.frames_encoded,
+            "camera_captured": self.camera.captured,
+            "camera_encoded": self.camera.encoded,
+            "camera_skipped": self.camera.skipped,
+        }
@@ -0,0 +1,154 @@
+"""
+Staged camera pipeline.
+
+Capture, inference and encoding run in separate threads connected by
+``LatestSlot`` hand-offs, so the stages overlap and the frame rate is set by
+the slowest stage instead of the sum of all of them. Each slot holds at most
+one item: a stage that falls behind works on the newest frame and the frames
+it never saw are counted as dropped.
+
+OpenCV and MediaPipe release the GIL while they work, so threads are enough
+to overlap the stages.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+STATS_WINDOW = 120  # Recent samples kept for latency / FPS figures
+
+
+class FramePacket:
+    """One camera frame travelling through the pipeline."""
+
+    __slots__ = ("sequence", "frame", "capture_time", "timings", "result")
+
+    def __init__(self, sequence, frame, capture_time):
+        self.sequence = sequence
+        self.frame = frame
+        self.capture_time = capture_time  # time.time() when the frame was read
+        self.timings = {}  # stage name -> seconds spent in that stage
+        self.result = None  # Set by the inference stage
+
+
+class LatestSlot:
+    """Single-item hand-off between two stages; a newer item replaces an unread one."""
+
+    def __init__(self, name):
+        self.name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._item = None
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self.put_count += 1
+            self._cond.notify()
+
+    # Returns None on timeout or once the slot is closed
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None and not self._closed:
+                self._cond.wait(timeout)
+            item = self._item
+            self._item = None
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Latency and throughput of one stage over the last ``window`` items."""
+
+    def __init__(self, window=STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._times = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._times.append(time.perf_counter())
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            times = list(self._times)
+        if not latencies:
+            return {"count": self.count, "fps": 0.0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        span = times[-1] - times[0]
+        return {
+            "count": self.count,
+            "fps": round((len(times) - 1) / span, 1) if span > 0 else 0.0,
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+
+
+class PipelineStage:
+    """Runs ``func(item)`` on items taken from ``source`` with ``workers`` threads.
+
+    A non-None return value is handed to ``sink``. With more than one worker
+    items can finish out of order; stages that care compare
+    ``FramePacket.sequence``.
+    """
+
+    def __init__(self, name, func, source, sink=None, workers=1):
+        self.name = name
+        self.func = func
+        self.source = source
+        self.sink = sink
+        self.workers = max(1, int(workers))
+        self.stats = StageStats()
+        self.errors = 0
+        self.running = False
+        self._threads = []
+
+    def start(self):
+        self.running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"camera-{self.name}-{index}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while self.running:
+            item = self.source.get(timeout=0.1)
+            if item is None:
+                continue
+            started = time.perf_counter()
+            try:
+                output = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                logger.exception("Error in camera %s stage: %s", self.name, e)
+                continue
+            elapsed = time.perf_counter() - started
+            self.stats.record(elapsed)
+            if isinstance(item, FramePacket):
+                item.timings[self.name] = elapsed
+            if self.sink is not None and output is not None:
+                self.sink.put(output)
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        self.source.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
@@ -0,0 +1,242 @@
+"""
+Frame sources for the camera thread.
+
+``open_camera(source)`` returns an object with the ``cv2.VideoCapture``
+calls the camera thread uses (``read``, ``isOpened``, ``set``, ``get``,
+``release``). ``source`` (``RADAR_CAMERA_SOURCE``) is one of:
+
+- ``0``, ``1``, ...: a webcam by index (``cv2.VideoCapture``)
+- ``synthetic`` or ``synthetic://?fps=30&width=1280&height=720&seed=0&target=face.jpg``:
+  generated frames with a moving target, a bright disc or the image given
+  by ``target`` (e.g. a face crop, so the detectors have something to find)
+- ``video://clips/face.mp4?speed=1&loop=1``, or just the file path
+- ``images://frames/?fps=30&loop=1``, or just the directory: an image
+  sequence in file name order (a glob pattern works too)
+
+Everything except the webcam plays at a fixed rate, ``fps`` times ``speed``
+(video files use their own fps). ``fps=0`` or ``speed=0`` hands out frames
+as fast as they are read, to measure inference and encoding throughput.
+Frames are paced against a schedule from the first frame, so processing time
+does not make the rate drift, and frame N is the same image on every run.
+``loop=0`` ends the stream after the last frame (``read`` returns False).
+"""
+
+import glob
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+SYNTHETIC_FPS = 30.0
+IMAGE_SEQUENCE_FPS = 30.0
+IMAGE_CACHE_LIMIT = 300  # Sequences up to this many images are decoded once and kept in memory
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MAX_SCHEDULE_LAG = 1.0   # Seconds behind schedule before pacing restarts from "now" instead of catching up
+
+
+class FrameSource:
+    """``cv2.VideoCapture`` surface with fixed-rate pacing; subclasses implement ``_next_frame``."""
+
+    def __init__(self, fps, speed=1.0, loop=True):
+        self.fps = fps
+        self.speed = speed
+        self.loop = loop
+        self.frame_index = 0
+        self.width = 0
+        self.height = 0
+        self._open = True
+        self._schedule_start = None
+
+    @property
+    def frame_interval(self):
+        rate = self.fps * self.speed
+        return 1.0 / rate if rate > 0 else 0.0
+
+    def _pace(self):
+        interval = self.frame_interval
+        if interval <= 0:
+            return
+        now = time.perf_counter()
+        if self._schedule_start is None:
+            self._schedule_start = now - self.frame_index * interval
+        due = self._schedule_start + self.frame_index * interval
+        if due > now:
+            time.sleep(due - now)
+        elif now - due > MAX_SCHEDULE_LAG:
+            self._schedule_start = now - self.frame_index * interval
+
+    def isOpened(self):
+        return self._open
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS:
+            self.fps = float(value)
+            self._schedule_start = None
+            return True
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        return 0.0
+
+    def _next_frame(self):
+        raise NotImplementedError
+
+    def read(self):
+        if not self._open:
+            return False, None
+        self._pace()
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        self._open = False
+
+
+class SyntheticCamera(FrameSource):
+    """Textured background with a moving target, paced at ``fps``."""
+
+    def __init__(self, width=1280, height=720, fps=SYNTHETIC_FPS, speed=1.0, target=None, seed=0):
+        FrameSource.__init__(self, fps, speed)
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.target = None
+        if target:
+            self.target = cv2.imread(target)
+            if self.target is None:
+                raise ValueError(f"Cannot read target image {target}")
+        self._background = None
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.width = int(value)
+            self._background = None
+            return True
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.height = int(value)
+            self._background = None
+            return True
+        return FrameSource.set(self, prop, value)
+
+    # Target center at frame `index`; depends on the index only, not on fps or timing
+    def target_position(self, index):
+        t = index / SYNTHETIC_FPS
+        return (int(self.width / 2 + self.width / 3 * np.sin(t * 0.8)),
+                int(self.height / 2 + self.height / 4 * np.sin(t * 1.3)))
+
+    def _next_frame(self):
+        if self._background is None:
+            # Smooth random texture so JPEG sizes are closer to a real scene than a flat image
+            rng = np.random.default_rng(self.seed)
+            coarse = rng.integers(0, 160, (max(1, self.height // 24), max(1, self.width // 24), 3), dtype=np.uint8)
+            self._background = cv2.resize(coarse, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        frame = self._background.copy()
+        cx, cy = self.target_position(self.frame_index)
+        if self.target is None:
+            cv2.circle(frame, (cx, cy), self.height // 10, (230, 220, 210), -1)
+        else:
+            th, tw = self.target.shape[:2]
+            x0 = min(max(cx - tw // 2, 0), max(self.width - tw, 0))
+            y0 = min(max(cy - th // 2, 0), max(self.height - th, 0))
+            patch = self.target[:self.height - y0, :self.width - x0]
+            frame[y0:y0 + patch.shape[0], x0:x0 + patch.shape[1]] = patch
+        return frame
+
+
+class VideoFileSource(FrameSource):
+    """Video file decoded by OpenCV, played at its own fps times ``speed``."""
+
+    def __init__(self, path, speed=1.0, loop=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"Cannot open video {path}")
+        FrameSource.__init__(self, self.capture.get(cv2.CAP_PROP_FPS) or SYNTHETIC_FPS, speed, loop)
+        self.path = path
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def _next_frame(self):
+        ret, frame = self.capture.read()
+        if not ret and self.loop and self.frame_index > 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return frame if ret else None
+
+    def release(self):
+        FrameSource.release(self)
+        self.capture.release()
+
+
+class ImageSequenceSource(FrameSource):
+    """Images from a directory or glob pattern, in file name order."""
+
+    def __init__(self, pattern, fps=IMAGE_SEQUENCE_FPS, speed=1.0, loop=True):
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            paths = glob.glob(pattern)
+        self.paths = sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise ValueError(f"No images in {pattern}")
+        FrameSource.__init__(self, fps, speed, loop)
+        # Decoding every read would put JPEG decode time into the capture stage
+        self._cache = {} if len(self.paths) <= IMAGE_CACHE_LIMIT else None
+        self.height, self.width = self._load(0).shape[:2]
+
+    def _load(self, position):
+        if self._cache is not None and position in self._cache:
+            return self._cache[position]
+        image = cv2.imread(self.paths[position])
+        if image is None:
+            raise ValueError(f"Cannot read image {self.paths[position]}")
+        if self._cache is not None:
+            self._cache[position] = image
+        return image
+
+    def _next_frame(self):
+        position = self.frame_index
+        if position >= len(self.paths):
+            if not self.loop:
+                return None
+            position %= len(self.paths)
+        # Copy: the camera thread draws on the frame
+        return self._load(position).copy()
+
+
+def open_camera(source="0"):
+    source = str(source).strip()
+    if source.isdigit():
+        return cv2.VideoCapture(int(source))
+
+    parts = urlsplit(source)
+    params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    speed = float(params.get("speed", 1.0))
+    loop = params.get("loop", "1") not in ("0", "false", "no")
+    path = parts.netloc + parts.path
+
+    if source == "synthetic" or parts.scheme == "synthetic":
+        return SyntheticCamera(int(params.get("width", 1280)), int(params.get("height", 720)),
+                               float(params.get("fps", SYNTHETIC_FPS)), speed,
+                               params.get("target"), int(params.get("seed", 0)))
+    if parts.scheme == "video":
+        return VideoFileSource(path, speed, loop)
+    if parts.scheme == "images":
+        return ImageSequenceSource(path, float(params.get("fps", IMAGE_SEQUENCE_FPS)), speed, loop)
+
+    # Plain path: a directory or glob of images, anything else a video file
+    if os.path.isdir(source) or any(ch in source for ch in "*?["):
+        return ImageSequenceSource(source)
+    return VideoFileSource(source)
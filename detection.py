@@ -0,0 +1,321 @@
+"""
+Face / hand detection helpers shared by the camera pipeline and the benchmarks.
+
+Detection does not need the full camera resolution: only one point (nose
+centroid or wrist) is used. ``inference_view`` crops the frame to a square
+region of interest around the last known position (optional) and downscales
+it to at most ``max_width`` pixels; backends return points normalized to
+that small image, mapped back to full-frame pixels with ``to_frame_point``.
+
+Detector backends share one interface (``DetectorBackend``):
+``locate(image, window)`` returns the tracked point in frame pixels or None, ``color_conversion`` is the
+``cv2.cvtColor`` code that produces the image they expect, and ``close()``
+releases the model. ``DETECTOR_BACKENDS`` maps names to backend classes.
+``detect(image, window)`` returns the full ``Target`` (point, bounding box,
+score) computed with vectorized operations on ``landmarks_array``.
+"""
+
+import os
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from profiling import span
+
+try:
+    import mediapipe as mp
+    mp_face_mesh = mp.solutions.face_mesh
+    mp_face_detection = mp.solutions.face_detection
+    mp_hands = mp.solutions.hands
+except ImportError:
+    mp = None
+
+# Landmarks
+FACE_CENTER_KEYPOINTS = [168, 6, 197, 195, 5]
+NOSE_KEYPOINTS = [1, 2, 3, 4, 5, 6, 168, 197, 195]
+NOSE_KEYPOINTS_INDEX = np.array(NOSE_KEYPOINTS)
+NOSE_WEIGHTS = np.ones(len(NOSE_KEYPOINTS), dtype=np.float32)  # Relative weight of each nose keypoint in the target
+WRIST_IDX = 0
+WRIST_KEYPOINTS = np.array([WRIST_IDX])
+WRIST_WEIGHTS = np.ones(1, dtype=np.float32)
+
+# landmarks_array columns
+LANDMARK_X, LANDMARK_Y, LANDMARK_Z, LANDMARK_VISIBILITY = range(4)
+
+# Serialized NormalizedLandmark fields (proto2: every set field is written, in field order):
+# tag byte (field number << 3 | fixed32 wire type) -> landmarks_array column
+_LANDMARK_FIELD_COLUMNS = {0x0D: LANDMARK_X, 0x15: LANDMARK_Y, 0x1D: LANDMARK_Z, 0x25: LANDMARK_VISIBILITY}
+_PRESENCE_TAG = 0x2D
+
+# Tracking modes (app.tracking_mode)
+FACE_TRACKING = 1
+HAND_TRACKING = 2
+
+
+class Target(NamedTuple):
+    x: float       # Tracked point (nose / wrist), frame pixels
+    y: float
+    bbox: tuple    # (x0, y0, x1, y1) of the face / hand, frame pixels
+    score: float   # Detector confidence, 1.0 when the backend has none
+
+
+# Record layouts seen so far: (record size, tag bytes) -> structured dtype reading the floats in place
+_record_dtypes = {}
+
+
+def _record_dtype(record, tags):
+    key = (record, tags)
+    dtype = _record_dtypes.get(key)
+    if dtype is None:
+        names, offsets = [], []
+        for index, tag in enumerate(tags):
+            if tag in _LANDMARK_FIELD_COLUMNS:
+                names.append(f"c{_LANDMARK_FIELD_COLUMNS[tag]}")
+                offsets.append(3 + 5 * index)
+        dtype = np.dtype({"names": names, "formats": ["<f4"] * len(names),
+                          "offsets": offsets, "itemsize": record})
+        _record_dtypes[key] = dtype
+    return dtype
+
+
+# All landmarks of a NormalizedLandmarkList as an (N, 4) float32 array: x, y, z, visibility.
+# Reading 478 FaceMesh landmarks attribute by attribute costs ~0.5 ms; serializing the list
+# and reading its fixed-size records in place with NumPy is ~10x cheaper. Missing visibility is 1.0.
+def landmarks_array(landmark_list):
+    count = len(landmark_list.landmark)
+    data = landmark_list.SerializeToString()
+    if count and len(data) % count == 0:
+        record = len(data) // count
+        fields = (record - 2) // 5
+        tags = data[2:record:5]
+        # Every record must be: 0x0A, body length, then the same fixed32 fields in the same order
+        if (record == 2 + 5 * fields and record - 2 < 128
+                and all(tag in _LANDMARK_FIELD_COLUMNS or tag == _PRESENCE_TAG for tag in tags)
+                and data[0::record] == b"\x0a" * count
+                and data[1::record] == bytes((record - 2,)) * count
+                and all(data[2 + 5 * i::record] == bytes((tag,)) * count for i, tag in enumerate(tags))):
+            records = np.frombuffer(data, dtype=_record_dtype(record, tags))
+            result = np.empty((count, 4), dtype=np.float32, order="F")
+            for column in range(4):
+                name = f"c{column}"
+                if name in records.dtype.names:
+                    result[:, column] = records[name]
+                else:
+                    result[:, column] = 0.0 if column == LANDMARK_Z else 1.0
+            return result
+
+    # Records of different sizes (some field unset on some landmarks) - read attributes
+    return np.array([
+        (l.x, l.y, l.z, l.visibility if l.HasField("visibility") else 1.0)
+        for l in landmark_list.landmark
+    ], dtype=np.float32)
+
+
+# Target from normalized landmarks: confidence-weighted mean of `indices`, bbox of all points,
+# mapped to frame pixels (only the resulting scalars are mapped)
+def landmarks_target(landmarks, window, indices, weights, score):
+    x0, y0, width, height = window
+    selected = landmarks[indices]
+    w = weights * selected[:, LANDMARK_VISIBILITY]
+    total = w.sum()
+    if total <= 0:
+        w, total = weights, weights.sum()
+    x, y = (w @ selected[:, :2]) / total
+    # Column-wise reductions: the columns are contiguous (Fortran order), min(axis=0) is not as fast
+    xs = landmarks[:, LANDMARK_X]
+    ys = landmarks[:, LANDMARK_Y]
+    return Target(
+        x0 + float(x) * width, y0 + float(y) * height,
+        (x0 + float(xs.min()) * width, y0 + float(ys.min()) * height,
+         x0 + float(xs.max()) * width, y0 + float(ys.max()) * height),
+        float(score)
+    )
+
+
+class DetectorBackend:
+    """Base of the detector backends: subclasses set ``model`` and implement ``detect``."""
+
+    tracking_mode = FACE_TRACKING
+    color_conversion = cv2.COLOR_BGR2RGB
+    label = ""  # Name shown in the UI
+
+    # Whether the backend can be created here (MediaPipe installed by default)
+    @classmethod
+    def available(cls):
+        return mp is not None
+
+    def detect(self, image, window):
+        raise NotImplementedError
+
+    def locate(self, image, window):
+        return target_point(self.detect(image, window))
+
+    def close(self):
+        self.model.close()
+
+
+class FaceMeshBackend(DetectorBackend):
+    """MediaPipe FaceMesh (468 refined landmarks); nose = mean of NOSE_KEYPOINTS."""
+
+    tracking_mode = FACE_TRACKING
+    color_conversion = cv2.COLOR_BGR2RGB
+    label = "FaceMesh (accurate)"
+
+    def __init__(self):
+        self.model = mp_face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def detect(self, image, window):
+        results = self.model.process(image)
+        if not results.multi_face_landmarks:
+            return None
+        landmarks = landmarks_array(results.multi_face_landmarks[-1])
+        # FaceMesh has no per-face score; it only reports faces above min_tracking_confidence
+        return landmarks_target(landmarks, window, NOSE_KEYPOINTS_INDEX, NOSE_WEIGHTS, 1.0)
+
+
+class FaceDetectionBackend(DetectorBackend):
+    """MediaPipe BlazeFace short-range detector (6 keypoints); uses the nose tip keypoint."""
+
+    tracking_mode = FACE_TRACKING
+    color_conversion = cv2.COLOR_BGR2RGB
+    label = "Face Detection (fast)"
+
+    def __init__(self):
+        self.model = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+
+    def detect(self, image, window):
+        results = self.model.process(image)
+        if not results.detections:
+            return None
+        # Most confident face
+        detection = max(results.detections, key=lambda d: d.score[0])
+        nose = mp_face_detection.get_key_point(detection, mp_face_detection.FaceKeyPoint.NOSE_TIP)
+        box = detection.location_data.relative_bounding_box
+        bbox = (to_frame_point(window, box.xmin, box.ymin)
+                + to_frame_point(window, box.xmin + box.width, box.ymin + box.height))
+        x, y = to_frame_point(window, nose.x, nose.y)
+        return Target(x, y, bbox, float(detection.score[0]))
+
+
+class HaarFaceBackend(DetectorBackend):
+    """OpenCV Haar cascade (no MediaPipe needed); nose estimated from the face box."""
+
+    tracking_mode = FACE_TRACKING
+    color_conversion = cv2.COLOR_BGR2GRAY
+    label = "Haar cascade (fastest)"
+    CASCADE = "haarcascade_frontalface_default.xml"
+    NOSE_HEIGHT = 0.58  # Nose tip, as a fraction of the box height from its top
+
+    @classmethod
+    def available(cls):
+        return os.path.isfile(os.path.join(cv2.data.haarcascades, cls.CASCADE))
+
+    def __init__(self):
+        self.model = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, self.CASCADE))
+        if self.model.empty():
+            raise RuntimeError(f"Could not load {self.CASCADE}")
+
+    def detect(self, image, window):
+        height, width = image.shape[:2]
+        faces = self.model.detectMultiScale(image, scaleFactor=1.2, minNeighbors=5,
+                                            minSize=(max(24, width // 12), max(24, width // 12)))
+        if len(faces) == 0:
+            return None
+        # Largest face
+        x, y, w, h = faces[np.argmax(faces[:, 2] * faces[:, 3])]
+        bbox = (to_frame_point(window, x / width, y / height)
+                + to_frame_point(window, (x + w) / width, (y + h) / height))
+        nose_x, nose_y = to_frame_point(window, (x + w / 2) / width, (y + h * self.NOSE_HEIGHT) / height)
+        return Target(nose_x, nose_y, bbox, 1.0)
+
+    # CascadeClassifier has nothing to release
+    def close(self):
+        pass
+
+
+class HandsBackend(DetectorBackend):
+    """MediaPipe Hands (lite model); uses the wrist landmark."""
+
+    tracking_mode = HAND_TRACKING
+    color_conversion = cv2.COLOR_BGR2RGB
+    label = "Hands"
+
+    def __init__(self):
+        self.model = mp_hands.Hands(
+            model_complexity=0,
+            max_num_hands=1,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def detect(self, image, window):
+        results = self.model.process(image)
+        if not results.multi_hand_landmarks:
+            return None
+        landmarks = landmarks_array(results.multi_hand_landmarks[-1])
+        score = results.multi_handedness[-1].classification[0].score if results.multi_handedness else 1.0
+        return landmarks_target(landmarks, window, WRIST_KEYPOINTS, WRIST_WEIGHTS, score)
+
+
+# Detector backends by name; face backends are interchangeable for FACE_TRACKING
+DETECTOR_BACKENDS = {
+    "face_mesh": FaceMeshBackend,
+    "face_detection": FaceDetectionBackend,
+    "haar": HaarFaceBackend,
+    "hands": HandsBackend,
+}
+
+DEFAULT_FACE_BACKEND = "face_mesh"
+DEFAULT_HAND_BACKEND = "hands"
+
+
+# Names of the backends for a tracking mode that can be created here
+def backends_for_mode(tracking_mode):
+    return [name for name, backend in DETECTOR_BACKENDS.items()
+            if backend.tracking_mode == tracking_mode and backend.available()]
+
+
+def create_detector(name):
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name}")
+    return DETECTOR_BACKENDS[name]()
+
+
+# Crop / downscale a BGR frame for detection and convert it to the backend's color format.
+# Returns (image, window) where window = (x, y, width, height) of the region in frame pixels.
+def inference_view(frame, max_width=0, center=None, roi_size=0, color_conversion=cv2.COLOR_BGR2RGB):
+    frame_height, frame_width = frame.shape[:2]
+    x0, y0, width, height = 0, 0, frame_width, frame_height
+    region = frame
+
+    if center is not None and roi_size:
+        side = int(min(roi_size, frame_width, frame_height))
+        x0 = min(max(int(center[0] - side / 2), 0), frame_width - side)
+        y0 = min(max(int(center[1] - side / 2), 0), frame_height - side)
+        width = height = side
+        region = frame[y0:y0 + side, x0:x0 + side]
+
+    if max_width and width > max_width:
+        scaled_height = max(1, round(height * max_width / width))
+        with span("resize", width=int(max_width)):
+            region = cv2.resize(region, (int(max_width), scaled_height), interpolation=cv2.INTER_AREA)
+
+    with span("cvtColor"):
+        image = cv2.cvtColor(region, color_conversion)
+    return image, (x0, y0, width, height)
+
+
+def target_point(target):
+    return None if target is None else (target.x, target.y)
+
+
+# Map a point normalized to the inference view back to frame pixels
+def to_frame_point(window, x, y):
+    x0, y0, width, height = window
+    return (x0 + float(x) * width, y0 + float(y) * height)
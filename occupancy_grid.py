@@ -0,0 +1,159 @@
+"""
+Polar occupancy grid of the radar scene (angle bins x range bins).
+
+Each radar sample updates one angle row: the bins in front of the echo are
+seen empty (``MISS_FACTOR``), the bin at the echo gains ``HIT_WEIGHT`` of the
+remaining evidence. Evidence fades with a half-life (``GRID_HALF_LIFE``);
+rows are decayed lazily, when they are touched or read, so an update costs
+one row and a lookup is O(1) (``level``).
+
+Clients get the rows changed since the last radar frame (``take_delta``) as
+whole rows, quantized to 0..255 and sparse. A row replaces the client's
+copy, so a radar frame a slow client skipped is repaired the next time the
+sweep passes that angle. Clients fade the rows with the same half-life.
+
+Detection (``detected``) needs the evidence of a bin within range to pass
+``OCCUPIED_LEVEL``, i.e. more than one echo, instead of a single short
+reading.
+
+A client that connects (or reconnects) gets the whole scene at once: every
+non-empty grid row (``snapshot``) and the latest distance per degree
+(``SweepBuffer``), then follows the radar frames as usual.
+"""
+
+import os
+
+import numpy as np
+
+GRID_MIN_ANGLE = 15    # Same as MIN_RADAR_ANGLE / MAX_RADAR_ANGLE in the sketch
+GRID_MAX_ANGLE = 165
+GRID_ANGLE_BIN = float(os.environ.get("RADAR_GRID_ANGLE_BIN", "3"))   # Degrees per angle bin
+GRID_RANGE_BIN = float(os.environ.get("RADAR_GRID_RANGE_BIN", "5"))   # cm per range bin
+GRID_MAX_RANGE = 150.0  # cm; farther readings (200 = no echo, give or take noise) only clear the row
+GRID_HALF_LIFE = float(os.environ.get("RADAR_GRID_HALF_LIFE", "5"))   # Seconds for evidence to halve
+HIT_WEIGHT = 0.5        # Share of the missing evidence an echo adds to its bin
+MISS_FACTOR = 0.5       # Evidence kept by bins the beam passed through
+OCCUPIED_LEVEL = 0.7    # Evidence at which a bin counts as occupied (two echoes in a row)
+MIN_SENT_LEVEL = 8      # Quantized levels below this are left out of deltas (0..255)
+SWEEP_MAX_AGE = 30.0    # Seconds after which a degree of the sweep buffer counts as unknown
+
+
+class PolarOccupancyGrid:
+    def __init__(self, min_angle=GRID_MIN_ANGLE, max_angle=GRID_MAX_ANGLE, angle_bin=GRID_ANGLE_BIN,
+                 max_range=GRID_MAX_RANGE, range_bin=GRID_RANGE_BIN, half_life=GRID_HALF_LIFE):
+        self.min_angle = min_angle
+        self.max_angle = max_angle
+        self.angle_bin = angle_bin
+        self.max_range = max_range
+        self.range_bin = range_bin
+        self.half_life = half_life
+        self.angle_bins = int(np.ceil((max_angle - min_angle + 1) / angle_bin))
+        self.range_bins = int(np.ceil(max_range / range_bin))
+        self.values = np.zeros((self.angle_bins, self.range_bins), dtype=np.float32)
+        self.row_times = [0.0] * self.angle_bins  # Time each row was last decayed to (list: fast scalar access)
+        self._dirty = set()
+        self.samples = 0
+        self.rows_sent = 0
+
+    def config(self):
+        return {
+            "min_angle": self.min_angle,
+            "angle_bin": self.angle_bin,
+            "angle_bins": self.angle_bins,
+            "range_bin": self.range_bin,
+            "range_bins": self.range_bins,
+            "half_life": self.half_life,
+        }
+
+    def angle_index(self, angle):
+        return min(max(int((angle - self.min_angle) // self.angle_bin), 0), self.angle_bins - 1)
+
+    def _decay_row(self, row, now):
+        elapsed = now - self.row_times[row]
+        if elapsed > 0:
+            self.values[row] *= 0.5 ** (elapsed / self.half_life)
+            self.row_times[row] = now
+
+    def update(self, angle, distance, now):
+        if distance <= 0:
+            return  # No reading
+        row = self.angle_index(angle)
+        values = self.values[row]
+        elapsed = now - self.row_times[row]
+        decay = 0.5 ** (elapsed / self.half_life) if elapsed > 0 else 1.0
+        self.row_times[row] = max(now, self.row_times[row])
+        hit = min(int(distance // self.range_bin), self.range_bins)
+        # Decay and the miss update in one pass over each part of the row
+        if hit:
+            values[:hit] *= decay * MISS_FACTOR
+        if hit < self.range_bins:
+            if decay != 1.0:
+                values[hit:] *= decay
+            if distance < self.max_range:
+                level = float(values[hit])
+                values[hit] = level + HIT_WEIGHT * (1.0 - level)
+        self._dirty.add(row)
+        self.samples += 1
+
+    # Evidence (0..1) of the bin at (angle, distance)
+    def level(self, angle, distance, now):
+        row = self.angle_index(angle)
+        column = min(int(distance // self.range_bin), self.range_bins - 1)
+        return float(self.values[row, column]) * 0.5 ** (max(0.0, now - self.row_times[row]) / self.half_life)
+
+    # True when a bin of the angle's row closer than max_distance is occupied
+    def detected(self, angle, max_distance, now):
+        row = self.angle_index(angle)
+        columns = max(1, int(np.ceil(max_distance / self.range_bin)))
+        decay = 0.5 ** (max(0.0, now - self.row_times[row]) / self.half_life)
+        return bool(self.values[row, :columns].max() * decay >= OCCUPIED_LEVEL)
+
+    def _encode_rows(self, rows, now):
+        encoded = []
+        for row in rows:
+            self._decay_row(row, now)
+            levels = (self.values[row] * 255).astype(np.uint8)
+            bins = np.flatnonzero(levels >= MIN_SENT_LEVEL)
+            encoded.append([int(row), [[int(b), int(levels[b])] for b in bins]])
+        self.rows_sent += len(encoded)
+        return encoded
+
+    # Every non-empty row at `now`, same format as take_delta (dirty rows stay dirty)
+    def snapshot(self, now):
+        elapsed = np.maximum(now - np.asarray(self.row_times), 0.0)
+        levels = (self.values * (0.5 ** (elapsed / self.half_life))[:, None] * 255).astype(np.uint8)
+        rows = []
+        for row in np.flatnonzero(levels.max(axis=1) >= MIN_SENT_LEVEL):
+            bins = np.flatnonzero(levels[row] >= MIN_SENT_LEVEL)
+            rows.append([int(row), [[int(b), int(levels[row, b])] for b in bins]])
+        return rows
+
+    # Rows changed since the last call: [[angle_index, [[range_index, level 0..255], ...]], ...]
+    def take_delta(self, now):
+        if not self._dirty:
+            return []
+        rows = sorted(self._dirty)
+        self._dirty.clear()
+        return self._encode_rows(rows, now)
+
+    def stats(self):
+        return {"samples": self.samples, "rows_sent": self.rows_sent, "dirty_rows": len(self._dirty)}
+
+
+class SweepBuffer:
+    """Latest distance at every whole degree of the sweep (int16, -1 = unknown)."""
+
+    def __init__(self, min_angle=GRID_MIN_ANGLE, max_angle=GRID_MAX_ANGLE, max_age=SWEEP_MAX_AGE):
+        self.min_angle = min_angle
+        self.max_age = max_age
+        self.distances = np.full(max_angle - min_angle + 1, -1, dtype=np.int16)
+        self.times = np.zeros(max_angle - min_angle + 1, dtype=np.float64)
+
+    def update(self, angle, distance, now):
+        index = min(max(int(angle) - self.min_angle, 0), len(self.distances) - 1)
+        self.distances[index] = min(int(distance), 32767)
+        self.times[index] = now
+
+    def snapshot(self, now):
+        distances = np.where(now - self.times <= self.max_age, self.distances, -1)
+        return {"min_angle": self.min_angle, "distances": distances.tolist()}
@@ -0,0 +1,149 @@
+"""
+Opt-in timing spans for the radar and camera paths.
+
+``span(name, **args)`` times a block and stores it in a fixed-size ring
+(oldest spans are overwritten). While profiling is off it returns a shared
+no-op context manager, so instrumented code costs a function call and a flag
+check. Turn it on with ``RADAR_PROFILE=1`` or at runtime with the WebSocket
+command ``{"command": "profile", "action": "start"}``.
+
+The ring is exported in the Chrome trace event format (``chrome_trace`` /
+``dump``): open the file in chrome://tracing or https://ui.perfetto.dev.
+Span times are wall-clock, so spans reported by the browser
+(``record_wall``) and latencies measured from a capture or serial timestamp
+line up with the server's own spans.
+
+    with span("jpeg_encode", seq=packet.sequence):
+        _, jpeg = cv2.imencode(".jpg", frame)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+PROFILE_ENABLED = os.environ.get("RADAR_PROFILE", "0") not in ("", "0", "false", "no")
+PROFILE_CAPACITY = int(os.environ.get("RADAR_PROFILE_SPANS", "50000"))  # Spans kept in the ring
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter(), **self.args)
+        return False
+
+
+class Profiler:
+    """Ring of (name, start, end, thread, args) spans; times in perf_counter seconds."""
+
+    def __init__(self, capacity=PROFILE_CAPACITY, enabled=PROFILE_ENABLED):
+        self.enabled = enabled
+        self._spans = deque(maxlen=capacity)
+        self._thread_names = {}
+        self.recorded = 0
+        # perf_counter -> wall clock, so server and browser spans share a timeline
+        self._wall_offset = time.time() - time.perf_counter()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, args)
+
+    # Span measured by the caller with time.perf_counter()
+    def record(self, name, start, end, **args):
+        if not self.enabled:
+            return
+        thread = threading.get_ident()
+        if thread not in self._thread_names:
+            self._thread_names[thread] = threading.current_thread().name
+        # deque.append is atomic, no lock needed between the pipeline threads
+        self._spans.append((name, start, end, thread, args))
+        self.recorded += 1
+
+    # Span with wall-clock (time.time()) ends, e.g. from a capture timestamp or the browser
+    def record_wall(self, name, start, end, track=None, **args):
+        if not self.enabled:
+            return
+        offset = self._wall_offset
+        thread = track if track is not None else threading.get_ident()
+        if thread not in self._thread_names:
+            self._thread_names[thread] = track if track is not None else threading.current_thread().name
+        self._spans.append((name, start - offset, end - offset, thread, args))
+        self.recorded += 1
+
+    def start(self):
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def clear(self):
+        self._spans.clear()
+        self.recorded = 0
+
+    def chrome_trace(self):
+        spans = list(self._spans)
+        offset = self._wall_offset
+        pid = os.getpid()
+        thread_ids = {}
+        events = []
+        for thread, name in list(self._thread_names.items()):
+            tid = thread_ids.setdefault(thread, len(thread_ids) + 1)
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        for name, start, end, thread, args in spans:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start + offset) * 1e6,
+                "dur": max(0.0, end - start) * 1e6,
+                "pid": pid,
+                "tid": thread_ids.setdefault(thread, len(thread_ids) + 1),
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        trace = self.chrome_trace()
+        with open(path, "w") as f:
+            json.dump(trace, f, default=str)
+        return len(trace["traceEvents"])
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "spans": len(self._spans),
+            "capacity": self._spans.maxlen,
+            "recorded": self.recorded,
+        }
+
+
+# Process-wide profiler used by all modules
+PROFILER = Profiler()
+
+
+def span(name, **args):
+    return PROFILER.span(name, **args)
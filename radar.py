@@ -2,12 +2,13 @@ import pygame
 import math
 import serial
 import sys
-import re
 import subprocess
 import os
 import signal
 import time
 import traceback
+from arduino_parser import parse_line, RadarSample, ObjectDetected, RadarTimeout, SystemInitialized, FaceTracking
+from serial_transport import open_serial
 
 # Define global colors here to avoid scope issues
 BLACK = (0, 0, 0)
@@ -22,7 +23,8 @@ WHITE = (255, 255, 255)
 FACE_DETECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "face_detection.py")
 
 # Cổng COM cho Arduino - đảm bảo phù hợp với cả radar.py và face_detection.py
-ARDUINO_COM_PORT = 'COM5'  
+ARDUINO_COM_PORT = os.environ.get("RADAR_SERIAL_PORT", 'COM5')  # Hoặc "emulator://..." để chạy không cần phần cứng
+SERIAL_BAUD_RATE = 115200  # Phải khớp với SERIAL_BAUD trong RadarAndFace.ino (radar.py dùng giao thức văn bản)
 
 # Khởi tạo biến toàn cục
 serial_port = None
@@ -50,8 +52,7 @@ def setup_serial():
     global serial_port, system_message
     
     try:
-        serial_port = serial.Serial(ARDUINO_COM_PORT, 9600)
-        serial_port.timeout = 0.1
+        serial_port = open_serial(ARDUINO_COM_PORT, SERIAL_BAUD_RATE, timeout=0.1)
         system_message = f"Connected to Arduino on {ARDUINO_COM_PORT}"
         print(system_message)
         return True
@@ -87,7 +88,7 @@ def setup_pygame():
         return False
 
 def start_face_detection():
-    global face_detection_process, system_message
+    global face_detection_process, system_message, FACE_DETECTION_PATH
     
     if face_detection_process is not None:
         system_message = "Face detection already running"
@@ -98,7 +99,6 @@ def start_face_detection():
         if not os.path.exists(FACE_DETECTION_PATH):
             alternative_path = "face_detection.py"  # Thử đường dẫn tương đối
             if os.path.exists(alternative_path):
-                global FACE_DETECTION_PATH
                 FACE_DETECTION_PATH = alternative_path
             else:
                 system_message = f"Error: face_detection.py not found! Checked: {FACE_DETECTION_PATH} and {alternative_path}"
@@ -147,35 +147,27 @@ def read_serial():
     try:
         if serial_port.in_waiting > 0:
             try:
-                # Read raw data as bytes first
-                raw_data = serial_port.readline()
-                
-                # Try different encodings or handle as bytes
-                try:
-                    # First try UTF-8
-                    data = raw_data.decode('utf-8').strip()
-                except UnicodeDecodeError:
-                    # If that fails, try latin-1 (which accepts any byte value)
-                    data = raw_data.decode('latin-1').strip()
+                # Read raw data as bytes and classify it in one pass
+                record = parse_line(serial_port.readline())
                 
                 # Check for mode change or system messages
-                if "Object detected at angle" in data:
-                    # Extract angle and distance from the message
-                    match_angle = re.search(r"angle (\d+)", data)
-                    match_distance = re.search(r"distance (\d+)", data)
+                if isinstance(record, RadarSample):
+                    # This is normal radar data
+                    angle = record.angle
+                    distance = record.distance
                     
-                    if match_angle and match_distance:
-                        detected_angle = int(match_angle.group(1))
-                        detected_distance = int(match_distance.group(1))
-                        mode = "FACE_TRACKING"
-                        last_detection_time = pygame.time.get_ticks()
-                        system_message = f"Object detected! Switching to face tracking mode"
-                        print(system_message)
-                        
-                        # Tự động khởi chạy face detection khi phát hiện vật thể
-                        start_face_detection()
+                elif isinstance(record, ObjectDetected):
+                    detected_angle = record.angle
+                    detected_distance = record.distance
+                    mode = "FACE_TRACKING"
+                    last_detection_time = pygame.time.get_ticks()
+                    system_message = f"Object detected! Switching to face tracking mode"
+                    print(system_message)
+                    
+                    # Tự động khởi chạy face detection khi phát hiện vật thể
+                    start_face_detection()
                         
-                elif "Timeout: Returning to radar mode" in data:
+                elif isinstance(record, RadarTimeout):
                     mode = "RADAR"
                     system_message = "Timeout: Returning to radar scanning mode"
                     print(system_message)
@@ -183,33 +175,16 @@ def read_serial():
                     # Dừng face detection khi quay lại chế độ radar
                     stop_face_detection()
                     
-                elif "System initialized" in data:
+                elif isinstance(record, SystemInitialized):
                     mode = "RADAR"
                     system_message = "System initialized, radar scanning active"
                     print(system_message)
                     
-                elif "Face tracking - X:" in data:
-                    # Extract X and Y values from face tracking feedback
-                    match = re.search(r"X: (\d+), Y: (\d+)", data)
-                    if match:
-                        face_x = int(match.group(1))
-                        face_y = int(match.group(2))
-                        last_detection_time = pygame.time.get_ticks()
-                    
-                elif '.' in data:
-                    # This is normal radar data
-                    data = data.split('.')[0]
-                    
-                    if ',' in data:
-                        index1 = data.find(',')
-                        angle_str = data[:index1]
-                        distance_str = data[index1+1:]
-                        
-                        try:
-                            angle = int(angle_str)
-                            distance = int(distance_str)
-                        except ValueError:
-                            pass  # Ignore invalid data
+                elif isinstance(record, FaceTracking):
+                    # Face tracking feedback from Arduino
+                    face_x = record.x
+                    face_y = record.y
+                    last_detection_time = pygame.time.get_ticks()
             except Exception as e:
                 # If all else fails, ignore this data packet
                 print(f"Error reading serial data: {e}")
@@ -0,0 +1,172 @@
+"""
+Logging setup for the radar server.
+
+Modules log through ``logging.getLogger(__name__)``; ``setup_logging`` wires
+the root logger to a queue so the serial, camera and servo threads and the
+event loop never wait for stdout:
+
+- ``DroppingQueueHandler`` puts records on a bounded queue without blocking
+  and counts the records it had to drop when the queue is full
+- a ``QueueListener`` thread formats and writes them
+- ``RateLimitFilter`` lets each call site (logger + line) log at most
+  ``rate`` records per second after an initial ``burst``; the next record
+  that gets through says how many similar ones were suppressed
+
+High-frequency events (every serial line, every servo command, radar
+movement) are logged at DEBUG, so with the default INFO level they cost a
+level check only. ``RADAR_LOG_LEVEL=DEBUG`` shows them, rate-limited.
+``RADAR_LOG_FORMAT=json`` writes one JSON object per line, including any
+``extra=`` fields.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.environ.get("RADAR_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("RADAR_LOG_FORMAT", "text")             # "text" or "json"
+LOG_RATE_LIMIT = float(os.environ.get("RADAR_LOG_RATE_LIMIT", "5"))  # Records/s per call site, 0 = unlimited
+LOG_RATE_BURST = 20        # Records a call site may log at once before the rate limit applies
+LOG_QUEUE_SIZE = 10000     # Records waiting for the writer thread; more are dropped
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "suppressed"}
+
+_listener = None
+_handler = None
+_setup_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site (logger name + line number)."""
+
+    def __init__(self, rate=LOG_RATE_LIMIT, burst=LOG_RATE_BURST):
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # (name, lineno) -> [tokens, last time, suppressed since last pass]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1.0
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = logging.Formatter.format(self, record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" [{suppressed} similar suppressed]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Route the root logger through the queue; safe to call more than once
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, rate=LOG_RATE_LIMIT, stream=None):
+    global _listener, _handler
+
+    with _setup_lock:
+        if _listener is not None:
+            return _handler
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        _handler = DroppingQueueHandler(log_queue)
+        _handler.addFilter(RateLimitFilter(rate))
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _handler
+
+
+# Write out what is still queued and stop the writer thread
+def stop_logging():
+    global _listener, _handler
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+
+def logging_stats():
+    if _handler is None:
+        return {"queued": 0, "dropped": 0, "suppressed": 0}
+    rate_filter = _handler.filters[0]
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": rate_filter.suppressed,
+    }
@@ -0,0 +1,254 @@
+"""
+Multi-target extraction and tracking over radar sweeps.
+
+``SweepClusterer`` groups consecutive samples closer than ``TARGET_RANGE``
+into clusters while the sweep moves across an object: neighbouring angles,
+similar distances. A cluster closes on the first sample that does not fit
+(or when the sweep reverses) and becomes a ``Detection`` at its centroid.
+It keeps running sums only, so each sample costs O(1).
+
+``TargetTracker`` associates every detection with the nearest track whose
+predicted position (alpha-beta filter in cm, ``tracking_filters``) is within
+``TARGET_GATE``. A track takes at most one detection per sweep pass; a
+detection no track takes starts a new, tentative track. Tracks are confirmed
+after ``TRACK_CONFIRM_HITS`` detections and dropped after the sweep passed
+over them ``TRACK_MAX_MISSES`` times without one. Detections arrive in sweep
+order and are matched greedily as they come, which is what the sweep allows:
+the objects of one pass are never all known at once.
+
+Per sample the cost is the clustering step; per detection it is O(tracks),
+with at most ``MAX_TRACKS`` tracks.
+"""
+
+import math
+import os
+from typing import NamedTuple
+
+from tracking_filters import AlphaBetaFilter
+
+TARGET_RANGE = float(os.environ.get("RADAR_TARGET_RANGE", "100"))  # cm; farther samples are background
+TARGET_GATE = float(os.environ.get("RADAR_TARGET_GATE", "40"))     # cm between a track's prediction and a detection
+CLUSTER_MAX_ANGLE_GAP = 3      # Degrees between consecutive samples of one cluster
+CLUSTER_MAX_DISTANCE_STEP = 15  # cm between consecutive samples of one cluster
+CLUSTER_MIN_SAMPLES = 2        # Shorter clusters are noise
+TRACK_CONFIRM_HITS = 2         # Detections before a track is reported as confirmed
+TRACK_MAX_MISSES = 2           # Sweep passes over a track without a detection before it is dropped
+TRACK_ALPHA = 0.6              # Alpha-beta gains for the track filter (updates come once per pass)
+TRACK_BETA = 0.2
+TRACK_MAX_GAP = 30.0           # Seconds without a detection after which the filter restarts
+MAX_TRACKS = 32
+
+
+class Detection(NamedTuple):
+    time: float
+    angle: float
+    distance: float
+    x: float
+    y: float
+    width: float   # Angular extent (degrees)
+    samples: int
+
+
+def polar_to_xy(angle, distance):
+    rad = math.radians(angle)
+    return distance * math.cos(rad), distance * math.sin(rad)
+
+
+class SweepClusterer:
+    def __init__(self, max_range=TARGET_RANGE, max_angle_gap=CLUSTER_MAX_ANGLE_GAP,
+                 max_distance_step=CLUSTER_MAX_DISTANCE_STEP, min_samples=CLUSTER_MIN_SAMPLES):
+        self.max_range = max_range
+        self.max_angle_gap = max_angle_gap
+        self.max_distance_step = max_distance_step
+        self.min_samples = min_samples
+        self.last_angle = None
+        self.direction = 0
+        self.passes = 0  # Sweep reversals seen
+        self.pass_min = self.pass_max = None  # Angles covered by the current pass
+        self._count = 0
+        self._reset_cluster()
+
+    def _reset_cluster(self):
+        self._count = 0
+        self._sum_angle = self._sum_distance = self._sum_time = 0.0
+        self._min_angle = self._max_angle = None
+        self._last_distance = None
+
+    def _close(self):
+        if self._count < self.min_samples:
+            self._reset_cluster()
+            return None
+        angle = self._sum_angle / self._count
+        distance = self._sum_distance / self._count
+        x, y = polar_to_xy(angle, distance)
+        detection = Detection(self._sum_time / self._count, angle, distance, x, y,
+                              self._max_angle - self._min_angle, self._count)
+        self._reset_cluster()
+        return detection
+
+    # Feed one sample; returns the Detection it closed, if any
+    def add(self, angle, distance, timestamp):
+        detection = None
+        step = 0 if self.last_angle is None else angle - self.last_angle
+        direction = (step > 0) - (step < 0)
+        if direction and self.direction and direction != self.direction:
+            # Sweep reversed: an object at the end is seen again on the way back
+            detection = self._close()
+            self.passes += 1
+            self.pass_min = self.pass_max = self.last_angle
+        if direction:
+            self.direction = direction
+
+        if self._count and (distance <= 0 or distance >= self.max_range
+                            or abs(angle - self.last_angle) > self.max_angle_gap
+                            or abs(distance - self._last_distance) > self.max_distance_step):
+            detection = self._close()
+
+        if 0 < distance < self.max_range:
+            self._count += 1
+            self._sum_angle += angle
+            self._sum_distance += distance
+            self._sum_time += timestamp
+            self._min_angle = angle if self._min_angle is None else min(self._min_angle, angle)
+            self._max_angle = angle if self._max_angle is None else max(self._max_angle, angle)
+            self._last_distance = distance
+
+        self.pass_min = angle if self.pass_min is None else min(self.pass_min, angle)
+        self.pass_max = angle if self.pass_max is None else max(self.pass_max, angle)
+        self.last_angle = angle
+        return detection
+
+
+class Track:
+    def __init__(self, track_id, detection, sweep_pass):
+        self.id = track_id
+        self.filter = AlphaBetaFilter(TRACK_ALPHA, TRACK_BETA, TRACK_MAX_GAP)
+        self.filter.update(detection.time, (detection.x, detection.y))
+        self.hits = 1
+        self.misses = 0
+        self.last_pass = sweep_pass
+        self.last_detection = detection
+
+    def update(self, detection, sweep_pass):
+        self.filter.update(detection.time, (detection.x, detection.y))
+        self.hits += 1
+        self.misses = 0
+        self.last_pass = sweep_pass
+        self.last_detection = detection
+
+    @property
+    def confirmed(self):
+        return self.hits >= TRACK_CONFIRM_HITS
+
+    @property
+    def angle(self):
+        x, y = self.filter.position
+        return math.degrees(math.atan2(y, x))
+
+    def to_dict(self, now):
+        x, y = self.filter.position
+        vx, vy = self.filter.velocity
+        return {
+            "id": self.id,
+            "angle": round(self.angle, 1),
+            "distance": round(math.hypot(x, y), 1),
+            "x": round(x, 1),
+            "y": round(y, 1),
+            "vx": round(vx, 1),
+            "vy": round(vy, 1),
+            "speed": round(math.hypot(vx, vy), 1),
+            "width": round(self.last_detection.width, 1),
+            "hits": self.hits,
+            "confirmed": self.confirmed,
+            "age": round(max(0.0, now - self.filter.time), 2),
+        }
+
+
+class TargetTracker:
+    def __init__(self, gate=TARGET_GATE, max_tracks=MAX_TRACKS, max_misses=TRACK_MAX_MISSES, clusterer=None):
+        self.gate = gate
+        self.max_tracks = max_tracks
+        self.max_misses = max_misses
+        self.clusterer = clusterer if clusterer is not None else SweepClusterer()
+        self.tracks = []
+        self.next_id = 1
+        self.version = 0  # Bumped whenever the track list changes
+        self.detections = 0
+        self.tracks_created = 0
+        self.tracks_dropped = 0
+
+    def add_sample(self, angle, distance, timestamp):
+        clusterer = self.clusterer
+        passes = clusterer.passes
+        pass_range = (clusterer.pass_min, clusterer.pass_max)
+        detection = clusterer.add(angle, distance, timestamp)
+        if detection is not None:
+            # A cluster closed by the reversal belongs to the pass that just ended
+            self._associate(detection, passes)
+        if clusterer.passes != passes:
+            self._end_pass(passes, *pass_range)
+        return detection
+
+    def _associate(self, detection, sweep_pass):
+        self.detections += 1
+        best = None
+        best_distance = self.gate
+        for track in self.tracks:
+            if track.last_pass == sweep_pass:
+                continue  # One detection per track and pass
+            px, py = track.filter.extrapolate(detection.time)
+            distance = math.hypot(detection.x - px, detection.y - py)
+            if distance <= best_distance:
+                best, best_distance = track, distance
+        if best is not None:
+            best.update(detection, sweep_pass)
+        elif len(self.tracks) < self.max_tracks:
+            self.tracks.append(Track(self.next_id, detection, sweep_pass))
+            self.next_id += 1
+            self.tracks_created += 1
+        else:
+            return
+        self.version += 1
+
+    # Tracks inside the angles the finished pass covered, not seen during it, get a miss
+    def _end_pass(self, sweep_pass, pass_min, pass_max):
+        if pass_min is None:
+            return
+        kept = []
+        for track in self.tracks:
+            if track.last_pass != sweep_pass and pass_min <= track.angle <= pass_max:
+                track.misses += 1
+                # Tentative tracks go at the first miss
+                if track.misses >= self.max_misses or not track.confirmed:
+                    self.tracks_dropped += 1
+                    continue
+            kept.append(track)
+        if len(kept) != len(self.tracks):
+            self.version += 1
+        self.tracks = kept
+
+    def targets(self, now):
+        return [track.to_dict(now) for track in self.tracks]
+
+    # Confirmed track closest to (angle, distance), e.g. for the sketch's "Object detected"
+    def nearest(self, angle, distance, max_distance=None):
+        x, y = polar_to_xy(angle, distance)
+        best = None
+        best_distance = self.gate if max_distance is None else max_distance
+        for track in self.tracks:
+            if not track.confirmed:
+                continue
+            tx, ty = track.filter.position
+            d = math.hypot(x - tx, y - ty)
+            if d <= best_distance:
+                best, best_distance = track, d
+        return best
+
+    def stats(self):
+        return {
+            "tracks": len(self.tracks),
+            "confirmed": sum(1 for track in self.tracks if track.confirmed),
+            "detections": self.detections,
+            "created": self.tracks_created,
+            "dropped": self.tracks_dropped,
+        }
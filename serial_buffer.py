@@ -0,0 +1,99 @@
+"""
+Base for the software serial ports (``arduino_emulator``, ``serial_replay``).
+
+``BufferedSerial`` has the pyserial calls the app and radar.py use
+(``read``, ``readline``, ``write``, ``in_waiting``, ``timeout``, ``is_open``,
+``close``) on top of an output buffer that a producer thread fills with
+``_push``. Subclasses start that thread as ``self._thread`` and handle what
+the host writes in ``_received``.
+"""
+
+import threading
+import time
+
+OUTPUT_BUFFER_SIZE = 65536  # Bytes the producer may get ahead of the reader
+
+
+class BufferedSerial:
+    def __init__(self, timeout=None, name=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        self.timeout = timeout
+        self.name = self.port = name
+        self.buffer_size = buffer_size
+        self._output = bytearray()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = None
+        self.is_open = True
+
+    # Producer side: append output, waiting while the buffer is full (nobody reading).
+    # Returns False once the port is closed.
+    def _push(self, data):
+        with self._cond:
+            while self.is_open and len(self._output) >= self.buffer_size:
+                self._cond.wait(0.1)
+            if not self.is_open:
+                return False
+            self._output.extend(data)
+            self._cond.notify_all()
+        return True
+
+    # Bytes written by the host
+    def _received(self, data):
+        raise NotImplementedError
+
+    # --- serial.Serial interface ---
+
+    @property
+    def in_waiting(self):
+        return len(self._output)
+
+    def _wait_for(self, ready):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not ready() and self.is_open:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+    # Like pyserial: wait for `size` bytes or the timeout, return what is there
+    def read(self, size=1):
+        with self._cond:
+            if not self.is_open and not self._output:
+                raise IOError("Attempting to use a port that is not open")
+            self._wait_for(lambda: len(self._output) >= size)
+            data = bytes(self._output[:size])
+            del self._output[:size]
+            self._cond.notify_all()
+        return data
+
+    def readline(self):
+        with self._cond:
+            if not self.is_open and not self._output:
+                raise IOError("Attempting to use a port that is not open")
+            self._wait_for(lambda: b"\n" in self._output)
+            end = self._output.find(b"\n") + 1 or len(self._output)
+            data = bytes(self._output[:end])
+            del self._output[:end]
+            self._cond.notify_all()
+        return data
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError("Attempting to use a port that is not open")
+        self._received(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._output.clear()
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and threading.current_thread() is not thread:
+            thread.join(1.0)
@@ -0,0 +1,123 @@
+"""
+Serial ingest for the Arduino radar link.
+
+A background thread owns all reads from the serial port, decodes the byte
+stream (text lines and binary frames) into records and pushes them into a
+bounded ring buffer. The event loop drains that buffer in batches, so no blocking serial
+call ever runs on it.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from arduino_parser import StreamDecoder
+from profiling import PROFILER
+
+logger = logging.getLogger(__name__)
+
+# Default sizes
+RING_BUFFER_CAPACITY = 2048  # Records kept before the oldest are overwritten
+
+
+class LineRingBuffer:
+    """Bounded single-producer / single-consumer buffer of decoded serial records.
+
+    ``deque.append`` and ``deque.popleft`` are atomic under the GIL, so the
+    reader thread and the event loop share it without taking a lock. When the
+    consumer falls behind, the oldest records are overwritten and counted in
+    ``dropped``.
+    """
+
+    def __init__(self, capacity=RING_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self._items = deque(maxlen=capacity)
+        self.pushed = 0
+        self.dropped = 0
+
+    def push(self, item):
+        if len(self._items) >= self.capacity:
+            self.dropped += 1
+        self._items.append(item)
+        self.pushed += 1
+
+    def drain(self, max_items=None):
+        batch = []
+        items = self._items
+        while items and (max_items is None or len(batch) < max_items):
+            try:
+                batch.append(items.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SerialReaderThread(threading.Thread):
+    """Reads the serial port in the background and decodes it into records.
+
+    Every record produced by ``decoder`` (a ``StreamDecoder`` by default) is
+    pushed into ``buffer`` as ``(received_time, record)``. ``on_data`` is
+    called (from this thread) after every chunk that produced at least one
+    record; the app uses it to wake the event loop.
+    """
+
+    def __init__(self, port, buffer=None, on_data=None, decoder=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.port = port
+        self.buffer = buffer if buffer is not None else LineRingBuffer()
+        self.on_data = on_data
+        self.decoder = decoder if decoder is not None else StreamDecoder()
+        self.running = False
+        self.bytes_read = 0
+        self.records_read = 0
+        self.error = None
+
+    def run(self):
+        self.running = True
+        decode = self.decoder.feed
+        push = self.buffer.push
+
+        while self.running:
+            started = time.perf_counter()
+            try:
+                # Block for at most the port timeout when nothing is waiting
+                chunk = self.port.read(self.port.in_waiting or 1)
+            except Exception as e:
+                if self.running:
+                    self.error = e
+                    logger.exception("Serial reader error: %s", e)
+                break
+
+            if not chunk:
+                continue
+
+            received_time = time.time()
+            self.bytes_read += len(chunk)
+
+            if PROFILER.enabled:
+                # Only reads that returned data; empty reads are just the port timeout
+                parse_start = time.perf_counter()
+                PROFILER.record("serial_read", started, parse_start, bytes=len(chunk))
+                records = decode(chunk)
+                PROFILER.record("serial_parse", parse_start, time.perf_counter(), records=len(records))
+            else:
+                records = decode(chunk)
+            if records:
+                for record in records:
+                    push((received_time, record))
+                self.records_read += len(records)
+                if self.on_data is not None:
+                    self.on_data()
+
+        self.running = False
+        logger.info("Serial reader thread exiting")
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
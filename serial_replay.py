@@ -0,0 +1,259 @@
+"""
+Record and replay the raw serial byte stream of an Arduino session.
+
+Recording: with ``RADAR_SERIAL_RECORD=session.rser`` the port returned by
+``serial_transport.open_serial`` is wrapped in ``RecordingSerial``, which
+appends every chunk read from and written to the port to a capture file.
+Without the app:
+
+    python serial_replay.py record COM8 -o session.rser --seconds 600
+
+Capture file: ``CAPTURE_MAGIC``, then records of ``RECORD_HEADER``
+(time.time() of the read/write, direction RX/TX, length) followed by the
+bytes. Chunks are stored as the driver returned them, so a replay splits the
+stream the same way. The file is flushed every ``CAPTURE_FLUSH_INTERVAL``
+seconds, so a crash loses at most that much of the session.
+
+Replay: ``RADAR_SERIAL_PORT="replay://session.rser?speed=4&loop=1"`` opens a
+``ReplaySerial``, a pyserial look-alike that hands out the received chunks
+at their recorded time offsets divided by ``speed`` (``speed=0``: as fast as
+they are read). Writes from the app (servo commands, PROTO:BIN) are counted
+and dropped: the replayed Arduino does what the recorded one did.
+
+    python serial_replay.py info session.rser
+    python serial_replay.py bench session.rser   # decode throughput of the capture
+"""
+
+import argparse
+import os
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from serial_buffer import BufferedSerial
+
+REPLAY_SCHEME = "replay://"
+SERIAL_RECORD = os.environ.get("RADAR_SERIAL_RECORD", "")  # Capture file for the serial byte stream, empty = off
+
+CAPTURE_MAGIC = b"RSERIAL1"
+RECORD_HEADER = struct.Struct("<dBI")  # time, direction, length
+RX = 0  # Arduino -> host
+TX = 1  # Host -> Arduino
+CAPTURE_FLUSH_INTERVAL = 1.0  # Seconds between flushes of the capture file
+
+
+def read_capture(path):
+    """Yields (time, direction, data) records of a capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a serial capture")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            timestamp, direction, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return  # Truncated by a crash
+            yield timestamp, direction, data
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._file.write(CAPTURE_MAGIC)
+        self._lock = threading.Lock()
+        self._flushed = time.time()
+        self.records = 0
+        self.bytes = 0
+
+    # Empty reads record nothing but still flush on time, so the tail is written when the port goes quiet
+    def write(self, direction, data, timestamp=None):
+        now = time.time()
+        with self._lock:
+            if self._file.closed:
+                return
+            if data:
+                self._file.write(RECORD_HEADER.pack(now if timestamp is None else timestamp, direction, len(data)))
+                self._file.write(data)
+                self.records += 1
+                self.bytes += len(data)
+            if now - self._flushed >= CAPTURE_FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed = now
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingSerial:
+    """Wraps an open port and records everything read from and written to it."""
+
+    def __init__(self, port, path):
+        self._port = port
+        self.capture = CaptureWriter(path)
+        self.path = path
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def read(self, size=1):
+        data = self._port.read(size)
+        self.capture.write(RX, data)
+        return data
+
+    def readline(self):
+        data = self._port.readline()
+        self.capture.write(RX, data)
+        return data
+
+    def write(self, data):
+        self.capture.write(TX, bytes(data))
+        return self._port.write(data)
+
+    def close(self):
+        self._port.close()
+        self.capture.close()
+
+
+class ReplaySerial(BufferedSerial):
+    """Serial-port-like object that plays back the RX side of a capture file."""
+
+    def __init__(self, path, speed=1.0, loop=False, timeout=None, name=None):
+        if speed < 0:
+            raise ValueError("speed must be >= 0")
+        # Fail early on a missing or foreign file
+        next(read_capture(path), None)
+        BufferedSerial.__init__(self, timeout, name or REPLAY_SCHEME + path)
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+
+        self.bytes_replayed = 0
+        self.chunks_replayed = 0
+        self.bytes_written = 0
+        self.passes = 0
+        self.finished = False
+        self.max_lag = 0.0  # Worst delay behind the recorded schedule (s)
+
+        self._thread = threading.Thread(target=self._run, name="serial-replay", daemon=True)
+        self._thread.start()
+
+    # "replay://session.rser?speed=4&loop=1"
+    @classmethod
+    def from_url(cls, url, timeout=None):
+        parts = urlsplit(url)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        return cls(parts.netloc + parts.path, speed=float(params.get("speed", 1.0)),
+                   loop=params.get("loop", "0") not in ("0", "false", "no"), timeout=timeout, name=url)
+
+    def _run(self):
+        while self.is_open:
+            start = time.perf_counter()
+            first = None
+            for timestamp, direction, data in read_capture(self.path):
+                if direction != RX:
+                    continue
+                if first is None:
+                    first = timestamp
+                if self.speed > 0:
+                    due = start + (timestamp - first) / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif -delay > self.max_lag:
+                        self.max_lag = -delay
+                # Nobody reading: waits instead of growing without bound
+                if not self._push(data):
+                    return
+                self.bytes_replayed += len(data)
+                self.chunks_replayed += 1
+            self.passes += 1
+            if not self.loop:
+                break
+        self.finished = True
+
+    # Writes from the app are counted and dropped
+    def _received(self, data):
+        self.bytes_written += len(data)
+
+    def stats(self):
+        return {
+            "bytes_replayed": self.bytes_replayed,
+            "chunks_replayed": self.chunks_replayed,
+            "bytes_written": self.bytes_written,
+            "passes": self.passes,
+            "finished": self.finished,
+            "max_lag": self.max_lag,
+        }
+
+
+def capture_info(path):
+    counts = {RX: [0, 0], TX: [0, 0]}
+    first = last = None
+    for timestamp, direction, data in read_capture(path):
+        if first is None:
+            first = timestamp
+        last = timestamp
+        counts.setdefault(direction, [0, 0])
+        counts[direction][0] += 1
+        counts[direction][1] += len(data)
+    return {
+        "seconds": (last - first) if first is not None else 0.0,
+        "rx_chunks": counts[RX][0], "rx_bytes": counts[RX][1],
+        "tx_chunks": counts[TX][0], "tx_bytes": counts[TX][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="record a port (or emulator:// URL) without the app")
+    record.add_argument("port")
+    record.add_argument("-o", "--output", required=True)
+    record.add_argument("--baud", type=int, default=115200)
+    record.add_argument("--seconds", type=float, default=60.0)
+    record.add_argument("--binary", action="store_true", help="ask the sketch for binary frames (PROTO:BIN)")
+    info = commands.add_parser("info", help="summary of a capture")
+    info.add_argument("capture")
+    bench = commands.add_parser("bench", help="decode the capture as fast as possible through StreamDecoder")
+    bench.add_argument("capture")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from serial_transport import open_serial
+        # record=None: RADAR_SERIAL_RECORD must not wrap the port in a second recorder
+        port = RecordingSerial(open_serial(args.port, args.baud, timeout=0.1, record=None), args.output)
+        if args.binary:
+            port.write(b"PROTO:BIN\r")
+        deadline = time.time() + args.seconds
+        try:
+            while time.time() < deadline:
+                port.read(port.in_waiting or 1)
+        except KeyboardInterrupt:
+            pass
+        port.close()
+        print(f"{port.capture.records} chunks, {port.capture.bytes} bytes -> {args.output}")
+    elif args.command == "info":
+        print(capture_info(args.capture))
+    else:
+        from arduino_parser import StreamDecoder
+        chunks = [data for _, direction, data in read_capture(args.capture) if direction == RX]
+        decoder = StreamDecoder()
+        start = time.perf_counter()
+        records = sum(len(decoder.feed(chunk)) for chunk in chunks)
+        elapsed = time.perf_counter() - start
+        size = sum(len(chunk) for chunk in chunks)
+        print(f"{records} records from {size} bytes in {elapsed * 1000:.1f} ms: "
+              f"{records / elapsed:.0f} records/s, {size / elapsed / 2 ** 20:.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
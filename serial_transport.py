@@ -0,0 +1,35 @@
+"""
+Opens the Arduino link from a port name or URL.
+
+- ``COM8``, ``/dev/ttyUSB0``, ...: a real serial port (pyserial)
+- ``emulator://?step_ms=5&objects=90:30``: the software Arduino from
+  ``arduino_emulator.py`` (see its docstring for the parameters)
+- ``replay://session.rser?speed=4&loop=1``: a recorded session played back
+  (``serial_replay.py``)
+
+With ``RADAR_SERIAL_RECORD=session.rser`` (or ``record=``) the opened port
+also records its byte stream into that capture file.
+
+Everything returned has the pyserial calls the app and radar.py use:
+``read``, ``readline``, ``write``, ``in_waiting``, ``timeout``, ``is_open``
+and ``close``.
+"""
+
+import serial
+
+from serial_replay import REPLAY_SCHEME, SERIAL_RECORD, RecordingSerial, ReplaySerial
+
+EMULATOR_SCHEME = "emulator://"
+
+
+def open_serial(port, baudrate, timeout=0.1, record=SERIAL_RECORD):
+    if port.startswith(EMULATOR_SCHEME):
+        from arduino_emulator import EmulatedArduino
+        link = EmulatedArduino.from_url(port, timeout=timeout)
+    elif port.startswith(REPLAY_SCHEME):
+        link = ReplaySerial.from_url(port, timeout=timeout)
+    else:
+        link = serial.Serial(port, baudrate, timeout=timeout)
+    if record:
+        return RecordingSerial(link, record)
+    return link
@@ -0,0 +1,112 @@
+"""
+Servo command scheduler for tracking mode.
+
+The camera pipeline produces a target on every frame; the pan/tilt servos and
+the serial link cannot use that many commands. ``ServoCommandWriter`` keeps
+only the newest target and sends it from its own thread when
+
+- it moved more than ``deadband`` pixels from the last command sent, and
+- at least ``1 / max_rate`` seconds passed since the last command.
+
+Targets that were replaced before they could be sent are counted as
+``superseded``, targets inside the deadband as ``suppressed``.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SERVO_DEADBAND = 4.0   # Minimum target movement (frame pixels) worth a new command
+SERVO_MAX_RATE = 25.0  # Commands per second (servo PWM refresh is 50 Hz)
+
+
+class ServoCommandWriter(threading.Thread):
+    """Sends the newest target with ``write(x, y)``, rate-limited and deduplicated."""
+
+    def __init__(self, write, deadband=SERVO_DEADBAND, max_rate=SERVO_MAX_RATE):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.write = write
+        self.deadband = deadband
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self._cond = threading.Condition(threading.Lock())
+        self._pending = None
+        self._last_sent = None
+        self._last_send_time = 0.0
+        self.running = False
+        self.submitted = 0
+        self.sent = 0
+        self.suppressed = 0
+        self.superseded = 0
+        self.errors = 0
+
+    # Called from the camera pipeline; never blocks on the serial port
+    def submit(self, x, y):
+        with self._cond:
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = (x, y)
+            self.submitted += 1
+            self._cond.notify()
+
+    # Forget the last command so the next target is sent even inside the deadband
+    def reset(self):
+        with self._cond:
+            self._pending = None
+            self._last_sent = None
+
+    def _take(self):
+        with self._cond:
+            while self.running and self._pending is None:
+                self._cond.wait(0.5)
+            if not self.running:
+                return None
+            # Rate limit: wait out the interval, picking up newer targets meanwhile
+            delay = self._last_send_time + self.min_interval - time.perf_counter()
+            while self.running and delay > 0:
+                self._cond.wait(delay)
+                delay = self._last_send_time + self.min_interval - time.perf_counter()
+            target = self._pending
+            self._pending = None
+            if target is None:
+                return None
+            if self._last_sent is not None:
+                dx = target[0] - self._last_sent[0]
+                dy = target[1] - self._last_sent[1]
+                if dx * dx + dy * dy < self.deadband * self.deadband:
+                    self.suppressed += 1
+                    return None
+            self._last_sent = target
+            self._last_send_time = time.perf_counter()
+            return target
+
+    def run(self):
+        self.running = True
+        while self.running:
+            target = self._take()
+            if target is None:
+                continue
+            try:
+                self.write(target[0], target[1])
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                logger.exception("Servo command error: %s", e)
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "superseded": self.superseded,
+            "errors": self.errors,
+        }
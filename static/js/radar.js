@@ -29,11 +29,20 @@ let consecutiveStaticUpdates = 0; // Số lần cập nhật liên tiếp mà g
 let initialConnectionMade = false; // Đánh dấu kết nối đầu tiên đã được thiết lập
 let hasFreshRadarData = false; // Flag to track if we have fresh radar data after mode switch
 let HARD_FREEZE = false;  // When true, completely disables all radar movement and animation
+let profilingEnabled = false; // Server is recording timing spans - report ours too
+let profileSpans = [];        // Browser spans waiting to be sent (wall-clock seconds)
+let gridConfig = null;        // Occupancy grid layout sent by the server in "init"
+let gridRows = {};            // Angle bin -> {bins: [[range bin, level 0..255], ...], time: ms received}
+let sweepMinAngle = 15;       // Angle of sweepDistances[0]
+let sweepDistances = [];      // Latest distance per degree from sweepMinAngle (-1 = unknown)
+let radarTargets = [];        // Tracked targets from the server: {id, x, y (cm), vx, vy (cm/s), confirmed, ...}
 
 // Giới hạn góc quét - khớp với Arduino
 const MIN_RADAR_ANGLE = 15;  // Góc servo tối thiểu trong Arduino
 const MAX_RADAR_ANGLE = 165; // Góc servo tối đa trong Arduino
 const DETECTION_DISTANCE = 40; // Khoảng cách phát hiện vật thể (cm) - khớp với Arduino
+const RADAR_DISPLAY_RANGE = 100; // Distance (cm) at the edge of the radar display
+const GRID_MIN_LEVEL = 8;        // Grid cells fainter than this (0..255) are not drawn
 
 // Constants
 const GREEN = "#62ff00";
@@ -78,9 +87,6 @@ document.addEventListener("DOMContentLoaded", function () {
     // Initialize the lastAngleUpdateTime to avoid immediate simulation
     lastAngleUpdateTime = Date.now();
     
-    // Initialize the recentPositions array for trail effect
-    window.recentPositions = [];
-    
     // Connect to WebSocket
     connectWebSocket();
     
@@ -103,22 +109,25 @@ function connectWebSocket() {
     const wsUrl = `${protocol}${window.location.host}/ws`;
     
     websocket = new WebSocket(wsUrl);
-    
+    // Camera frames arrive as binary messages (header + JPEG)
+    websocket.binaryType = "arraybuffer";
+
     // Connection opened
     websocket.onopen = function(event) {
         console.log("WebSocket connected");
         updateSystemMessage("WebSocket connected successfully");
         
-        if (initialConnectionMade) {
-            // Nếu đây là kết nối lại, yêu cầu trạng thái radar hiện tại từ server
-            sendWebSocketCommand("get_radar_status");
-        }
+        // The server sends a scene snapshot on every (re)connect, no need to ask for the radar status
         initialConnectionMade = true;
     };
     
     // Listen for messages
     websocket.onmessage = function(event) {
-        handleWebSocketMessage(event.data);
+        if (event.data instanceof ArrayBuffer) {
+            handleBinaryMessage(event.data);
+        } else {
+            handleWebSocketMessage(event.data);
+        }
     };
     
     // Connection closed
@@ -157,6 +166,21 @@ function handleWebSocketMessage(data) {
                 currentDistance = message.distance;
                 lastAngleUpdateTime = Date.now();
                 updateSystemMessage(message.message);
+                if (message.tracking_mode !== undefined) {
+                    trackingMode = message.tracking_mode;
+                    updateTrackingBtnState();
+                }
+                if (message.face_backends) {
+                    updateFaceBackendOptions(message.face_backends);
+                }
+                if (message.face_backend) {
+                    document.getElementById("face-backend-select").value = message.face_backend;
+                }
+                profilingEnabled = message.profiling === true;
+                if (message.grid) {
+                    gridConfig = message.grid;
+                    gridRows = {};
+                }
                 updateModeDisplay();
                 hasFreshRadarData = true;
                 
@@ -181,84 +205,21 @@ function handleWebSocketMessage(data) {
                 break;
                 
             case "radar":
-                // Check if server asked to resume animation
-                if (message.resume_animation === true && !requestAnimationId) {
-                    console.log("✅ Restarting animation loop at server's request");
-                    requestAnimationId = requestAnimationFrame(drawRadar);
-                }
-                
-                // First data after mode switch
-                if (HARD_FREEZE) {
-                    // If we're in HARD_FREEZE mode and get radar data, resume the animation loop
-                    if (!requestAnimationId) {
-                        console.log("✅ Restarting animation loop after receiving fresh data");
-                        requestAnimationId = requestAnimationFrame(drawRadar);
-                    }
-                    
-                    HARD_FREEZE = false;
-                    console.log("🔓 HARD FREEZE disabled - received fresh data from Arduino");
-                }
-                
-                // Check for first data after mode switch
-                if (message.first_data_after_switch) {
-                    console.log("🔄 Received first radar data after mode switch");
-                }
-                
-                // Reset the waiting for data UI immediately when we get first radar update
-                if (!hasFreshRadarData && currentMode === "RADAR") {
-                    console.log("Received first radar data after mode switch");
-                    updateSystemMessage("Radar operating normally");
-                }
-                
-                // Update radar data from actual servo movement
-                lastAngleUpdateTime = Date.now();
-                hasFreshRadarData = true;
-                
-                // Lấy thông tin về trạng thái di chuyển từ server
-                if (message.moving !== undefined) {
-                    radarMoving = message.moving;
-                }
-                
-                // Trực tiếp cập nhật góc từ server
-                lastReceivedAngle = message.angle;
-                targetAngle = message.angle;
-                currentAngle = targetAngle; // Đồng bộ trực tiếp với góc từ server
-                currentDistance = message.distance;
-                
-                // Cập nhật hướng quét nếu server gửi
-                if (message.direction !== undefined) {
-                    radarDirection = message.direction;
-                }
-                
-                // Log less frequently to avoid console spam
-                if (Math.random() < 0.05) {
-                    console.log(`[WebSocket] Radar update: Angle=${targetAngle}, Distance=${currentDistance}, Moving=${radarMoving}`);
-                }
-                
-                // Cập nhật trạng thái phát hiện đối tượng
-                if (message.detection !== undefined) {
-                    isObjectDetected = message.detection;
+                handleRadarMessage(message);
+                break;
+            
+            case "snapshot":
+                // Whole scene on connect / get_radar_status: grid, last sweep, then the radar position
+                gridRows = {};
+                applyGridRows(message.grid || []);
+                if (message.sweep) {
+                    sweepMinAngle = message.sweep.min_angle;
+                    sweepDistances = message.sweep.distances;
                 }
-                
-                // Đảm bảo góc nằm trong giới hạn
-                if (targetAngle < MIN_RADAR_ANGLE) targetAngle = MIN_RADAR_ANGLE;
-                if (targetAngle > MAX_RADAR_ANGLE) targetAngle = MAX_RADAR_ANGLE;
-                
-                // Thêm vị trí mới cho hiệu ứng afterglow nếu radar đang di chuyển
-                if (window.recentPositions && radarMoving) {
-                    window.recentPositions.unshift({
-                        angle: currentAngle,
-                        timestamp: Date.now()
-                    });
-                    
-                    // Giới hạn số vị trí lưu trữ
-                    if (window.recentPositions.length > 20) {
-                        window.recentPositions.pop();
-                    }
+                radarTargets = message.targets || [];
+                if (message.radar) {
+                    handleRadarMessage(message.radar);
                 }
-                
-                updateAngleDisplay();
-                updateDistanceDisplay();
                 break;
                 
             case "object_detected":
@@ -269,7 +230,8 @@ function handleWebSocketMessage(data) {
                 detectedDistance = message.distance;
                 detectionPulseSize = 0;  // Start the pulse animation
                 
-                console.log(`[WebSocket] Object detected at Angle=${detectedAngle}, Distance=${detectedDistance}`);
+                console.log(`[WebSocket] Object detected at Angle=${detectedAngle}, Distance=${detectedDistance}` +
+                            (message.target_id !== undefined ? ` (target T${message.target_id})` : ""));
                 
                 // Play an alert sound when object is detected
                 playDetectionAlert();
@@ -373,18 +335,20 @@ function handleWebSocketMessage(data) {
                 updateCameraDisplay();
                 break;
                 
-            case "camera":
-                // Update camera feed
-                if (currentMode === "TRACKING") {
-                    updateCameraFeed(message.image, message.tracking);
-                }
-                break;
-                
             case "system_message":
                 // Update system message
                 updateSystemMessage(message.message);
                 break;
             
+            case "profiling":
+                profilingEnabled = message.enabled === true;
+                profileSpans = [];
+                break;
+            
+            case "profile":
+                console.log("Profiler:", message);
+                break;
+            
             case "shoot_response":
                 // Phản hồi từ lệnh bắn
                 updateSystemMessage(message.message);
@@ -398,6 +362,95 @@ function handleWebSocketMessage(data) {
     }
 }
 
+// Radar frame (coalesced samples) or the radar part of a snapshot
+function handleRadarMessage(message) {
+    if (profilingEnabled && message.timestamp) {
+        recordProfileSpan("radar_to_browser", message.timestamp, Date.now() / 1000);
+    }
+    // Check if server asked to resume animation
+    if (message.resume_animation === true && !requestAnimationId) {
+        console.log("✅ Restarting animation loop at server's request");
+        requestAnimationId = requestAnimationFrame(drawRadar);
+    }
+    
+    // First data after mode switch
+    if (HARD_FREEZE) {
+        // If we're in HARD_FREEZE mode and get radar data, resume the animation loop
+        if (!requestAnimationId) {
+            console.log("✅ Restarting animation loop after receiving fresh data");
+            requestAnimationId = requestAnimationFrame(drawRadar);
+        }
+        
+        HARD_FREEZE = false;
+        console.log("🔓 HARD FREEZE disabled - received fresh data from Arduino");
+    }
+    
+    // Check for first data after mode switch
+    if (message.first_data_after_switch) {
+        console.log("🔄 Received first radar data after mode switch");
+    }
+    
+    // Reset the waiting for data UI immediately when we get first radar update
+    if (!hasFreshRadarData && currentMode === "RADAR") {
+        console.log("Received first radar data after mode switch");
+        updateSystemMessage("Radar operating normally");
+    }
+    
+    // Update radar data from actual servo movement
+    lastAngleUpdateTime = Date.now();
+    hasFreshRadarData = true;
+    
+    // Lấy thông tin về trạng thái di chuyển từ server
+    if (message.moving !== undefined) {
+        radarMoving = message.moving;
+    }
+    
+    // Trực tiếp cập nhật góc từ server
+    lastReceivedAngle = message.angle;
+    targetAngle = message.angle;
+    currentAngle = targetAngle; // Đồng bộ trực tiếp với góc từ server
+    currentDistance = message.distance;
+    
+    // Cập nhật hướng quét nếu server gửi
+    if (message.direction !== undefined) {
+        radarDirection = message.direction;
+    }
+    
+    // Log less frequently to avoid console spam
+    if (Math.random() < 0.05) {
+        console.log(`[WebSocket] Radar update: Angle=${targetAngle}, Distance=${currentDistance}, Moving=${radarMoving}`);
+    }
+    
+    // Cập nhật trạng thái phát hiện đối tượng
+    if (message.detection !== undefined) {
+        isObjectDetected = message.detection;
+    }
+    
+    // Đảm bảo góc nằm trong giới hạn
+    if (targetAngle < MIN_RADAR_ANGLE) targetAngle = MIN_RADAR_ANGLE;
+    if (targetAngle > MAX_RADAR_ANGLE) targetAngle = MAX_RADAR_ANGLE;
+    
+    // Occupancy grid rows changed since the previous frame (whole rows, replace ours)
+    if (message.grid) {
+        applyGridRows(message.grid);
+    }
+    
+    // Tracked targets, sent whole whenever the server's track list changed
+    if (message.targets) {
+        radarTargets = message.targets;
+    }
+    
+    // Samples coalesced into this frame update the last sweep
+    if (message.samples) {
+        for (const [angle, distance] of message.samples) {
+            sweepDistances[angle - sweepMinAngle] = distance;
+        }
+    }
+    
+    updateAngleDisplay();
+    updateDistanceDisplay();
+}
+
 // Setup UI event listeners
 function setupEventListeners() {
     // Radar mode button
@@ -432,6 +485,13 @@ function setupEventListeners() {
         }
     });
     
+    // Face detector backend
+    document.getElementById("face-backend-select").addEventListener("change", function() {
+        trackingMode = 1;
+        updateTrackingBtnState();
+        sendWebSocketCommand("tracking_type", { type: 1, backend: this.value });
+    });
+    
     // Shoot button (Thêm vào)
     document.getElementById("shoot-btn").addEventListener("click", function() {
         if (currentMode === "TRACKING") {
@@ -509,6 +569,15 @@ function updateModeBtnState() {
     }
 }
 
+// Face detector choices: the backends registered and available on the server ({name, label})
+function updateFaceBackendOptions(backends) {
+    const select = document.getElementById("face-backend-select");
+    select.replaceChildren(...backends.map(function (backend) {
+        return new Option(backend.label || backend.name, backend.name);
+    }));
+    select.disabled = backends.length < 2;
+}
+
 function updateTrackingBtnState() {
     const faceBtn = document.getElementById("face-tracking-btn");
     const handBtn = document.getElementById("hand-tracking-btn");
@@ -548,14 +617,97 @@ function updateCameraDisplay() {
     }
 }
 
-function updateCameraFeed(imageData, tracking) {
+// Binary camera frame layout (must match CAMERA_HEADER in broadcast.py):
+// "CAM1", flags (bit 0 = tracking valid), 3 pad bytes, x int32, y int32, timestamp float64, JPEG
+const CAMERA_HEADER_SIZE = 44;
+const CAMERA_FLAG_TRACKING = 0x01;
+const CAMERA_FLAG_TARGET = 0x02;     // Target features (bbox, score, velocity) follow the timestamp
+const CAMERA_FLAG_PREDICTED = 0x04;  // Target position predicted between detector runs
+let cameraFrameUrl = null;
+
+function handleBinaryMessage(buffer) {
+    if (buffer.byteLength < CAMERA_HEADER_SIZE) {
+        return;
+    }
+    const view = new DataView(buffer);
+    // "CAM1" as a little-endian uint32
+    if (view.getUint32(0, true) !== 0x314D4143) {
+        console.warn("Unknown binary message");
+        return;
+    }
+    if (currentMode !== "TRACKING") {
+        return;
+    }
+
+    const flags = view.getUint8(4);
+    const tracking = (flags & CAMERA_FLAG_TRACKING) ? {
+        x: view.getInt32(8, true),
+        y: view.getInt32(12, true)
+    } : null;
+    const timestamp = view.getFloat64(16, true);
+    const target = (flags & CAMERA_FLAG_TARGET) ? {
+        bbox: [view.getInt16(24, true), view.getInt16(26, true), view.getInt16(28, true), view.getInt16(30, true)],
+        score: view.getFloat32(32, true),
+        vx: view.getFloat32(36, true),
+        vy: view.getFloat32(40, true),
+        predicted: (flags & CAMERA_FLAG_PREDICTED) !== 0
+    } : null;
+    const jpeg = new Blob([new Uint8Array(buffer, CAMERA_HEADER_SIZE)], { type: "image/jpeg" });
+
+    if (profilingEnabled) {
+        recordProfileSpan("capture_to_browser", timestamp, Date.now() / 1000);
+    }
+    updateCameraFeed(jpeg, tracking, timestamp, target);
+}
+
+// Timing spans for the server's profiler (see profiling.py); sent in batches
+const PROFILE_FLUSH_INTERVAL = 1000; // ms
+const PROFILE_MAX_SPANS = 1000;
+
+function recordProfileSpan(name, start, end, args = {}) {
+    if (profileSpans.length < PROFILE_MAX_SPANS) {
+        profileSpans.push({ name: name, start: start, end: end, ...args });
+    }
+}
+
+setInterval(function () {
+    if (profileSpans.length > 0 && websocket && websocket.readyState === WebSocket.OPEN) {
+        websocket.send(JSON.stringify({ command: "profile_client", spans: profileSpans }));
+        profileSpans = [];
+    }
+}, PROFILE_FLUSH_INTERVAL);
+
+function updateCameraFeed(jpeg, tracking, timestamp, target) {
     const cameraFeed = document.getElementById("camera-feed");
-    cameraFeed.src = `data:image/jpeg;base64,${imageData}`;
-    
+
+    // Object URLs keep their Blob alive until revoked - release the previous frame
+    if (cameraFrameUrl) {
+        URL.revokeObjectURL(cameraFrameUrl);
+    }
+    cameraFrameUrl = URL.createObjectURL(jpeg);
+    if (profilingEnabled) {
+        // Received -> decoded and shown
+        const received = Date.now() / 1000;
+        cameraFeed.onload = function () {
+            recordProfileSpan("browser_decode", received, Date.now() / 1000);
+            recordProfileSpan("capture_to_pixels", timestamp, Date.now() / 1000);
+        };
+    } else {
+        cameraFeed.onload = null;
+    }
+    cameraFeed.src = cameraFrameUrl;
+
     // Update position display
     if (tracking) {
-        document.getElementById("position-display").textContent = 
-            `Position: (${tracking.x}, ${tracking.y})`;
+        let text = `Position: (${tracking.x}, ${tracking.y})`;
+        if (target) {
+            // Box size, detector confidence and speed of the tracked face / hand
+            const speed = Math.hypot(target.vx, target.vy);
+            text += ` · box ${target.bbox[2] - target.bbox[0]}×${target.bbox[3] - target.bbox[1]}` +
+                    ` · score ${target.score.toFixed(2)} · ${speed.toFixed(0)} px/s` +
+                    (target.predicted ? " (predicted)" : "");
+        }
+        document.getElementById("position-display").textContent = text;
     }
 }
 
@@ -599,6 +751,11 @@ function drawRadar(timestamp) {
     // Draw radar background
     drawRadarBackground(centerX, centerY, width, height);
     
+    // Draw the occupancy grid and the last sweep under the scanning line
+    drawOccupancyGrid(centerX, centerY, width);
+    drawLastSweep(centerX, centerY, width);
+    drawTargets(centerX, centerY, width);
+    
     // Draw scanning line
     drawScanningLine(centerX, centerY, width);
     
@@ -702,6 +859,97 @@ function drawRadarBackground(centerX, centerY, width, height) {
     }
 }
 
+// Store grid rows from the server: [[angle bin, [[range bin, level], ...]], ...]
+function applyGridRows(rows) {
+    const now = Date.now();
+    for (const [angleBin, bins] of rows) {
+        if (bins.length) {
+            gridRows[angleBin] = {bins: bins, time: now};
+        } else {
+            delete gridRows[angleBin];
+        }
+    }
+}
+
+// Draw the grid cells, faded with the server's half-life since each row arrived
+function drawOccupancyGrid(centerX, centerY, width) {
+    if (!gridConfig) return;
+    
+    const now = Date.now();
+    const radius = width * 0.4;
+    const pixPerCm = radius / RADAR_DISPLAY_RANGE;
+    
+    for (const angleBin in gridRows) {
+        const row = gridRows[angleBin];
+        const fade = Math.pow(0.5, (now - row.time) / 1000 / gridConfig.half_life);
+        if (fade * 255 < GRID_MIN_LEVEL) {
+            delete gridRows[angleBin];
+            continue;
+        }
+        
+        const angle0 = (gridConfig.min_angle + angleBin * gridConfig.angle_bin) * Math.PI / 180;
+        const angle1 = angle0 + gridConfig.angle_bin * Math.PI / 180;
+        for (const [rangeBin, level] of row.bins) {
+            const inner = rangeBin * gridConfig.range_bin * pixPerCm;
+            if (inner >= radius) continue;
+            const outer = Math.min(radius, inner + gridConfig.range_bin * pixPerCm);
+            
+            // Annular cell between the two angles (canvas y points down, so angles are negated)
+            radarContext.beginPath();
+            radarContext.arc(centerX, centerY, outer, -angle1, -angle0, false);
+            radarContext.arc(centerX, centerY, inner, -angle0, -angle1, true);
+            radarContext.closePath();
+            radarContext.fillStyle = `rgba(255, 40, 40, ${(level / 255 * fade * 0.8).toFixed(3)})`;
+            radarContext.fill();
+        }
+    }
+}
+
+// Latest echo at every degree, as small dots
+function drawLastSweep(centerX, centerY, width) {
+    if (currentMode !== "RADAR" || !sweepDistances.length) return;
+    
+    const pixPerCm = width * 0.4 / RADAR_DISPLAY_RANGE;
+    radarContext.fillStyle = "rgba(98, 255, 0, 0.6)";
+    for (let i = 0; i < sweepDistances.length; i++) {
+        const distance = sweepDistances[i];
+        if (distance === undefined || distance < 0 || distance >= RADAR_DISPLAY_RANGE) continue;
+        const rad = (sweepMinAngle + i) * Math.PI / 180;
+        radarContext.fillRect(centerX + distance * pixPerCm * Math.cos(rad) - 1.5,
+                              centerY - distance * pixPerCm * Math.sin(rad) - 1.5, 3, 3);
+    }
+}
+
+// Tracked targets: circle with the track ID and the distance it moves in one second
+function drawTargets(centerX, centerY, width) {
+    if (currentMode !== "RADAR" || !radarTargets.length) return;
+    
+    const pixPerCm = width * 0.4 / RADAR_DISPLAY_RANGE;
+    radarContext.font = "12px monospace";
+    for (const target of radarTargets) {
+        if (target.distance >= RADAR_DISPLAY_RANGE) continue;
+        const x = centerX + target.x * pixPerCm;
+        const y = centerY - target.y * pixPerCm;
+        const color = target.confirmed ? "rgba(255, 220, 0, 0.9)" : "rgba(255, 220, 0, 0.4)";
+        
+        radarContext.strokeStyle = color;
+        radarContext.lineWidth = 2;
+        radarContext.beginPath();
+        radarContext.arc(x, y, 8, 0, Math.PI * 2);
+        radarContext.stroke();
+        
+        if (target.confirmed && target.speed > 1) {
+            radarContext.beginPath();
+            radarContext.moveTo(x, y);
+            radarContext.lineTo(x + target.vx * pixPerCm, y - target.vy * pixPerCm);
+            radarContext.stroke();
+        }
+        
+        radarContext.fillStyle = color;
+        radarContext.fillText(`T${target.id}`, x + 10, y - 10);
+    }
+}
+
 function drawScanningLine(centerX, centerY, width) {
     // In radar mode, draw moving line
     if (currentMode === "RADAR") {
@@ -965,7 +1213,6 @@ function resetRadarState() {
     // Clear any existing animation state
     hasFreshRadarData = false;
     radarMoving = false;
-    window.recentPositions = [];
     // Set current angle to last received angle to prevent movement
     currentAngle = lastReceivedAngle;
     // Completely reset detection state
@@ -0,0 +1,281 @@
+"""
+Append-only history of radar sweep samples in fixed-width ``.npy`` segments.
+
+Every sample is one fixed-width record (``SAMPLE_DTYPE``, 16 bytes): time
+(Unix seconds), distance, angle, mode and the detection flag. The open
+segment is a preallocated ``.npy`` file mapped into memory
+(``sweep-<start_ms>.part.npy``), so appending is a row assignment and the OS
+writes the pages back; ``maintain()`` flushes it. A segment is closed when
+it is full or spans ``HISTORY_SEGMENT_SECONDS``, then rewritten at its real
+length as ``sweep-<start_ms>-<end_ms>.npy``. Retention deletes the oldest
+closed segments past ``HISTORY_RETENTION`` seconds or ``HISTORY_MAX_BYTES``.
+
+Queries map the segments whose name overlaps the time range and
+binary-search the time column, so only the pages in range are read; the
+angle filter is applied to those rows only. Each field reads as a column
+(``rows["distance"]``). Offline:
+
+    history = SweepHistory("radar_history")
+    history.open()
+    rows = history.query(start=time.time() - 60, min_angle=80, max_angle=100)
+    rows["distance"].mean()
+
+``append`` runs on the event loop; ``maintain`` and ``query`` may run in a
+worker thread.
+"""
+
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+HISTORY_DIR = os.environ.get("RADAR_HISTORY_DIR", "")  # Directory for the sweep history, empty = not recorded
+HISTORY_SEGMENT_RECORDS = int(os.environ.get("RADAR_HISTORY_SEGMENT_RECORDS", str(2 ** 20)))  # Records per segment (16 MiB)
+HISTORY_SEGMENT_SECONDS = float(os.environ.get("RADAR_HISTORY_SEGMENT_SECONDS", "3600"))  # Max time span of one segment
+HISTORY_RETENTION = float(os.environ.get("RADAR_HISTORY_RETENTION", str(7 * 86400)))     # Seconds of history kept
+HISTORY_MAX_BYTES = int(os.environ.get("RADAR_HISTORY_MAX_BYTES", str(2 ** 30)))         # Disk budget for closed segments
+HISTORY_FLUSH_INTERVAL = 1.0  # Seconds between maintain() calls in the app
+QUERY_CHUNK_RECORDS = 65536   # Rows read at a time, newest first, when an angle filter meets a limit
+
+SAMPLE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("distance", "<f4"),
+    ("angle", "<i2"),
+    ("mode", "u1"),
+    ("detection", "u1"),
+])
+MODES = ("RADAR", "TRACKING")  # Stored as the index in this tuple
+
+PART_SUFFIX = ".part.npy"
+
+
+def _segment_bounds(path):
+    # sweep-<start_ms>-<end_ms>.npy -> (start, end) in seconds
+    stem = os.path.basename(path)[len("sweep-"):-len(".npy")]
+    start_ms, end_ms = stem.split("-")
+    return int(start_ms) / 1000.0, int(end_ms) / 1000.0
+
+
+def _angle_filter(rows, min_angle, max_angle):
+    angles = rows["angle"]
+    mask = np.ones(len(rows), dtype=bool)
+    if min_angle is not None:
+        mask &= angles >= min_angle
+    if max_angle is not None:
+        mask &= angles <= max_angle
+    return rows[mask]
+
+
+# Newest `limit` rows (all if None) of a time-sorted segment within [start, end] and [min_angle, max_angle];
+# the memory map is sliced by index, so only the pages of the returned rows (and the angle column
+# of the chunks scanned for them) are read
+def _select(rows, start, end, min_angle, max_angle, limit=None):
+    times = rows["time"]
+    lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+    hi = len(rows) if end is None else int(np.searchsorted(times, end, "right"))
+    if min_angle is None and max_angle is None:
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        # Copy out of the memory map so the file can be closed or deleted
+        return np.array(rows[lo:hi])
+    if limit is None:
+        return _angle_filter(rows[lo:hi], min_angle, max_angle)
+    chunks = []
+    found = 0
+    while hi > lo and found < limit:
+        chunk = _angle_filter(rows[max(lo, hi - QUERY_CHUNK_RECORDS):hi], min_angle, max_angle)
+        chunks.append(chunk)
+        found += len(chunk)
+        hi -= QUERY_CHUNK_RECORDS
+    if not chunks:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    return np.concatenate(chunks[::-1])[-limit:]
+
+
+class SweepHistory:
+    def __init__(self, directory, segment_records=HISTORY_SEGMENT_RECORDS,
+                 segment_seconds=HISTORY_SEGMENT_SECONDS, retention=HISTORY_RETENTION, max_bytes=HISTORY_MAX_BYTES):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.segment_seconds = segment_seconds
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._segments = []   # Closed segment paths, oldest first
+        self._closing = []    # (memmap, part path, count) waiting for maintain() to rewrite them
+        self._active = None
+        self._active_path = None
+        self._active_start = 0.0
+        self._count = 0
+        self._last_time = 0.0
+        self._closed = False
+        self.appended = 0
+        self.removed_segments = 0
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._closed = False
+        # Segments left open by a crash: the unwritten tail is still zero
+        for part in sorted(glob.glob(os.path.join(self.directory, "sweep-*" + PART_SUFFIX))):
+            rows = np.load(part, mmap_mode="r")
+            empty = np.flatnonzero(rows["time"] == 0)
+            self._close_segment(rows, part, int(empty[0]) if len(empty) else len(rows))
+        self._segments = sorted(glob.glob(os.path.join(self.directory, "sweep-*-*.npy")),
+                                key=lambda path: _segment_bounds(path)[0])
+
+    def append(self, timestamp, angle, distance, mode, detection):
+        if self._closed:
+            return
+        # Times stay non-decreasing so queries can binary-search them
+        if timestamp < self._last_time:
+            timestamp = self._last_time
+        if (self._active is None or self._count >= self.segment_records
+                or timestamp - self._active_start >= self.segment_seconds):
+            self._rotate(timestamp)
+        self._active[self._count] = (timestamp, distance, angle, MODES.index(mode) if mode in MODES else 255,
+                                     detection)
+        self._count += 1
+        self._last_time = timestamp
+        self.appended += 1
+
+    def _rotate(self, timestamp):
+        path = os.path.join(self.directory, f"sweep-{int(timestamp * 1000)}{PART_SUFFIX}")
+        active = np.lib.format.open_memmap(path, mode="w+", dtype=SAMPLE_DTYPE, shape=(self.segment_records,))
+        # Swap under the lock so a query sees the old segment either as open or as closing, with its count
+        with self._lock:
+            if self._active is not None:
+                self._closing.append((self._active, self._active_path, self._count))
+            self._active = active
+            self._active_path = path
+            self._count = 0
+        self._active_start = timestamp
+
+    # Rewrite a part file at its real length under its final name
+    def _close_segment(self, rows, part, count):
+        if count:
+            final = os.path.join(self.directory, "sweep-%d-%d.npy" % (int(rows[0]["time"] * 1000),
+                                                                     int(np.ceil(rows[count - 1]["time"] * 1000))))
+            temporary = final + ".tmp"
+            with open(temporary, "wb") as f:
+                np.save(f, rows[:count])
+            os.replace(temporary, final)
+        else:
+            final = None
+        with self._lock:
+            if final is not None:
+                self._segments.append(final)
+            self._closing = [entry for entry in self._closing if entry[1] != part]
+        del rows
+        try:
+            os.remove(part)
+        except OSError:
+            pass  # Still mapped (Windows), removed on the next open()
+
+    # Flush the open segment, close rotated ones and apply retention (blocking; run off the event loop)
+    def maintain(self, now=None):
+        active = self._active
+        if active is not None:
+            active.flush()
+        with self._lock:
+            closing = list(self._closing)
+        for rows, part, count in closing:
+            self._close_segment(rows, part, count)
+        self._apply_retention(time.time() if now is None else now)
+
+    def _apply_retention(self, now):
+        with self._lock:
+            segments = list(self._segments)
+        sizes = {}
+        for path in segments:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        total = sum(sizes.values())
+        expired = []
+        for path in segments:
+            if _segment_bounds(path)[1] < now - self.retention or total > self.max_bytes:
+                expired.append(path)
+                total -= sizes[path]
+            else:
+                break
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # Mapped by a running query (Windows), try again next time
+            with self._lock:
+                self._segments.remove(path)
+            self.removed_segments += 1
+
+    # Samples with start <= time <= end and min_angle <= angle <= max_angle, oldest first;
+    # with a limit only the newest `limit` samples, read newest segment first until there are enough
+    def query(self, start=None, end=None, min_angle=None, max_angle=None, limit=None):
+        if limit is not None and limit <= 0:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        with self._lock:
+            segments = list(self._segments)
+            # Rotated and open segments; rows below the count snapshot are complete
+            recent = [(rows, count) for rows, _, count in self._closing]
+            if self._active is not None:
+                recent.append((self._active, self._count))
+        parts = []
+        found = 0
+        for rows, count in reversed(recent):
+            if limit is not None and found >= limit:
+                break
+            part = _select(rows[:count], start, end, min_angle, max_angle,
+                           None if limit is None else limit - found)
+            parts.append(part)
+            found += len(part)
+        for path in reversed(segments):
+            if limit is not None and found >= limit:
+                break
+            first, last = _segment_bounds(path)
+            if (end is not None and first > end) or (start is not None and last < start):
+                continue
+            try:
+                rows = np.load(path, mmap_mode="r")
+            except (OSError, ValueError):
+                continue  # Removed by retention meanwhile
+            part = _select(rows, start, end, min_angle, max_angle, None if limit is None else limit - found)
+            parts.append(part)
+            found += len(part)
+        if not parts:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        return np.concatenate(parts[::-1])
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            if self._active is not None:
+                self._closing.append((self._active, self._active_path, self._count))
+            self._active = None
+        self.maintain()
+
+    def stats(self):
+        with self._lock:
+            segments = list(self._segments)
+        size = 0
+        for path in segments:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return {
+            "appended": self.appended,
+            "segments": len(segments),
+            "bytes": size,
+            "open_records": self._count,
+            "removed_segments": self.removed_segments,
+        }
+
+
+# Structured rows -> {"time": [...], "angle": [...], ...} for JSON replies
+def columns(rows):
+    data = {name: rows[name].tolist() for name in SAMPLE_DTYPE.names}
+    data["mode"] = [MODES[index] if index < len(MODES) else None for index in data["mode"]]
+    data["detection"] = [bool(value) for value in data["detection"]]
+    return data
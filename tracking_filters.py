@@ -0,0 +1,210 @@
+"""
+Motion filters for the tracked point (nose / wrist, in frame pixels).
+
+``ConstantVelocityKalman`` lets the camera pipeline skip the heavy detector
+on most frames: detections update the filter, and frames in between get the
+filter's prediction at their capture time.
+
+The servo path smooths every position with one of the filters from
+``create_smoother`` and sends the position extrapolated by the measured
+pipeline latency (``extrapolate`` does not change the filter state).
+``benchmarks/eval_smoothing.py`` evaluates the settings offline on recorded
+tracks.
+"""
+
+import numpy as np
+
+# Defaults, in frame pixels and seconds
+MEASUREMENT_NOISE = 4.0       # Std dev of a detection (px)
+ACCELERATION_NOISE = 1500.0   # Std dev of unmodelled acceleration (px/s^2)
+MAX_PREDICTION_TIME = 0.5     # Stop predicting this long after the last detection (s)
+SMOOTHING_ALPHA = 0.5         # Alpha-beta position gain (1 = no smoothing)
+SMOOTHING_BETA = 0.1          # Alpha-beta velocity gain
+MAX_GAP = 0.5                 # Restart the alpha-beta filter after a gap this long (s)
+
+
+class ConstantVelocityKalman:
+    """Kalman filter over the state (x, y, vx, vy) with a constant-velocity model."""
+
+    def __init__(self, measurement_noise=MEASUREMENT_NOISE, acceleration_noise=ACCELERATION_NOISE,
+                 max_prediction_time=MAX_PREDICTION_TIME):
+        self.measurement_noise = measurement_noise
+        self.acceleration_noise = acceleration_noise
+        self.max_prediction_time = max_prediction_time
+        self._measurement_matrix = np.array([[1.0, 0.0, 0.0, 0.0],
+                                             [0.0, 1.0, 0.0, 0.0]])
+        self._measurement_cov = np.eye(2) * measurement_noise ** 2
+        self.reset()
+
+    def reset(self):
+        self.state = None      # [x, y, vx, vy]
+        self.covariance = None
+        self.time = None       # Time of the current state
+        self.last_update = None
+
+    @property
+    def initialized(self):
+        return self.state is not None
+
+    def _advance(self, timestamp):
+        dt = timestamp - self.time
+        if dt <= 0:
+            return
+        transition = np.array([[1.0, 0.0, dt, 0.0],
+                               [0.0, 1.0, 0.0, dt],
+                               [0.0, 0.0, 1.0, 0.0],
+                               [0.0, 0.0, 0.0, 1.0]])
+        # Discrete white-noise acceleration
+        q = self.acceleration_noise ** 2
+        dt2, dt3, dt4 = dt * dt, dt ** 3 / 2, dt ** 4 / 4
+        process_cov = q * np.array([[dt4, 0.0, dt3, 0.0],
+                                    [0.0, dt4, 0.0, dt3],
+                                    [dt3, 0.0, dt2, 0.0],
+                                    [0.0, dt3, 0.0, dt2]])
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + process_cov
+        self.time = timestamp
+
+    # Fold in a detection made at `timestamp`
+    def update(self, timestamp, position):
+        measurement = np.asarray(position, dtype=float)
+        if self.state is None:
+            self.state = np.array([measurement[0], measurement[1], 0.0, 0.0])
+            self.covariance = np.diag([self.measurement_noise ** 2] * 2 + [500.0 ** 2] * 2)
+            self.time = timestamp
+            self.last_update = timestamp
+            return self.position
+
+        self._advance(timestamp)
+        h = self._measurement_matrix
+        innovation = measurement - h @ self.state
+        innovation_cov = h @ self.covariance @ h.T + self._measurement_cov
+        gain = self.covariance @ h.T @ np.linalg.inv(innovation_cov)
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(4) - gain @ h) @ self.covariance
+        self.last_update = max(self.last_update, timestamp)
+        return self.position
+
+    # Estimated position at `timestamp`; None when there is nothing recent to predict from
+    def predict(self, timestamp):
+        if self.state is None or timestamp - self.last_update > self.max_prediction_time:
+            return None
+        self._advance(timestamp)
+        return self.position
+
+    # Position at `timestamp` without changing the filter state
+    def extrapolate(self, timestamp):
+        dt = max(0.0, timestamp - self.time)
+        return (float(self.state[0] + self.state[2] * dt), float(self.state[1] + self.state[3] * dt))
+
+    @property
+    def position(self):
+        return (float(self.state[0]), float(self.state[1]))
+
+    @property
+    def velocity(self):
+        return (float(self.state[2]), float(self.state[3]))
+
+    # Std dev (px) of the position estimate
+    def uncertainty(self):
+        if self.covariance is None:
+            return float("inf")
+        return float(np.sqrt(max(self.covariance[0, 0], self.covariance[1, 1])))
+
+
+class AlphaBetaFilter:
+    """Fixed-gain (alpha-beta) filter on (x, y): cheaper than the Kalman filter, two tunables."""
+
+    def __init__(self, alpha=SMOOTHING_ALPHA, beta=SMOOTHING_BETA, max_gap=MAX_GAP):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.x = self.y = None
+        self.vx = self.vy = 0.0
+        self.time = None
+
+    @property
+    def initialized(self):
+        return self.x is not None
+
+    def update(self, timestamp, position):
+        if self.x is None or timestamp - self.time > self.max_gap:
+            self.x, self.y = float(position[0]), float(position[1])
+            self.vx = self.vy = 0.0
+            self.time = timestamp
+            return (self.x, self.y)
+
+        dt = timestamp - self.time
+        if dt <= 0:
+            # Same or older timestamp: correct the position only
+            self.x += self.alpha * (position[0] - self.x)
+            self.y += self.alpha * (position[1] - self.y)
+            return (self.x, self.y)
+
+        predicted_x = self.x + self.vx * dt
+        predicted_y = self.y + self.vy * dt
+        residual_x = position[0] - predicted_x
+        residual_y = position[1] - predicted_y
+        self.x = predicted_x + self.alpha * residual_x
+        self.y = predicted_y + self.alpha * residual_y
+        self.vx += self.beta / dt * residual_x
+        self.vy += self.beta / dt * residual_y
+        self.time = timestamp
+        return (self.x, self.y)
+
+    def extrapolate(self, timestamp):
+        dt = max(0.0, timestamp - self.time)
+        return (self.x + self.vx * dt, self.y + self.vy * dt)
+
+    @property
+    def position(self):
+        return (self.x, self.y)
+
+    @property
+    def velocity(self):
+        return (self.vx, self.vy)
+
+
+class PassThroughFilter:
+    """No smoothing, no extrapolation (the behaviour before smoothing existed)."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.last = None
+        self.time = None
+
+    @property
+    def initialized(self):
+        return self.last is not None
+
+    def update(self, timestamp, position):
+        self.last = (float(position[0]), float(position[1]))
+        self.time = timestamp
+        return self.last
+
+    def extrapolate(self, timestamp):
+        return self.last
+
+    @property
+    def position(self):
+        return self.last
+
+    @property
+    def velocity(self):
+        return (0.0, 0.0)
+
+
+# Smoother by name: "alpha_beta", "kalman" or "none"; parameters are passed through
+def create_smoother(kind, **params):
+    if kind == "alpha_beta":
+        return AlphaBetaFilter(**params)
+    if kind == "kalman":
+        return ConstantVelocityKalman(**params)
+    if kind == "none":
+        return PassThroughFilter()
+    raise ValueError(f"Unknown smoother: {kind}")